@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compares :func:`nti.app.products.badgr.datetimes.parse_datetime` with
+:func:`nti.externalization.datetime.datetime_from_string`, on their own
+and within the internalization of a large page of awarded badges.
+
+Awarded badges are generated with the `created_at` and `updated_at`
+timestamps (theirs and their badge template's) repeated as they are
+in Badgr listings (bulk awards, shared badge templates)::
+
+    python benchmarks/bench_datetimes.py --count 5000
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import copy
+import timeit
+import argparse
+
+from datetime import datetime
+from datetime import timedelta
+
+from nti.app.products.badgr import datetimes
+from nti.app.products.badgr import internalization
+
+from nti.app.products.badgr.client_models import _awarded_badgr_badge_factory
+
+from nti.app.products.badgr.datetimes import parse_datetime
+
+from nti.externalization.datetime import datetime_from_string
+
+#: An awarded badge, as listed by Badgr.
+AWARDED_BADGE = {
+    'entity_id': u'assertion',
+    'entity_type': u'Assertion',
+    'badge_template': {'entity_id': u'badge',
+                       'issuer_entity_id': u'issuer1',
+                       'name': u'Badge'},
+    'public': True,
+    'locale': u'en',
+    'recipient_email': u'user@example.com',
+    'state': u'accepted',
+    'evidence': [],
+}
+
+
+def _timestamp(when):
+    return when.isoformat()[:23] + 'Z'
+
+
+def _awarded_badges(count, distinct, templates=20):
+    start = datetime(2019, 3, 7, 19, 44, 21, 123000)
+    result = []
+    for i in range(count):
+        awarded = copy.deepcopy(AWARDED_BADGE)
+        awarded['entity_id'] = u'assertion%s' % i
+        when = start + timedelta(minutes=i % distinct)
+        awarded['created_at'] = _timestamp(when)
+        awarded['updated_at'] = _timestamp(when + timedelta(days=1))
+        template = awarded['badge_template']
+        template['entity_id'] = u'badge%s' % (i % templates)
+        template['created_at'] = _timestamp(start - timedelta(days=i % templates))
+        result.append(awarded)
+    return result
+
+
+def _timestamps(awarded_badges):
+    result = []
+    for awarded in awarded_badges:
+        result.append(awarded['created_at'])
+        result.append(awarded['updated_at'])
+        result.append(awarded['badge_template']['created_at'])
+    return result
+
+
+def _bench(name, func, values, repeat, unit):
+    def _run():
+        datetimes._memo.clear()
+        for value in values:
+            func(value)
+    best = min(timeit.repeat(_run, number=1, repeat=repeat))
+    print('%-40s %8.2f ms  %6.2f us/%s'
+          % (name, best * 1000, best * 1e6 / len(values), unit))
+    return best
+
+
+def _cold_parse(value):
+    datetimes._memo.clear()
+    return parse_datetime(value)
+
+
+def _bench_internalization(name, parse, awarded_badges, repeat):
+    original = internalization.parse_datetime
+    internalization.parse_datetime = parse
+    try:
+        return _bench(name, _awarded_badgr_badge_factory,
+                      awarded_badges, repeat, 'badge')
+    finally:
+        internalization.parse_datetime = original
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--count', type=int, default=5000,
+                        help='The number of awarded badges')
+    parser.add_argument('--distinct', type=int, default=500,
+                        help='The number of distinct award timestamps')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(args)
+
+    awarded_badges = _awarded_badges(args.count, args.distinct)
+    values = _timestamps(awarded_badges)
+    for value in values[:args.distinct * 3]:
+        assert parse_datetime(value) == datetime_from_string(value), value
+    for awarded in awarded_badges[:args.distinct]:
+        badge = _awarded_badgr_badge_factory(awarded)
+        assert badge.created_at == datetime_from_string(awarded['created_at'])
+        assert badge.updated_at == datetime_from_string(awarded['updated_at'])
+    print('%d awarded badges, %d timestamps' % (args.count, len(values)))
+
+    baseline = _bench('datetime_from_string', datetime_from_string,
+                      values, args.repeat, 'timestamp')
+    cold = _bench('parse_datetime (no memo)', _cold_parse,
+                  values, args.repeat, 'timestamp')
+    memo = _bench('parse_datetime', parse_datetime,
+                  values, args.repeat, 'timestamp')
+    print('parse speedup: %.1fx (%.1fx without the memo)'
+          % (baseline / memo, baseline / cold))
+
+    baseline = _bench_internalization('internalize, datetime_from_string',
+                                      datetime_from_string,
+                                      awarded_badges, args.repeat)
+    memo = _bench_internalization('internalize, parse_datetime',
+                                  parse_datetime,
+                                  awarded_badges, args.repeat)
+    print('internalization speedup: %.1fx' % (baseline / memo))
+
+
+if __name__ == '__main__':
+    main()
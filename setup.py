@@ -1,3 +1,4 @@
+import sys
 import codecs
 from setuptools import setup
 from setuptools import find_packages
@@ -11,13 +12,25 @@ entry_points = {
 }
 
 TESTS_REQUIRE = [
+    'aiohttp; python_version >= "3.6"',
+    'fakeredis[lua]',
     'fudge',
+    'ijson >= 3.1; python_version >= "3"',
     'nti.app.testing',
     'nti.testing',
+    'redis',
+    'sortedcontainers',
     'zope.testrunner',
 ]
 
 
+# The asyncio client is written for Python 3
+if sys.version_info[0] < 3:
+    EXCLUDE_PACKAGES = ('nti.app.products.badgr.async_client',)
+else:
+    EXCLUDE_PACKAGES = ()
+
+
 def _read(fname):
     with codecs.open(fname, encoding='utf-8') as f:
         return f.read()
@@ -51,13 +64,14 @@ setup(
     ],
     url="https://github.com/OpenNTI/nti.app.products.badgr",
     zip_safe=True,
-    packages=find_packages('src'),
+    packages=find_packages('src', exclude=EXCLUDE_PACKAGES),
     package_dir={'': 'src'},
     include_package_data=True,
     namespace_packages=['nti', 'nti.app', 'nti.app.products'],
     tests_require=TESTS_REQUIRE,
     install_requires=[
         'setuptools',
+        'futures; python_version == "2.7"',
         'nameparser',
         'pyramid',
         'pytz',
@@ -68,6 +82,7 @@ setup(
         'nti.common',
         'nti.dataserver',
         'nti.links',
+        'nti.processlifetime',
         'nti.schema',
         'zope.component',
         'zope.container',
@@ -79,6 +94,13 @@ setup(
     ],
     extras_require={
         'test': TESTS_REQUIRE,
+        'async': [
+            'aiohttp; python_version >= "3.6"',
+        ],
+        'fastjson': [
+            'ijson >= 3.1; python_version >= "3"',
+            'orjson; python_version >= "3.6"',
+        ],
         'docs': [
             'Sphinx',
             'repoze.sphinx.autointerface',
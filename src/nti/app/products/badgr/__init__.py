@@ -12,6 +12,27 @@ VIEW_AWARDED_BADGES = 'badgr_awarded_badges'
 
 ENABLE_BADGR_VIEW = 'EnableBadgr'
 
+AWARD_BADGES_VIEW = 'award_badges'
+
+AWARD_OUTBOX_VIEW = 'award_outbox'
+
+SYNC_ASSERTIONS_VIEW = 'sync_assertions'
+
 BADGR_INTEGRATION_NAME = u'badgr'
 
+DEFAULT_RATE_LIMIT = 5
+DEFAULT_RATE_LIMIT_BURST = 10
+DEFAULT_RATE_LIMIT_TIMEOUT = 30
+
 NT_EVIDENCE_NTIID_ID = u'NextThoughtEvidenceNTIID'
+
+AWARD_STATUS_FAILED = u'failed'
+AWARD_STATUS_QUEUED = u'queued'
+AWARD_STATUS_AWARDED = u'awarded'
+AWARD_STATUS_DUPLICATE = u'duplicate'
+
+OUTBOX_STATE_SENT = u'sent'
+OUTBOX_STATE_FAILED = u'failed'
+OUTBOX_STATE_QUEUED = u'queued'
+OUTBOX_STATE_SENDING = u'sending'
+OUTBOX_STATE_DUPLICATE = u'duplicate'
@@ -0,0 +1,374 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+An asyncio Badgr client, built on `aiohttp`, for background services
+that want to keep many Badgr calls in flight from a single process.
+Python 3 only (this package is left out of Python 2 builds); requires
+the `async` extra.
+
+:class:`AsyncBadgrClient` wraps a :class:`BadgrClient`, sharing its
+request building, retry policies, circuit breaker, rate limiter, error
+handling and internalization, so both clients behave alike and return
+identical model objects. Awards, as with the sync client, are queued
+in the award outbox, whose worker sends them.
+
+ZODB state (the integration, users, the award ledger) is only used on
+the event loop's thread, which must be the thread of the connection
+that loaded the integration. Only token refreshes, which call Badgr
+with `requests`, are run in the loop's executor. Rate limit and retry
+waits are awaited; nothing sleeps in a thread.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+import asyncio
+
+import aiohttp
+
+from zope import interface
+
+from requests.exceptions import ReadTimeout
+from requests.exceptions import ConnectTimeout
+from requests.exceptions import RequestException
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from nti.app.products.badgr.client import BadgrClient
+
+from nti.app.products.badgr.decoding import loads
+
+from nti.app.products.badgr.interfaces import IBadgrBadge
+from nti.app.products.badgr.interfaces import IBadgrClient
+from nti.app.products.badgr.interfaces import IBadgrIssuer
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import IBadgrBadgeCollection
+from nti.app.products.badgr.interfaces import IBadgrIssuerCollection
+from nti.app.products.badgr.interfaces import BadgrRateLimitExceededError
+from nti.app.products.badgr.interfaces import IAwardedBadgrBadgeCollection
+from nti.app.products.badgr.interfaces import MissingBadgrOrganizationError
+
+from nti.app.products.badgr.retry import NO_RETRY
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class _Response(object):
+    """
+    The parts of an `aiohttp` response our retry policies and error
+    handling need, read before its connection is released.
+    """
+
+    def __init__(self, status_code, headers, text):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = text
+
+
+@interface.implementer(IBadgrClient)
+class AsyncBadgrClient(object):
+    """
+    A Badgr client whose API methods are coroutines (and whose iterators
+    are async iterators). Must be created in
+    the thread (and site) of the ZODB connection that loaded the
+    integration, and used from an event loop running in that thread;
+    use as an async context manager, or :meth:`close` when done.
+    """
+
+    def __init__(self, authorized_integration, loop=None):
+        self.client = BadgrClient(authorized_integration)
+        # Everything our calls need from the integration, up front
+        self.client._resolve_for_threads()
+        self._loop = loop
+        self._aiohttp_session = None
+
+    @property
+    def loop(self):
+        return self._loop or asyncio.get_event_loop()
+
+    def _get_aiohttp_session(self):
+        if self._aiohttp_session is None:
+            pool_maxsize = getattr(self.client.authorized_integration,
+                                   'http_pool_maxsize',
+                                   100)
+            connector = aiohttp.TCPConnector(limit=pool_maxsize)
+            self._aiohttp_session = aiohttp.ClientSession(connector=connector)
+        return self._aiohttp_session
+
+    async def close(self):
+        if self._aiohttp_session is not None:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *unused_args):
+        await self.close()
+
+    async def _acquire_rate_limit(self):
+        """
+        Take a rate limit token, awaiting (rather than sleeping) until one
+        is available.
+        """
+        limiter = self.client._rate_limiter
+        timeout = self.client.rate_limit_timeout
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait = limiter.take()
+            if not wait:
+                return
+            limiter.check_wait(wait, deadline)
+            await asyncio.sleep(wait)
+
+    async def _send(self, method, url, **kwargs):
+        """
+        Send the request, raising `requests` errors for connection
+        failures so our retry policies apply as they do for the sync
+        client.
+        """
+        session = self._get_aiohttp_session()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                text = await response.text()
+                return _Response(response.status, response.headers, text)
+        except aiohttp.ClientConnectorError as e:
+            # Could not connect; Badgr never saw the request
+            raise ConnectTimeout(str(e))
+        except (aiohttp.ServerTimeoutError, asyncio.TimeoutError) as e:
+            raise ReadTimeout(str(e) or e.__class__.__name__)
+        except aiohttp.ClientError as e:
+            raise RequestsConnectionError(str(e) or e.__class__.__name__)
+
+    async def _make_call(self, url, post_data=None, params=None, delete=False,
+                         acceptable_return_codes=None, headers=None, retry_policy=None):
+        """
+        Make the call, returning the decoded JSON body.
+        """
+        client = self.client
+        if not acceptable_return_codes:
+            acceptable_return_codes = (200, 201)
+        url = '%s%s' % (client.BASE_URL, url)
+        logger.debug('badgr async call (url=%s) (params=%s) (post_data=%s)',
+                     url, params, post_data)
+
+        if post_data:
+            method = 'POST'
+        elif delete:
+            method = 'DELETE'
+        else:
+            method = 'GET'
+        policy = retry_policy or client.retry_policies.get(method, NO_RETRY)
+
+        async def _do_make_call(started):
+            await self._acquire_rate_limit()
+            connect_timeout, read_timeout = client._timeout(policy, started)
+            call_headers = dict(headers) if headers else dict()
+            call_headers['Authorization'] = 'Bearer %s' % client._access_token
+            kwargs = {'headers': call_headers,
+                      'timeout': aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                                                       sock_read=read_timeout)}
+            if method == 'POST':
+                call_headers['Accept'] = 'application/json'
+                kwargs['json'] = post_data
+            elif method == 'GET' and params:
+                kwargs['params'] = params
+            return await self._send(method, url, **kwargs)
+
+        async def _do_make_call_with_retries():
+            started = time.time()
+            attempt = 0
+            while True:
+                try:
+                    response = await _do_make_call(started)
+                except RequestException as e:
+                    delay = policy.delay_after_error(e, attempt, started)
+                    if delay is None:
+                        logger.warn('Error while making badgr API call (%s) (%s)',
+                                    url, e)
+                        raise BadgrClientError(str(e))
+                else:
+                    delay = policy.delay_after_response(response, attempt, started)
+                    if delay is None:
+                        return response
+                attempt += 1
+                logger.info('Retrying badgr API call (%s) (attempt=%s) (delay=%.2f)',
+                            url, attempt, delay)
+                await asyncio.sleep(delay)
+
+        async def _do_make_call_with_breaker():
+            probe = client._circuit_breaker.before_call()
+            try:
+                response = await _do_make_call_with_retries()
+            except BadgrRateLimitExceededError:
+                # Badgr was never called; let another call probe
+                client._circuit_breaker.release_probe(probe)
+                raise
+            except BadgrClientError:
+                # Including timeouts: a slow Badgr counts as failing
+                client._circuit_breaker.record_failure(probe)
+                raise
+            except BaseException:
+                client._circuit_breaker.release_probe(probe)
+                raise
+            client._record_outcome(probe, response.status_code)
+            return response
+
+        response = await _do_make_call_with_breaker()
+        if response.status_code in (401, 403):
+            # Same semantics as the sync client: refresh and try again.
+            # The refresh calls Badgr with requests, so keep it off the loop.
+            await self.loop.run_in_executor(None, client._update_access_token)
+            response = await _do_make_call_with_breaker()
+
+        def _get_json():
+            return loads(response.text)
+        if response.status_code not in acceptable_return_codes:
+            client._raise_for_response(url,
+                                       response.status_code,
+                                       response.text,
+                                       _get_json)
+        return _get_json()
+
+    async def get_issuer(self, issuer_id):
+        result = await self._make_call(self.client.ISSUERS_ORG_URL % issuer_id)
+        # Badgr wraps even a single issuer in its `result` list
+        return IBadgrIssuer(result['result'][0])
+
+    async def get_issuers(self):
+        result = await self._make_call(self.client.ISSUERS_URL)
+        return IBadgrIssuerCollection(result)
+
+    async def get_badge(self, badge_template_id):
+        client = self.client
+        if not client.organization_id:
+            raise MissingBadgrOrganizationError()
+        url = client.ORGANIZATION_BADGE_URL % badge_template_id
+        result = await self._make_call(url)
+        return IBadgrBadge(result)
+
+    async def get_badges(self, sort=None, filters=None, page=None):
+        client = self.client
+        if not client.organization_id:
+            raise MissingBadgrOrganizationError()
+        params = client._get_badges_params(sort=sort, filters=filters, page=page)
+        url = client.ISSUER_ALL_BADGES_URL % client.organization_id
+        result = await self._make_call(url, params=params)
+        return IBadgrBadgeCollection(result)
+
+    async def _iter_pages(self, url, params):
+        """
+        Yield the JSON of each page of the listing, in order.
+        """
+        page = 1
+        while True:
+            result = await self._make_call(url, params=dict(params, page=page))
+            yield result
+            metadata = result.get('metadata') or {}
+            if page >= (metadata.get('total_pages') or 1):
+                return
+            page += 1
+
+    async def iter_badges(self, sort=None, filters=None):
+        client = self.client
+        if not client.organization_id:
+            raise MissingBadgrOrganizationError()
+        params = client._get_badges_params(sort=sort, filters=filters)
+        url = client.ISSUER_ALL_BADGES_URL % client.organization_id
+        async for result in self._iter_pages(url, params):
+            for badge in IBadgrBadgeCollection(result).Items:
+                yield badge
+
+    async def get_awarded_badges(self, user, sort=None, filters=None, page=None,
+                                 public_only=None, accepted_only=False):
+        client = self.client
+        if not client.organization_id:
+            raise MissingBadgrOrganizationError()
+        params = client._get_awarded_badges_params(user,
+                                                   sort=sort,
+                                                   filters=filters,
+                                                   page=page,
+                                                   public_only=public_only,
+                                                   accepted_only=accepted_only)
+        url = client.BADGE_URL % client.organization_id
+        result = await self._make_call(url, params=params)
+        result = IAwardedBadgrBadgeCollection(result)
+        for awarded_badge in result.Items:
+            awarded_badge.User = user
+        return result
+
+    async def iter_awarded_badges(self, user, sort=None, filters=None,
+                                  public_only=None, accepted_only=False):
+        client = self.client
+        if not client.organization_id:
+            raise MissingBadgrOrganizationError()
+        params = client._get_awarded_badges_params(user,
+                                                   sort=sort,
+                                                   filters=filters,
+                                                   public_only=public_only,
+                                                   accepted_only=accepted_only)
+        url = client.BADGE_URL % client.organization_id
+        async for result in self._iter_pages(url, params):
+            for awarded_badge in IAwardedBadgrBadgeCollection(result).Items:
+                awarded_badge.User = user
+                yield awarded_badge
+
+    def get_award_data(self, user, badge_template_id, suppress_badge_notification_email=False,
+                       locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        return self.client.get_award_data(user, badge_template_id,
+                                          suppress_badge_notification_email=suppress_badge_notification_email,
+                                          locale=locale,
+                                          evidence_ntiid=evidence_ntiid,
+                                          evidence_title=evidence_title,
+                                          evidence_desc=evidence_desc)
+
+    async def post_award(self, data):
+        client = self.client
+        if not client.organization_id:
+            raise MissingBadgrOrganizationError()
+        url = client.BADGE_URL % client.organization_id
+        return await self._make_call(url, post_data=data)
+
+    async def post_awards(self, award_data, max_workers=None):
+        """
+        Send many awards to Badgr, returning the awarded badge JSON (or
+        the error raised) of each, in order, with at most `max_workers`
+        calls in flight.
+        """
+        semaphore = asyncio.Semaphore(max_workers or self.client._award_max_workers)
+
+        async def _post_award(data):
+            async with semaphore:
+                return await self.post_award(data)
+        return await asyncio.gather(*[_post_award(data) for data in award_data],
+                                    return_exceptions=True)
+
+    async def award_badge(self, user, badge_template_id, suppress_badge_notification_email=False,
+                          locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        """
+        Queue the award in the award outbox, as the sync client does,
+        returning the :class:`IBadgrPendingAward`. Queueing does not call
+        Badgr.
+        """
+        return self.client.award_badge(user, badge_template_id,
+                                       suppress_badge_notification_email=suppress_badge_notification_email,
+                                       locale=locale,
+                                       evidence_ntiid=evidence_ntiid,
+                                       evidence_title=evidence_title,
+                                       evidence_desc=evidence_desc)
+
+    async def award_badges(self, users, badge_template_id, suppress_badge_notification_email=False,
+                           locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        """
+        Queue the awards in the award outbox, as the sync client does,
+        returning an :class:`IBadgrBadgeAwardResult` for each user.
+        """
+        return self.client.award_badges(users, badge_template_id,
+                                        suppress_badge_notification_email=suppress_badge_notification_email,
+                                        locale=locale,
+                                        evidence_ntiid=evidence_ntiid,
+                                        evidence_title=evidence_title,
+                                        evidence_desc=evidence_desc)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Caching of Badgr API responses.
+
+Entries hold the decoded JSON of a response along with its ETag, so
+that expired entries can be cheaply revalidated with `If-None-Match`.
+Entries are grouped into namespaces (e.g. the badge catalog of a site)
+that can be invalidated as a whole.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import json
+import time
+import zlib
+import hashlib
+import threading
+
+from collections import OrderedDict
+
+from zope import component
+from zope import interface
+
+from zope.component.hooks import getSite
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.products.badgr.decoding import loads
+
+from nti.app.products.badgr.interfaces import IBadgrResponseCache
+from nti.app.products.badgr.interfaces import IBadgrRepresentationCache
+
+from nti.dataserver.interfaces import IRedisClient
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The default number of seconds a cached response is considered fresh.
+DEFAULT_CACHE_TTL = 60 * 10
+
+
+class CacheEntry(object):
+
+    __slots__ = ('value', 'etag', 'expires', 'generation', 'content_hash')
+
+    def __init__(self, value, etag=None, expires=None, content_hash=None):
+        self.value = value
+        self.etag = etag
+        self.expires = expires
+        self.content_hash = content_hash
+        self.generation = None
+
+    @property
+    def fresh(self):
+        return self.expires is None or self.expires > time.time()
+
+    def __repr__(self):
+        return '<%s etag=%r expires=%r>' % (self.__class__.__name__,
+                                            self.etag,
+                                            self.expires)
+
+
+@interface.implementer(IBadgrResponseCache)
+class BadgrResponseCache(object):
+    """
+    A process-local, thread-safe, bounded :class:`IBadgrResponseCache`.
+    Each namespace is kept in least-recently-used order and evicts its
+    oldest entries once `max_entries` is exceeded.
+    """
+
+    max_entries = 500
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._namespaces = dict()
+
+    def get(self, namespace, key):
+        with self._lock:
+            entries = self._namespaces.get(namespace)
+            if not entries:
+                return None
+            entry = entries.pop(key, None)
+            if entry is not None:
+                entries[key] = entry
+            return entry
+
+    def set(self, namespace, key, value, etag=None, ttl=DEFAULT_CACHE_TTL,
+            content_hash=None):
+        expires = time.time() + ttl if ttl else None
+        entry = CacheEntry(value, etag=etag, expires=expires,
+                           content_hash=content_hash)
+        with self._lock:
+            entries = self._namespaces.setdefault(namespace, OrderedDict())
+            entries.pop(key, None)
+            entries[key] = entry
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+        return entry
+
+    def touch(self, namespace, key, ttl=DEFAULT_CACHE_TTL):
+        """
+        Mark an existing entry fresh again, e.g. after a `304 Not Modified`.
+        """
+        entry = self.get(namespace, key)
+        if entry is not None:
+            entry.expires = time.time() + ttl if ttl else None
+        return entry
+
+    def invalidate(self, namespace, key=None):
+        with self._lock:
+            if key is None:
+                self._namespaces.pop(namespace, None)
+            else:
+                self._namespaces.get(namespace, {}).pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._namespaces.clear()
+
+
+@interface.implementer(IBadgrResponseCache)
+class RedisBadgrResponseCache(BadgrResponseCache):
+    """
+    A two tier :class:`IBadgrResponseCache`, shared by all processes in
+    the cluster through redis.
+
+    Entries are stored in redis as compressed, compact JSON and are also
+    held locally for at most `local_ttl` seconds. Invalidating a
+    namespace bumps a generation counter in redis that is part of every
+    key in the namespace. Local entries remember the generation they
+    were read at, and a local hit is only served while that is still
+    the namespace's generation, so a warm entry costs one small GET and
+    an invalidation anywhere in the cluster is seen immediately.
+
+    Redis entries outlive their freshness by `stale_ttl` seconds so that
+    they can still be revalidated by ETag.
+    """
+
+    local_ttl = 30
+    stale_ttl = 60 * 60
+
+    key_prefix = 'badgr/cache'
+
+    @property
+    def _redis(self):
+        return component.queryUtility(IRedisClient)
+
+    def _generation_key(self, namespace):
+        return '%s/%s/generation' % (self.key_prefix, namespace)
+
+    def _generation(self, redis, namespace):
+        generation = redis.get(self._generation_key(namespace)) or 0
+        if isinstance(generation, bytes):
+            generation = generation.decode('ascii')
+        return int(generation)
+
+    def _redis_key(self, namespace, key, generation):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return '%s/%s/%s/%s' % (self.key_prefix, namespace, generation, digest)
+
+    def _dumps(self, entry):
+        payload = {'value': entry.value,
+                   'etag': entry.etag,
+                   'expires': entry.expires,
+                   'content_hash': entry.content_hash}
+        payload = json.dumps(payload, separators=(',', ':'))
+        return zlib.compress(payload.encode('utf-8'))
+
+    def _loads(self, data):
+        payload = loads(zlib.decompress(data))
+        return CacheEntry(payload['value'],
+                          etag=payload.get('etag'),
+                          expires=payload.get('expires'),
+                          content_hash=payload.get('content_hash'))
+
+    def _store(self, redis, namespace, key, entry, generation):
+        if entry.expires is None:
+            expiry = self.stale_ttl
+        else:
+            expiry = int(entry.expires - time.time()) + self.stale_ttl
+        redis.setex(self._redis_key(namespace, key, generation),
+                    time=max(expiry, 1),
+                    value=self._dumps(entry))
+
+    def _set_local(self, namespace, key, entry, generation=None):
+        # Locally the entry is only trusted for `local_ttl` seconds
+        local_entry = super(RedisBadgrResponseCache, self).set(namespace, key,
+                                                               entry.value,
+                                                               etag=entry.etag,
+                                                               ttl=self.local_ttl,
+                                                               content_hash=entry.content_hash)
+        if entry.expires is not None:
+            local_entry.expires = min(local_entry.expires, entry.expires)
+        local_entry.generation = generation
+        return local_entry
+
+    def get(self, namespace, key):
+        entry = super(RedisBadgrResponseCache, self).get(namespace, key)
+        redis = self._redis
+        if redis is None:
+            return entry
+        try:
+            generation = self._generation(redis, namespace)
+            if      entry is not None and entry.fresh \
+                and entry.generation == generation:
+                return entry
+            data = redis.get(self._redis_key(namespace, key, generation))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while reading badgr cache from redis')
+            return entry
+        if data is None:
+            # Anything we hold locally is of an invalidated generation
+            if entry is not None and entry.generation != generation:
+                super(RedisBadgrResponseCache, self).invalidate(namespace, key)
+                return None
+            return entry
+        shared_entry = self._loads(data)
+        if shared_entry.fresh:
+            self._set_local(namespace, key, shared_entry, generation)
+        return shared_entry
+
+    def set(self, namespace, key, value, etag=None, ttl=DEFAULT_CACHE_TTL,
+            content_hash=None):
+        expires = time.time() + ttl if ttl else None
+        entry = CacheEntry(value, etag=etag, expires=expires,
+                           content_hash=content_hash)
+        redis = self._redis
+        generation = None
+        if redis is not None:
+            try:
+                generation = self._generation(redis, namespace)
+                self._store(redis, namespace, key, entry, generation)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error while writing badgr cache to redis')
+        self._set_local(namespace, key, entry, generation)
+        return entry
+
+    def touch(self, namespace, key, ttl=DEFAULT_CACHE_TTL):
+        entry = self.get(namespace, key)
+        if entry is not None:
+            entry = self.set(namespace, key, entry.value,
+                             etag=entry.etag, ttl=ttl,
+                             content_hash=entry.content_hash)
+        return entry
+
+    def invalidate(self, namespace, key=None):
+        # Only namespace invalidations are seen by other processes at
+        # once; a single key may be served from their local copies for
+        # up to `local_ttl` seconds.
+        super(RedisBadgrResponseCache, self).invalidate(namespace, key)
+        redis = self._redis
+        if redis is None:
+            return
+        try:
+            if key is None:
+                redis.incr(self._generation_key(namespace))
+            else:
+                generation = self._generation(redis, namespace)
+                redis.delete(self._redis_key(namespace, key, generation))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while invalidating badgr cache in redis')
+
+
+@interface.implementer(IBadgrRepresentationCache)
+class BadgrRepresentationCache(BadgrResponseCache):
+    """
+    The externalized collections of the Badgr views. Entries are keyed
+    by their inputs (the collection's content hash, the viewer), so they
+    are never invalidated, only evicted.
+    """
+
+    max_entries = 200
+
+
+def catalog_namespace(site_name=None):
+    """
+    The cache namespace for the badge class catalog of the given (or
+    current) site.
+    """
+    site_name = site_name or getSite().__name__
+    return 'catalog/%s' % site_name
+
+
+def representation_namespace(site_name=None):
+    """
+    The cache namespace for the externalized collections of the given
+    (or current) site.
+    """
+    site_name = site_name or getSite().__name__
+    return 'representation/%s' % site_name
+
+
+def invalidate_badge_catalog(site_name=None):
+    """
+    Drop all cached badge class responses of the given (or current) site.
+    """
+    cache = component.queryUtility(IBadgrResponseCache)
+    if cache is not None:
+        cache.invalidate(catalog_namespace(site_name))
+
+
+def awarded_badges_namespace(user, site_name=None):
+    """
+    The cache namespace for the badges awarded to the given user in the
+    given (or current) site.
+    """
+    site_name = site_name or getSite().__name__
+    intid = component.getUtility(IIntIds).getId(user)
+    return 'awarded/%s/%s' % (site_name, intid)
+
+
+def invalidate_awarded_badges(user, site_name=None):
+    """
+    Drop all cached awarded badge responses for the user; this should be
+    called whenever a badge is awarded to or revoked from the user. No
+    process serves the dropped responses afterwards, so the user sees
+    their new badge right away.
+    """
+    cache = component.queryUtility(IBadgrResponseCache)
+    if cache is not None:
+        cache.invalidate(awarded_badges_namespace(user, site_name))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A circuit breaker around Badgr calls, with its state shared by all
+processes through redis.
+
+After `failure_threshold` failures within `failure_window` seconds the
+circuit opens and calls fail fast for `reset_timeout` seconds. The
+circuit is then half-open: a single probe call is let through, closing
+the circuit on success or re-opening it on failure.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from zope import component
+
+from nti.app.products.badgr.interfaces import BadgrCircuitOpenError
+
+from nti.dataserver.interfaces import IRedisClient
+
+logger = __import__('logging').getLogger(__name__)
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_FAILURE_WINDOW = 60
+DEFAULT_RESET_TIMEOUT = 30
+
+
+class BadgrCircuitBreaker(object):
+    """
+    If redis is unavailable, the circuit is always closed.
+    """
+
+    def __init__(self, key,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD,
+                 failure_window=DEFAULT_FAILURE_WINDOW,
+                 reset_timeout=DEFAULT_RESET_TIMEOUT):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+
+    @property
+    def _redis(self):
+        return component.queryUtility(IRedisClient)
+
+    @property
+    def _open_key(self):
+        return '%s/open' % self.key
+
+    @property
+    def _half_open_key(self):
+        return '%s/half_open' % self.key
+
+    @property
+    def _probe_key(self):
+        return '%s/probe' % self.key
+
+    @property
+    def _failures_key(self):
+        return '%s/failures' % self.key
+
+    def before_call(self):
+        """
+        Raise :class:`BadgrCircuitOpenError` if the call may not be made.
+        Returns True if the call is the probe of a half-open circuit.
+        """
+        redis = self._redis
+        if redis is None or not self.failure_threshold:
+            return False
+        try:
+            is_open, half_open = redis.mget(self._open_key, self._half_open_key)
+            if is_open:
+                raise BadgrCircuitOpenError('Badgr circuit open (%s)' % self.key)
+            if half_open:
+                if not redis.set(self._probe_key, 1, nx=True, ex=self.reset_timeout):
+                    raise BadgrCircuitOpenError('Badgr circuit half-open (%s)' % self.key)
+                return True
+        except BadgrCircuitOpenError:
+            raise
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while checking badgr circuit (%s)', self.key)
+        return False
+
+    def record_success(self, probe=False):
+        if not probe:
+            return
+        redis = self._redis
+        try:
+            redis.delete(self._half_open_key,
+                         self._probe_key,
+                         self._failures_key)
+            logger.info('Badgr circuit closed (%s)', self.key)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while closing badgr circuit (%s)', self.key)
+
+    def release_probe(self, probe=False):
+        """
+        Give up the probe slot of a half-open circuit without recording an
+        outcome, e.g. when the probe never reached Badgr.
+        """
+        if not probe:
+            return
+        redis = self._redis
+        try:
+            redis.delete(self._probe_key)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while releasing badgr circuit probe (%s)',
+                             self.key)
+
+    def record_failure(self, probe=False):
+        redis = self._redis
+        if redis is None or not self.failure_threshold:
+            return
+        try:
+            failures = redis.incr(self._failures_key)
+            if failures == 1:
+                redis.expire(self._failures_key, self.failure_window)
+            if probe or failures >= self.failure_threshold:
+                self._open(redis)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while recording badgr failure (%s)', self.key)
+
+    def _open(self, redis):
+        logger.warn('Opening badgr circuit (%s) for %ss',
+                    self.key, self.reset_timeout)
+        pipe = redis.pipeline()
+        pipe.setex(self._open_key, time=self.reset_timeout, value=1)
+        # The circuit stays half-open (one probe at a time) until a
+        # probe succeeds.
+        pipe.setex(self._half_open_key, time=self.reset_timeout * 20, value=1)
+        pipe.delete(self._probe_key, self._failures_key)
+        pipe.execute()
@@ -8,14 +8,20 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import time
 import pytz
-import requests
+import threading
 import nameparser
 
 from base64 import b64encode
 
+from concurrent.futures import wait
+from concurrent.futures import ThreadPoolExecutor
+
 from datetime import datetime
 
+from requests.exceptions import RequestException
+
 from zope import component
 from zope import interface
 
@@ -25,24 +31,63 @@ from zope.component.hooks import getSite
 
 from zope.intid.interfaces import IIntIds
 
+from nti.app.products.badgr import DEFAULT_RATE_LIMIT
 from nti.app.products.badgr import NT_EVIDENCE_NTIID_ID
+from nti.app.products.badgr import AWARD_STATUS_QUEUED
+from nti.app.products.badgr import AWARD_STATUS_DUPLICATE
 from nti.app.products.badgr import BADGR_INTEGRATION_NAME
+from nti.app.products.badgr import DEFAULT_RATE_LIMIT_BURST
 
 from nti.app.products.badgr.interfaces import IBadgrBadge
 from nti.app.products.badgr.interfaces import IBadgrClient
+from nti.app.products.badgr.interfaces import IBadgrIssuer
+from nti.app.products.badgr.interfaces import IBadgrAwardLedger
 from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import BadgrCircuitOpenError
+from nti.app.products.badgr.interfaces import BadgrRateLimitExceededError
 from nti.app.products.badgr.interfaces import IBadgrIntegration
 from nti.app.products.badgr.interfaces import IAwardedBadgrBadge
-from nti.app.products.badgr.interfaces import IBadgrOrganization
+from nti.app.products.badgr.interfaces import IBadgrResponseCache
 from nti.app.products.badgr.interfaces import IBadgrBadgeCollection
+from nti.app.products.badgr.interfaces import IBadgrIssuerCollection
 from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
 from nti.app.products.badgr.interfaces import IBadgrInitializationUtility
 from nti.app.products.badgr.interfaces import InvalidBadgrIntegrationError
 from nti.app.products.badgr.interfaces import IAwardedBadgrBadgeCollection
-from nti.app.products.badgr.interfaces import IBadgrOrganizationCollection
 from nti.app.products.badgr.interfaces import MissingBadgrOrganizationError
 from nti.app.products.badgr.interfaces import DuplicateBadgrBadgeAwardedError
 
+from nti.app.products.badgr.cache import DEFAULT_CACHE_TTL
+
+from nti.app.products.badgr.cache import catalog_namespace
+from nti.app.products.badgr.cache import awarded_badges_namespace
+from nti.app.products.badgr.cache import invalidate_badge_catalog
+
+from nti.app.products.badgr.circuit import DEFAULT_RESET_TIMEOUT
+from nti.app.products.badgr.circuit import DEFAULT_FAILURE_WINDOW
+from nti.app.products.badgr.circuit import DEFAULT_FAILURE_THRESHOLD
+
+from nti.app.products.badgr.circuit import BadgrCircuitBreaker
+
+from nti.app.products.badgr.client_models import BadgrBadgeAwardResult
+
+from nti.app.products.badgr.decoding import StreamedPage
+
+from nti.app.products.badgr.decoding import body_hash
+from nti.app.products.badgr.decoding import content_hash
+from nti.app.products.badgr.decoding import decode_response
+
+from nti.app.products.badgr.outbox import queue_badge_award
+
+from nti.app.products.badgr.ratelimit import BadgrRateLimiter
+
+from nti.app.products.badgr.singleflight import single_flight
+
+from nti.app.products.badgr.retry import NO_RETRY
+from nti.app.products.badgr.retry import DEFAULT_RETRY_POLICIES
+
+from nti.dataserver.interfaces import IRedisClient
+
 from nti.dataserver.users.interfaces import IUserProfile
 from nti.dataserver.users.interfaces import IFriendlyNamed
 
@@ -52,6 +97,42 @@ from nti.site.localutility import install_utility
 
 logger = __import__('logging').getLogger(__name__)
 
+#: The default max number of concurrent award calls in a bulk award.
+DEFAULT_AWARD_MAX_WORKERS = 8
+
+#: The max concurrent page fetches when fetching all pages.
+DEFAULT_PAGE_MAX_WORKERS = 4
+
+#: Seconds to wait for a connection to Badgr.
+DEFAULT_CONNECT_TIMEOUT = 5
+
+#: Seconds to wait for a Badgr response.
+DEFAULT_READ_TIMEOUT = 30
+
+#: The least read timeout given a call near its retry deadline.
+MIN_READ_TIMEOUT = 0.5
+
+#: The number of items in a Badgr listing page, if a listing does not
+#: show us (it has no items).
+BADGR_PAGE_SIZE = 50
+
+#: The errors a coalesced call raises in the other processes sharing it,
+#: most specific first.
+_SHARED_ERRORS = (BadgrCircuitOpenError,
+                  BadgrRateLimitExceededError,
+                  InvalidBadgrIntegrationError,
+                  MissingBadgrOrganizationError,
+                  BadgrClientError)
+
+_marker = object()
+
+
+def _entry_content_hash(entry):
+    # Entries cached before content hashes were stored
+    if entry.content_hash is None:
+        entry.content_hash = content_hash(entry.value)
+    return entry.content_hash
+
 
 @component.adapter(IBadgrAuthorizedIntegration)
 @interface.implementer(IBadgrClient)
@@ -100,6 +181,8 @@ class _BadgrInitializationUtility(object):
             integration.issuer = issuers[0]
             integration.issuer.__parent__ = integration
             self._register_integration(integration)
+            # Any cached badge classes belong to the previous issuer
+            invalidate_badge_catalog()
         else:
             logger.warn("Multiple issuers tied to auth token (%s) (%s)",
                         integration.access_token,
@@ -127,79 +210,490 @@ class BadgrClient(object):
 
     BADGE_URL = '/organizations/%s/badges'
 
-    def __init__(self, authorized_integration):
+    #: The :class:`RetryPolicy` for each HTTP method
+    retry_policies = DEFAULT_RETRY_POLICIES
+
+    def __init__(self, authorized_integration, rate_limit_timeout=_marker):
         self.authorized_integration = authorized_integration
+        if rate_limit_timeout is _marker:
+            rate_limit_timeout = getattr(authorized_integration,
+                                         'rate_limit_timeout',
+                                         None)
+        self.rate_limit_timeout = rate_limit_timeout
+
+    @Lazy
+    def _rate_limiter(self):
+        integration = self.authorized_integration
+        return BadgrRateLimiter(integration._rate_limit_key,
+                                rate=getattr(integration, 'rate_limit', DEFAULT_RATE_LIMIT),
+                                burst=getattr(integration, 'rate_limit_burst', DEFAULT_RATE_LIMIT_BURST))
+
+    @Lazy
+    def organization_id(self):
+        # We issue and list the badges of the integration's issuer
+        issuer = getattr(self.authorized_integration, 'issuer', None)
+        return getattr(issuer, 'entity_id', None)
+
+    @Lazy
+    def _tokens(self):
+        return self.authorized_integration.tokens
 
     @Lazy
     def _access_token(self):
-        return self.authorized_integration.access_token
+        return self._tokens.access_token
+
+    @Lazy
+    def _session_factory(self):
+        return self.authorized_integration.session_factory
+
+    @property
+    def _session(self):
+        # Fetched per call so idle sessions are recycled by the pool
+        return self._session_factory()
+
+    @Lazy
+    def _connect_timeout(self):
+        return getattr(self.authorized_integration,
+                       'connect_timeout',
+                       DEFAULT_CONNECT_TIMEOUT)
+
+    @Lazy
+    def _read_timeout(self):
+        return getattr(self.authorized_integration,
+                       'read_timeout',
+                       DEFAULT_READ_TIMEOUT)
+
+    def _timeout(self, policy, started):
+        """
+        The (connect, read) timeouts of a call attempt. The read timeout
+        is capped by the time left before the policy's deadline, so a
+        slow Badgr fails the call (and counts against the circuit)
+        rather than holding it past its deadline.
+        """
+        read_timeout = self._read_timeout
+        if policy.deadline is not None:
+            remaining = policy.deadline - (time.time() - started)
+            read_timeout = max(min(read_timeout, remaining), MIN_READ_TIMEOUT)
+        return self._connect_timeout, read_timeout
+
+    @Lazy
+    def _token_lock(self):
+        return threading.Lock()
+
+    @Lazy
+    def _circuit_breaker(self):
+        integration = self.authorized_integration
+        return BadgrCircuitBreaker(integration._circuit_key,
+                                   failure_threshold=getattr(integration,
+                                                             'circuit_failure_threshold',
+                                                             DEFAULT_FAILURE_THRESHOLD),
+                                   failure_window=getattr(integration,
+                                                          'circuit_failure_window',
+                                                          DEFAULT_FAILURE_WINDOW),
+                                   reset_timeout=getattr(integration,
+                                                         'circuit_reset_timeout',
+                                                         DEFAULT_RESET_TIMEOUT))
 
     def _update_access_token(self):
-        result = self.authorized_integration.update_tokens(self._access_token)
-        self._access_token = result
+        # Concurrent (bulk) calls may all see an expired token
+        old_access_token = self._access_token
+        with self._token_lock:
+            if self._access_token == old_access_token:
+                result = self._tokens.update_tokens(old_access_token)
+                self._access_token = result
 
-    def _make_call(self, url, post_data=None, params=None, delete=False, acceptable_return_codes=None):
+    def _make_call(self, url, post_data=None, params=None, delete=False,
+                   acceptable_return_codes=None, headers=None, retry_policy=None,
+                   stream=False):
         if not acceptable_return_codes:
             acceptable_return_codes = (200, 201)
         url = '%s%s' % (self.BASE_URL, url)
         logger.debug('badgr badges call (url=%s) (params=%s) (post_data=%s)',
                      url, params, post_data)
 
-        def _do_make_call():
+        if post_data:
+            method = 'POST'
+        elif delete:
+            method = 'DELETE'
+        else:
+            method = 'GET'
+        policy = retry_policy or self.retry_policies.get(method, NO_RETRY)
+
+        def _do_make_call(started):
+            self._rate_limiter.acquire(timeout=self.rate_limit_timeout)
             access_header = 'Bearer %s' % self._access_token
-            if post_data:
-                return requests.post(url,
-                                     json=post_data,
-                                     headers={'Authorization': access_header,
-                                              'Accept': 'application/json'})
-            elif delete:
-                return requests.delete(url,
-                                       headers={'Authorization': access_header})
+            session = self._session
+            timeout = self._timeout(policy, started)
+            call_headers = dict(headers) if headers else dict()
+            call_headers['Authorization'] = access_header
+            if method == 'POST':
+                call_headers['Accept'] = 'application/json'
+                return session.post(url,
+                                    json=post_data,
+                                    headers=call_headers,
+                                    timeout=timeout)
+            elif method == 'DELETE':
+                return session.delete(url,
+                                      headers=call_headers,
+                                      timeout=timeout)
             else:
-                return requests.get(url,
-                                    headers={'Authorization': access_header})
-        response = _do_make_call()
+                return session.get(url,
+                                   params=params,
+                                   headers=call_headers,
+                                   stream=stream,
+                                   timeout=timeout)
+
+        def _do_make_call_with_retries():
+            started = time.time()
+            attempt = 0
+            while True:
+                try:
+                    response = _do_make_call(started)
+                except RequestException as e:
+                    delay = policy.delay_after_error(e, attempt, started)
+                    if delay is None:
+                        logger.warn('Error while making badgr API call (%s) (%s)',
+                                    url, e)
+                        raise BadgrClientError(str(e))
+                else:
+                    delay = policy.delay_after_response(response, attempt, started)
+                    if delay is None:
+                        return response
+                    # Release the connection of the response we discard
+                    response.close()
+                attempt += 1
+                logger.info('Retrying badgr API call (%s) (attempt=%s) (delay=%.2f)',
+                            url, attempt, delay)
+                time.sleep(delay)
+
+        def _do_make_call_with_breaker():
+            probe = self._circuit_breaker.before_call()
+            try:
+                response = _do_make_call_with_retries()
+            except BadgrRateLimitExceededError:
+                # Badgr was never called; let another call probe
+                self._circuit_breaker.release_probe(probe)
+                raise
+            except BadgrClientError:
+                # Including timeouts: a slow Badgr counts as failing
+                self._circuit_breaker.record_failure(probe)
+                raise
+            except BaseException:
+                self._circuit_breaker.release_probe(probe)
+                raise
+            self._record_outcome(probe, response.status_code)
+            return response
+
+        response = _do_make_call_with_breaker()
         if response.status_code in (401, 403):
             # Ok, expired token, refresh and try again.
             self._update_access_token()
-            response = _do_make_call()
-        
+            response = _do_make_call_with_breaker()
+
         if response.status_code not in acceptable_return_codes:
-            if response.status_code == 422:
-                try:
-                    error_dict = response.json()
-                    if "already has this badge" in error_dict['data']['message']:
-                        raise DuplicateBadgrBadgeAwardedError()
-                except KeyError:
-                    pass
-            logger.warn('Error while making badgr API call (%s) (%s) (%s)',
-                        url,
-                        response.status_code,
-                        response.text)
-            if response.status_code == 401:
-                raise InvalidBadgrIntegrationError(response.text)
-            raise BadgrClientError(response.text)
+            self._raise_for_response(url,
+                                     response.status_code,
+                                     response.text,
+                                     lambda: decode_response(response))
         return response
 
-    def get_badge(self, badge_template_id):
+    def _record_outcome(self, probe, status_code):
         """
-        Get the :class:`IBadgrBadge` associated with the template id.
+        Record a Badgr response with the circuit breaker.
         """
-        if not self.organization_id:
-            raise MissingBadgrOrganizationError()
-        url = self.ORGANIZATION_BADGE_URL % (self.organization_id, badge_template_id)
-        result = self._make_call(url)
-        result = IBadgrBadge(result.json())
-        return result
+        if status_code >= 500 or status_code == 429:
+            self._circuit_breaker.record_failure(probe)
+        else:
+            self._circuit_breaker.record_success(probe)
 
-    def get_badges(self, sort=None, filters=None, page=None):
+    def _raise_for_response(self, url, status_code, text, get_json):
         """
-        Return an :class:`IBadgrBadgeCollection`.
+        Raise the appropriate error for an unacceptable Badgr response.
+        """
+        if status_code == 422:
+            try:
+                error_dict = get_json()
+                if "already has this badge" in error_dict['data']['message']:
+                    raise DuplicateBadgrBadgeAwardedError()
+            except (KeyError, TypeError, ValueError):
+                pass
+        logger.warn('Error while making badgr API call (%s) (%s) (%s)',
+                    url, status_code, text)
+        if status_code == 401:
+            raise InvalidBadgrIntegrationError(text)
+        raise BadgrClientError(text)
 
-        https://www.yourbadgr.com/docs/badge_templates
+    def _cache_key(self, url, params=None):
+        params = sorted((params or {}).items())
+        return '%s?%s' % (url, '&'.join('%s=%s' % x for x in params))
+
+    def _get_cached_json(self, url, namespace, params=None, ttl=DEFAULT_CACHE_TTL):
+        """
+        GET the url, serving the decoded JSON from the response cache
+        while fresh. Stale entries are revalidated with their ETag so
+        that an unchanged resource only costs a `304`. Concurrent
+        identical fetches are coalesced into a single Badgr call.
+
+        While the circuit breaker is open, a stale entry is served
+        instead; the returned flag marks the JSON as stale.
+
+        Returns (json, stale, content hash). The content hash is the
+        digest of the response body, computed once per response and
+        cached with it.
+
+        The cached JSON is shared, as-is, by all callers, who must not
+        mutate it; the :mod:`client_models` factories only read it.
+        """
+        cache = self._response_cache
+        key = self._cache_key(url, params)
+        if cache is None:
+            def _fetch():
+                response = self._make_call(url, params=params)
+                return decode_response(response), False, body_hash(response.content)
+        else:
+            entry = cache.get(namespace, key)
+            if entry is not None and entry.fresh:
+                return entry.value, False, _entry_content_hash(entry)
+
+            def _fetch():
+                return self._fetch_and_cache_json(url, params, cache,
+                                                  namespace, key, entry, ttl)
+        redis = self._redis_client if self._single_flight_cluster else None
+        return single_flight.do('%s/%s' % (namespace, key),
+                                _fetch,
+                                redis=redis,
+                                errors=_SHARED_ERRORS)
+
+    def _fetch_and_cache_json(self, url, params, cache, namespace, key, entry, ttl):
+        try:
+            if entry is not None and entry.etag:
+                response = self._make_call(url,
+                                           params=params,
+                                           headers={'If-None-Match': entry.etag},
+                                           acceptable_return_codes=(200, 304))
+            else:
+                response = self._make_call(url, params=params)
+        except BadgrCircuitOpenError:
+            if entry is None:
+                raise
+            # Badgr is down; degrade to our stale copy
+            return entry.value, True, _entry_content_hash(entry)
+        if response.status_code == 304:
+            cache.touch(namespace, key, ttl=ttl)
+            return entry.value, False, _entry_content_hash(entry)
+        result = decode_response(response)
+        digest = body_hash(response.content)
+        cache.set(namespace, key, result,
+                  etag=response.headers.get('ETag'),
+                  ttl=ttl,
+                  content_hash=digest)
+        return result, False, digest
+
+    @Lazy
+    def _single_flight_cluster(self):
+        return getattr(self.authorized_integration,
+                       'single_flight_cluster',
+                       False)
+
+    @Lazy
+    def _response_cache(self):
+        return component.queryUtility(IBadgrResponseCache)
+
+    def _resolve_for_threads(self):
+        """
+        Resolve, in the calling thread, the state our calls need from the
+        (persistent) integration and the site, so worker threads never
+        load either. Workers run without a site.
+        """
+        # pylint: disable=pointless-statement
+        self.organization_id
+        self._tokens
+        self._access_token
+        self._session_factory
+        self._connect_timeout
+        self._read_timeout
+        self._rate_limiter
+        self._circuit_breaker
+        self._single_flight_cluster
+        self._response_cache
+        self._redis_client
+
+    def _iter_pages(self, url, namespace, params, ttl):
+        """
+        Yield the JSON of each page, fetching the next page on a background
+        thread while the current one is consumed. At most one page is held
+        ahead of the caller.
+        """
+        self._resolve_for_threads()
+
+        def _fetch(page):
+            page_params = dict(params)
+            page_params['page'] = page
+            result, unused_stale, unused_hash = self._get_cached_json(url,
+                                                                      namespace,
+                                                                      params=page_params,
+                                                                      ttl=ttl)
+            return result
+
+        executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            page = 1
+            future = executor.submit(_fetch, page)
+            while future is not None:
+                result = future.result()
+                metadata = result.get('metadata') or {}
+                page += 1
+                if page <= (metadata.get('total_pages') or 1):
+                    future = executor.submit(_fetch, page)
+                else:
+                    future = None
+                yield result
+        finally:
+            # An abandoned prefetch is left to finish on its own
+            executor.shutdown(wait=False)
+
+    @property
+    def _page_max_workers(self):
+        return getattr(self.authorized_integration,
+                       'page_max_workers',
+                       DEFAULT_PAGE_MAX_WORKERS)
+
+    def _iter_streamed_items(self, url, params):
+        """
+        Yield the JSON `data` items of every page, uncached, each parsed as
+        it is read off the wire (if ijson is available), so a page is never
+        held in memory whole.
+        """
+        page = 1
+        while True:
+            page_params = dict(params)
+            page_params['page'] = page
+            streamed = StreamedPage(self._make_call(url,
+                                                    params=page_params,
+                                                    stream=True))
+            for item in streamed:
+                yield item
+            if page >= (streamed.metadata.get('total_pages') or 1):
+                break
+            page += 1
+
+    def _get_pages_json(self, url, namespace, params, ttl, pages, max_workers=None):
+        """
+        Fetch the given pages concurrently, returning (json, stale, content
+        hash) for each, in order. Every fetch goes through the rate limiter, so
+        `max_workers` only bounds our concurrency.
+        """
+        pages = list(pages)
+        if not pages:
+            return []
+        self._resolve_for_threads()
+
+        def _fetch(page):
+            page_params = dict(params)
+            page_params['page'] = page
+            return self._get_cached_json(url, namespace,
+                                         params=page_params,
+                                         ttl=ttl)
+
+        max_workers = max_workers or self._page_max_workers
+        max_workers = min(max_workers, len(pages))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(_fetch, pages))
+
+    def _merge_pages_json(self, results):
+        """
+        Merge (json, stale, content hash) page results into those of a
+        single page; its content hash is the digest of the page hashes.
+        """
+        data = []
+        stale = False
+        hashes = []
+        for result, page_stale, page_hash in results:
+            data.extend(result.get('data') or ())
+            stale = stale or page_stale
+            hashes.append(page_hash)
+        metadata = dict(results[0][0].get('metadata') or {})
+        metadata['count'] = len(data)
+        metadata['current_page'] = metadata['total_pages'] = 1
+        digest = body_hash('/'.join(hashes).encode('ascii'))
+        return {'data': data, 'metadata': metadata}, stale, digest
+
+    def _get_all_pages_json(self, url, namespace, params, ttl, max_workers=None):
+        """
+        Fetch the first page, then all the remaining pages concurrently,
+        returning (json, stale, content hash) of all of them merged, in
+        order.
+        """
+        params = dict(params)
+        params['page'] = 1
+        first = self._get_cached_json(url, namespace, params=params, ttl=ttl)
+        metadata = first[0].get('metadata') or {}
+        total_pages = metadata.get('total_pages') or 1
+        rest = self._get_pages_json(url, namespace, params, ttl,
+                                    range(2, total_pages + 1),
+                                    max_workers=max_workers)
+        return self._merge_pages_json([first] + rest)
+
+    def _get_batch_json(self, url, namespace, params, ttl, batch_start, batch_size):
+        """
+        Fetch the (fewest) pages covering the batch, concurrently, returning
+        (json, stale, content hash) of just the batch's items. The metadata total counts
+        are those of the full listing.
+
+        We do not choose Badgr's page size, so it is taken from the first
+        page: the whole listing, or a full page.
+        """
+        batch_start = max(batch_start or 0, 0)
+        batch_size = max(batch_size, 0)
+        params = dict(params)
+        params['page'] = 1
+        first = self._get_cached_json(url, namespace, params=params, ttl=ttl)
+        page_size = len(first[0].get('data') or ()) or BADGR_PAGE_SIZE
+        metadata = first[0].get('metadata') or {}
+        total_pages = metadata.get('total_pages') or 1
+        first_page = min(batch_start // page_size + 1, total_pages)
+        last_page = max(batch_start + batch_size - 1, batch_start) // page_size + 1
+        last_page = min(last_page, total_pages)
+        rest = self._get_pages_json(url, namespace, params, ttl,
+                                    range(max(first_page, 2), last_page + 1))
+        results = [first] + rest if first_page == 1 else rest
+        result, stale, digest = self._merge_pages_json(results)
+        offset = batch_start - (first_page - 1) * page_size
+        result['data'] = result['data'][offset:offset + batch_size]
+        result['metadata']['count'] = len(result['data'])
+        digest = body_hash(('%s/%s/%s' % (digest, offset, batch_size)).encode('ascii'))
+        return result, stale, digest
+
+    @Lazy
+    def _redis_client(self):
+        return component.queryUtility(IRedisClient)
+
+    @property
+    def _catalog_cache_ttl(self):
+        return getattr(self.authorized_integration,
+                       'catalog_cache_ttl',
+                       DEFAULT_CACHE_TTL)
+
+    @property
+    def _awarded_badges_cache_ttl(self):
+        return getattr(self.authorized_integration,
+                       'awarded_badges_cache_ttl',
+                       DEFAULT_CACHE_TTL)
+
+    def get_badge(self, badge_template_id):
+        """
+        Get the :class:`IBadgrBadge` associated with the template id.
         """
         if not self.organization_id:
             raise MissingBadgrOrganizationError()
+        url = self.ORGANIZATION_BADGE_URL % badge_template_id
+        result, unused_stale, unused_hash = self._get_cached_json(url,
+                                                                  catalog_namespace(),
+                                                                  ttl=self._catalog_cache_ttl)
+        result = IBadgrBadge(result)
+        return result
+
+    def _get_badges_params(self, sort=None, filters=None, page=None):
         params = dict()
         filters = dict(filters) if filters else dict()
         filters['state'] = 'active'
@@ -209,27 +703,84 @@ class BadgrClient(object):
             params['filter'] = self._get_filter_str(filters)
         if page:
             params['page'] = page
-        url = self.ORGANIZATION_ALL_BADGES_URL % self.organization_id
-        result = self._make_call(url, params=params)
-        result = IBadgrBadgeCollection(result.json())
+        return params
+
+    def get_badges(self, sort=None, filters=None, page=None, all_pages=False,
+                   batch_start=None, batch_size=None):
+        """
+        Return an :class:`IBadgrBadgeCollection`.
+
+        all_pages - return the badges of all pages in a single collection
+        batch_start, batch_size - return this slice of all badges, rather
+            than a page
+        https://www.yourbadgr.com/docs/badge_templates
+        """
+        if not self.organization_id:
+            raise MissingBadgrOrganizationError()
+        params = self._get_badges_params(sort=sort, filters=filters, page=page)
+        url = self.ISSUER_ALL_BADGES_URL % self.organization_id
+        if batch_size is not None:
+            result, stale, digest = self._get_batch_json(url,
+                                                         catalog_namespace(),
+                                                         params,
+                                                         self._catalog_cache_ttl,
+                                                         batch_start,
+                                                         batch_size)
+        elif all_pages:
+            result, stale, digest = self._get_all_pages_json(url,
+                                                             catalog_namespace(),
+                                                             params,
+                                                             self._catalog_cache_ttl)
+        else:
+            result, stale, digest = self._get_cached_json(url,
+                                                          catalog_namespace(),
+                                                          params=params,
+                                                          ttl=self._catalog_cache_ttl)
+        result = IBadgrBadgeCollection(result)
+        result.stale = stale
+        result.content_hash = digest
         return result
 
-    def get_organization(self, organization_id):
+    def iter_badges(self, sort=None, filters=None, stream=False):
         """
-        Get the :class:`IBadgrOrganization` for this organization id.
+        Yield every :class:`IBadgrBadge`, across all pages.
+
+        stream - parse and internalize each badge as it is read, bypassing
+            the response cache
         """
-        url = self.ORGANIZATIONS_ORG_URL % organization_id
-        result = self._make_call(url)
-        result = IBadgrOrganization(result.json())
+        if not self.organization_id:
+            raise MissingBadgrOrganizationError()
+        params = self._get_badges_params(sort=sort, filters=filters)
+        url = self.ISSUER_ALL_BADGES_URL % self.organization_id
+        if stream:
+            for item in self._iter_streamed_items(url, params):
+                yield IBadgrBadge(item)
+            return
+        for result in self._iter_pages(url,
+                                       catalog_namespace(),
+                                       params,
+                                       self._catalog_cache_ttl):
+            for badge in IBadgrBadgeCollection(result).Items:
+                yield badge
+
+    def get_issuer(self, issuer_id):
+        """
+        Get the :class:`IBadgrIssuer` for this issuer id.
+        """
+        url = self.ISSUERS_ORG_URL % issuer_id
+        result = decode_response(self._make_call(url))
+        # Badgr wraps even a single issuer in its `result` list
+        result = IBadgrIssuer(result['result'][0])
         return result
 
-    def get_organizations(self):
+    def get_issuers(self):
         """
-        Get all :class:`IBadgrOrganization` objects.
+        Get the :class:`IBadgrIssuerCollection` of all issuers of this
+        access token.
         """
-        url = self.ORGANIZATIONS_URL
+        url = self.ISSUERS_URL
         result = self._make_call(url)
-        result = IBadgrOrganizationCollection(result.json())
+        result = IBadgrIssuerCollection(decode_response(result))
         return result
 
     def _get_user_id(self, user):
@@ -256,15 +807,8 @@ class BadgrClient(object):
             date_obj = date_obj.replace(tzinfo=pytz.UTC)
         return date_obj.strftime("%Y-%m-%d %H:%M:%S %z")
 
-    def get_awarded_badges(self, user, sort=None, filters=None, page=None,
-                           public_only=None, accepted_only=False):
-        """
-        Return an :class:`IAwardedBadgrBadgeCollection`.
-
-        https://www.yourbadgr.com/docs/issued_badges filtered by user email.
-        """
-        if not self.organization_id:
-            raise MissingBadgrOrganizationError()
+    def _get_awarded_badges_params(self, user, sort=None, filters=None, page=None,
+                                   public_only=None, accepted_only=False):
         params = dict()
         filters = dict(filters) if filters else dict()
         # We want *all* badges tied to this user (by email) in Badgr. The
@@ -283,23 +827,107 @@ class BadgrClient(object):
             params['filter'] = self._get_filter_str(filters)
         if page is not None:
             params['page'] = page
+        return params
+
+    def get_awarded_badges(self, user, sort=None, filters=None, page=None,
+                           public_only=None, accepted_only=False, all_pages=False,
+                           batch_start=None, batch_size=None):
+        """
+        Return an :class:`IAwardedBadgrBadgeCollection`.
+
+        all_pages - return the badges of all pages in a single collection
+        batch_start, batch_size - return this slice of all badges, rather
+            than a page
+        https://www.yourbadgr.com/docs/issued_badges filtered by user email.
+        """
+        if not self.organization_id:
+            raise MissingBadgrOrganizationError()
+        params = self._get_awarded_badges_params(user,
+                                                 sort=sort,
+                                                 filters=filters,
+                                                 page=page,
+                                                 public_only=public_only,
+                                                 accepted_only=accepted_only)
         url = self.BADGE_URL % self.organization_id
-        result = self._make_call(url, params=params)
-        result = IAwardedBadgrBadgeCollection(result.json())
+        # Params (filters included) capture the page, sort, public_only
+        # and accepted_only inputs in the cache key.
+        if batch_size is not None:
+            result, stale, digest = self._get_batch_json(url,
+                                                         awarded_badges_namespace(user),
+                                                         params,
+                                                         self._awarded_badges_cache_ttl,
+                                                         batch_start,
+                                                         batch_size)
+        elif all_pages:
+            result, stale, digest = self._get_all_pages_json(url,
+                                                             awarded_badges_namespace(user),
+                                                             params,
+                                                             self._awarded_badges_cache_ttl)
+        else:
+            result, stale, digest = self._get_cached_json(url,
+                                                          awarded_badges_namespace(user),
+                                                          params=params,
+                                                          ttl=self._awarded_badges_cache_ttl)
+        result = IAwardedBadgrBadgeCollection(result)
+        result.stale = stale
+        result.content_hash = digest
         # FIXME: fix this
         for awarded_badge in result.Items:
             awarded_badge.User = user
         return result
 
-    def award_badge(self, user, badge_template_id, suppress_badge_notification_email=False,
-                    locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+    def get_issuer_assertions(self, updated_since=None, page=None):
+        """
+        Return the JSON of a page of the badges issued by our organization,
+        oldest updated first, optionally only those updated since the given
+        `updated_at`. Never cached.
         """
-        Award a badge to a user.
+        if not self.organization_id:
+            raise MissingBadgrOrganizationError()
+        params = {'sort': 'updated_at'}
+        if updated_since:
+            params['filter'] = self._get_filter_str({'updated_at_min': updated_since})
+        if page is not None:
+            params['page'] = page
+        url = self.ISSUER_ASSERTIONS % self.organization_id
+        return decode_response(self._make_call(url, params=params))
 
-        https://www.yourbadgr.com/docs/issued_badges
+    def iter_awarded_badges(self, user, sort=None, filters=None,
+                            public_only=None, accepted_only=False, stream=False):
+        """
+        Yield every :class:`IAwardedBadgrBadge` of the user, across all
+        pages.
+
+        stream - parse and internalize each badge as it is read, bypassing
+            the response cache
         """
         if not self.organization_id:
             raise MissingBadgrOrganizationError()
+        params = self._get_awarded_badges_params(user,
+                                                 sort=sort,
+                                                 filters=filters,
+                                                 public_only=public_only,
+                                                 accepted_only=accepted_only)
+        url = self.BADGE_URL % self.organization_id
+        if stream:
+            for item in self._iter_streamed_items(url, params):
+                awarded_badge = IAwardedBadgrBadge(item)
+                awarded_badge.User = user
+                yield awarded_badge
+            return
+        for result in self._iter_pages(url,
+                                       awarded_badges_namespace(user),
+                                       params,
+                                       self._awarded_badges_cache_ttl):
+            for awarded_badge in IAwardedBadgrBadgeCollection(result).Items:
+                awarded_badge.User = user
+                yield awarded_badge
+
+    def get_award_data(self, user, badge_template_id, suppress_badge_notification_email=False,
+                       locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        """
+        The JSON to send to Badgr to award the badge to the user.
+        """
         data = dict()
         # We award this to our user's email address - no
         # matter if invalid, bounced etc.
@@ -324,8 +952,111 @@ class BadgrClient(object):
                                  "title": evidence_title,
                                  "description": evidence_desc,
                                  "id": evidence_id}]
+        return data
+
+    def award_badge(self, user, badge_template_id, suppress_badge_notification_email=False,
+                    locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        """
+        Queue the award of a badge to a user in the award outbox, to be
+        sent to Badgr after the current transaction commits. Returns the
+        :class:`IBadgrPendingAward`.
+
+        https://www.yourbadgr.com/docs/issued_badges
+        """
+        if not self.organization_id:
+            raise MissingBadgrOrganizationError()
+        if self._has_recorded_award(user, badge_template_id):
+            raise DuplicateBadgrBadgeAwardedError()
+        return queue_badge_award(user, badge_template_id,
+                                 integration=self.authorized_integration,
+                                 suppress_badge_notification_email=suppress_badge_notification_email,
+                                 locale=locale,
+                                 evidence_ntiid=evidence_ntiid,
+                                 evidence_title=evidence_title,
+                                 evidence_desc=evidence_desc)
+
+    @Lazy
+    def _award_ledger(self):
+        return IBadgrAwardLedger(self.authorized_integration, None)
+
+    def _has_recorded_award(self, user, badge_template_id):
+        ledger = self._award_ledger
+        return  ledger is not None \
+            and ledger.has_award(self._get_user_id(user), badge_template_id)
+
+    def post_award(self, data):
+        """
+        Send the award data to Badgr, returning the awarded badge JSON.
+        Awards are sent by the award outbox; see :meth:`award_badge`.
+        """
+        if not self.organization_id:
+            raise MissingBadgrOrganizationError()
         url = self.BADGE_URL % self.organization_id
-        result = self._make_call(url, post_data=data)
-        result = IAwardedBadgrBadge(result.json())
+        return decode_response(self._make_call(url, post_data=data))
+
+    @property
+    def _award_max_workers(self):
+        return getattr(self.authorized_integration,
+                       'award_max_workers',
+                       DEFAULT_AWARD_MAX_WORKERS)
+
+    def post_awards(self, award_data, max_workers=None):
+        """
+        Send many awards to Badgr, returning the awarded badge JSON (or
+        the error raised) of each, in order.
+
+        Only the HTTP calls are fanned out to a bounded pool of worker
+        threads; the payloads are built, and the results used, in the
+        calling thread.
+        """
+        award_data = list(award_data)
+        if not award_data:
+            return []
+        self._resolve_for_threads()
+        max_workers = max_workers or self._award_max_workers
+        max_workers = min(max_workers, len(award_data))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self.post_award, data) for data in award_data]
+            wait(futures)
+        result = []
+        for future in futures:
+            try:
+                result.append(future.result())
+            except Exception as e:  # pylint: disable=broad-except
+                result.append(e)
         return result
 
+    def award_badges(self, users, badge_template_id, suppress_badge_notification_email=False,
+                     locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        """
+        Queue the award of a badge to many users in the award outbox,
+        returning an :class:`IBadgrBadgeAwardResult` for each user, in
+        order.
+
+        Users the award ledger knows to hold the badge are reported as
+        duplicates; the others are queued, to be sent by the outbox worker
+        after the current transaction commits.
+        """
+        if not self.organization_id:
+            raise MissingBadgrOrganizationError()
+        users = list(users)
+        result = [BadgrBadgeAwardResult(username=user.username) for user in users]
+        ledger = self._award_ledger
+        user_intids = [self._get_user_id(user) for user in users]
+        if ledger is not None and users:
+            known = ledger.awarded_intids(badge_template_id, user_intids)
+        else:
+            known = ()
+        for user, user_intid, award_result in zip(users, user_intids, result):
+            if user_intid in known:
+                award_result.status = AWARD_STATUS_DUPLICATE
+                continue
+            queue_badge_award(user, badge_template_id,
+                              integration=self.authorized_integration,
+                              suppress_badge_notification_email=suppress_badge_notification_email,
+                              locale=locale,
+                              evidence_ntiid=evidence_ntiid,
+                              evidence_title=evidence_title,
+                              evidence_desc=evidence_desc)
+            award_result.status = AWARD_STATUS_QUEUED
+        return result
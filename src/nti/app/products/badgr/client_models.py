@@ -18,16 +18,23 @@ from zope.container.contained import Contained
 from nti.app.products.badgr import NT_EVIDENCE_NTIID_ID
 
 from nti.app.products.badgr.interfaces import IBadgrBadge
+from nti.app.products.badgr.interfaces import IBadgrIssuer
 from nti.app.products.badgr.interfaces import IBadgrIdEvidence
-from nti.app.products.badgr.interfaces import IBadgrOrganization
 from nti.app.products.badgr.interfaces import IAwardedBadgrBadge
 from nti.app.products.badgr.interfaces import IBadgrBadgeCollection
-from nti.app.products.badgr.interfaces import IBadgrOrganizationCollection
+from nti.app.products.badgr.interfaces import IBadgrBadgeAwardResult
+from nti.app.products.badgr.interfaces import IBadgrIssuerCollection
 from nti.app.products.badgr.interfaces import IAwardedBadgrBadgeCollection
 
-from nti.dublincore.time_mixins import PersistentCreatedAndModifiedTimeObject
+from nti.app.products.badgr.internalization import FieldMapping
+
+from nti.app.products.badgr.transient_models import TransientBadgrBadge
+from nti.app.products.badgr.transient_models import TransientBadgrIdEvidence
+from nti.app.products.badgr.transient_models import TransientAwardedBadgrBadge
+from nti.app.products.badgr.transient_models import TransientBadgrBadgeCollection
+from nti.app.products.badgr.transient_models import TransientAwardedBadgrBadgeCollection
 
-from nti.externalization.internalization import update_from_external_object
+from nti.dublincore.time_mixins import PersistentCreatedAndModifiedTimeObject
 
 from nti.externalization.representation import WithRepr
 
@@ -46,112 +53,123 @@ from nti.schema.schema import SchemaConfigured
 logger = __import__('logging').getLogger(__name__)
 
 
+def _data(ext):
+    return ext['data'] if 'data' in ext else ext
+
+
+_ID_EVIDENCE_FIELDS = FieldMapping(IBadgrIdEvidence,
+                                   sources={'ntiid': 'id'})
+
+_ISSUER_FIELDS = FieldMapping(IBadgrIssuer,
+                              sources={'entity_type': 'entityType',
+                                       'entity_id': 'entityId',
+                                       'open_badge_id': 'openBadgeId',
+                                       'image_string': 'image'})
+
+_BADGE_FIELDS = FieldMapping(IBadgrBadge,
+                             sources={'badge_url': 'url',
+                                      'template_id': 'id',
+                                      'organization_id': ('owner', 'id'),
+                                      'organization_name': ('owner', 'name')})
+
+
 @component.adapter(dict)
 @interface.implementer(IBadgrIdEvidence)
 def _badgr_id_evidence_factory(ext):
-    ext['ntiid'] = ext.get('id')
-    obj = BadgrIdEvidence()
-    update_from_external_object(obj, ext)
-    return obj
+    return _ID_EVIDENCE_FIELDS.internalize(BadgrIdEvidence(), ext)
 
 
 @component.adapter(dict)
-@interface.implementer(IBadgrOrganization)
-def _badgr_organization_factory(ext):
-    if 'data' in ext:
-        ext = ext['data']
-    obj = BadgrOrganization()
-    ext['organization_id'] = ext['id']
-    update_from_external_object(obj, ext)
-    return obj
+@interface.implementer(IBadgrIssuer)
+def _badgr_issuer_factory(ext):
+    # Issuers are stored on the integration
+    return _ISSUER_FIELDS.internalize(BadgrIssuer(), ext)
 
 
 @component.adapter(dict)
 @interface.implementer(IBadgrBadge)
 def _badgr_badge_factory(ext):
-    if 'data' in ext:
-        ext = ext['data']
-    obj = BadgrBadge()
-    if 'owner' in ext:
-        ext['organization_id'] = ext['owner'].get('id')
-        ext['organization_name'] = ext['owner'].get('name')
-    ext['badge_url'] = ext.pop('url')
-    ext['template_id'] = ext['id']
-    update_from_external_object(obj, ext)
-    return obj
+    # Callers may store the badge
+    return _BADGE_FIELDS.internalize(BadgrBadge(), _data(ext))
+
+
+def _transient_badge(ext):
+    return _BADGE_FIELDS.internalize(TransientBadgrBadge(), _data(ext))
+
+
+def _transient_id_evidence(ext):
+    return _ID_EVIDENCE_FIELDS.internalize(TransientBadgrIdEvidence(), ext)
+
+
+def _nt_evidence(evidence):
+    # Only concerning ourselves with NT evidence
+    return [_transient_id_evidence(evi) for evi in evidence or ()
+            if      evi.get('name') == NT_EVIDENCE_NTIID_ID
+                and is_valid_ntiid_string(evi.get('id'))]
+
+
+_AWARDED_BADGE_FIELDS = FieldMapping(IAwardedBadgrBadge,
+                                     converters={'badge_template': _transient_badge,
+                                                 'evidence': _nt_evidence})
 
 
 @component.adapter(dict)
 @interface.implementer(IAwardedBadgrBadge)
 def _awarded_badgr_badge_factory(ext):
-    if 'data' in ext:
-        ext = ext['data']
-    ext['badge_template'] = IBadgrBadge(ext['badge_template'])
-    if 'evidence' in ext:
-        # Only concerning ourselves with NT evidence
-        evidence = ext['evidence'] or []
-        new_evidence = []
-        for evi in evidence:
-            if      evi.get('name') == NT_EVIDENCE_NTIID_ID \
-                and is_valid_ntiid_string(evi.get('id')):
-                new_evidence.append(IBadgrIdEvidence(evi))
-        ext['evidence'] = new_evidence
-    obj = AwardedBadgrBadge()
-    update_from_external_object(obj, ext)
-    return obj
+    # Awarded badges are never stored
+    return _AWARDED_BADGE_FIELDS.internalize(TransientAwardedBadgrBadge(), _data(ext))
+
+
+def _collection_fields(iface, item_factory):
+    return FieldMapping(iface,
+                        sources={'Items': 'data',
+                                 'badges_count': ('metadata', 'count'),
+                                 'total_badges_count': ('metadata', 'total_count'),
+                                 'current_page': ('metadata', 'current_page'),
+                                 'total_pages': ('metadata', 'total_pages')},
+                        converters={'Items': lambda data: [item_factory(x) for x in data]})
+
+_BADGE_COLLECTION_FIELDS = _collection_fields(IBadgrBadgeCollection,
+                                              _transient_badge)
+
+_AWARDED_BADGE_COLLECTION_FIELDS = _collection_fields(IAwardedBadgrBadgeCollection,
+                                                      _awarded_badgr_badge_factory)
 
 
 @component.adapter(dict)
 @interface.implementer(IBadgrBadgeCollection)
 def _badgr_badge_collection_factory(ext):
-    obj = BadgrBadgeCollection()
-    metadata = ext['metadata']
-    new_ext = dict()
-    new_ext['Items'] = [IBadgrBadge(x) for x in ext['data']]
-    new_ext['badges_count'] = metadata.get('count')
-    new_ext['total_badges_count'] = metadata.get('total_count')
-    new_ext['current_page'] = metadata.get('current_page')
-    new_ext['total_pages'] = metadata.get('total_pages')
-    update_from_external_object(obj, new_ext)
-    return obj
+    return _BADGE_COLLECTION_FIELDS.internalize(TransientBadgrBadgeCollection(), ext)
 
 
 @component.adapter(dict)
 @interface.implementer(IAwardedBadgrBadgeCollection)
 def _awarded_badgr_badge_collection_factory(ext):
-    obj = AwardedBadgrBadgeCollection()
-    metadata = ext['metadata']
-    new_ext = dict()
-    new_ext['Items'] = [IAwardedBadgrBadge(x) for x in ext['data']]
-    new_ext['badges_count'] = metadata.get('count')
-    new_ext['total_badges_count'] = metadata.get('total_count')
-    new_ext['current_page'] = metadata.get('current_page')
-    new_ext['total_pages'] = metadata.get('total_pages')
-    update_from_external_object(obj, new_ext)
-    return obj
+    return _AWARDED_BADGE_COLLECTION_FIELDS.internalize(TransientAwardedBadgrBadgeCollection(), ext)
+
+
+_ISSUER_COLLECTION_FIELDS = FieldMapping(IBadgrIssuerCollection,
+                                         sources={'issuers': 'result'},
+                                         converters={'issuers': lambda data: [IBadgrIssuer(x) for x in data]})
 
 
 @component.adapter(dict)
-@interface.implementer(IBadgrOrganizationCollection)
-def _badgr_organization_collection_factory(ext):
-    obj = BadgrOrganizationCollection()
-    new_ext = dict()
-    new_ext['organizations'] = [IBadgrOrganization(x) for x in ext['data']]
-    update_from_external_object(obj, new_ext)
-    return obj
+@interface.implementer(IBadgrIssuerCollection)
+def _badgr_issuer_collection_factory(ext):
+    return _ISSUER_COLLECTION_FIELDS.internalize(BadgrIssuerCollection(), ext)
 
 
 @WithRepr
-@interface.implementer(IBadgrOrganization)
-class BadgrOrganization(PersistentCreatedAndModifiedTimeObject,
-                          Contained,
-                          SchemaConfigured):
-    createDirectFieldProperties(IBadgrOrganization)
+@interface.implementer(IBadgrIssuer)
+class BadgrIssuer(PersistentCreatedAndModifiedTimeObject,
+                  Contained,
+                  SchemaConfigured):
+    createDirectFieldProperties(IBadgrIssuer)
 
     __parent__ = None
     __name__ = None
 
-    mimeType = mime_type = "application/vnd.nextthought.badgr.organization"
+    mimeType = mime_type = "application/vnd.nextthought.badgr.issuer"
 
 
 @WithRepr
@@ -174,15 +192,6 @@ class BadgrBadge(PersistentCreatedAndModifiedTimeObject,
         return to_external_ntiid_oid(self)
 
 
-@WithRepr
-@interface.implementer(IAwardedBadgrBadge)
-class AwardedBadgrBadge(SchemaConfigured):
-
-    createDirectFieldProperties(IAwardedBadgrBadge)
-
-    mimeType = mime_type = "application/vnd.nextthought.badgr.awardedbadge"
-
-
 @interface.implementer(IBadgrBadgeCollection)
 class BadgrBadgeCollection(SchemaConfigured):
 
@@ -192,6 +201,8 @@ class BadgrBadgeCollection(SchemaConfigured):
 
     badges = alias('Items')
 
+    content_hash = None
+
 
 @interface.implementer(IAwardedBadgrBadgeCollection)
 class AwardedBadgrBadgeCollection(SchemaConfigured):
@@ -202,13 +213,15 @@ class AwardedBadgrBadgeCollection(SchemaConfigured):
 
     badges = alias('Items')
 
+    content_hash = None
 
-@interface.implementer(IBadgrOrganizationCollection)
-class BadgrOrganizationCollection(SchemaConfigured):
 
-    createDirectFieldProperties(IBadgrOrganizationCollection)
+@interface.implementer(IBadgrIssuerCollection)
+class BadgrIssuerCollection(SchemaConfigured):
 
-    mimeType = mime_type = "application/vnd.nextthought.badgr.organizationcollection"
+    createDirectFieldProperties(IBadgrIssuerCollection)
+
+    mimeType = mime_type = "application/vnd.nextthought.badgr.issuercollection"
 
 
 @interface.implementer(IBadgrIdEvidence)
@@ -221,3 +234,12 @@ class BadgrIdEvidence(SchemaConfigured):
     id = alias('ntiid')
 
     type = u'IdEvidence'
+
+
+@WithRepr
+@interface.implementer(IBadgrBadgeAwardResult)
+class BadgrBadgeAwardResult(SchemaConfigured):
+
+    createDirectFieldProperties(IBadgrBadgeAwardResult)
+
+    mimeType = mime_type = "application/vnd.nextthought.badgr.badgeawardresult"
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Fast parsing of the ISO-8601 timestamps in Badgr payloads.
+
+Badgr timestamps (`created_at`, `updated_at`, ...) are always full
+ISO-8601 date-times, and a listing page repeats many of them (badge
+classes are shared across assertions, awards are often made in bulk).
+:func:`parse_datetime` handles that common form with a single regular
+expression, memoizing recent results; anything else falls back to
+:func:`nti.externalization.datetime.datetime_from_string`.
+
+Like that function, the result is a naive datetime in UTC.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import re
+
+from datetime import datetime
+from datetime import timedelta
+
+from nti.externalization.datetime import datetime_from_string
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The number of parsed timestamps memoized.
+MEMO_SIZE = 1024
+
+_ISO_8601 = re.compile(r'^(\d{4})-(\d{2})-(\d{2})'
+                       r'[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?'
+                       r'(Z|[+-]\d{2}(?::?\d{2})?)?$')
+
+_memo = {}
+
+
+def _offset(tz):
+    if tz is None or tz == 'Z':
+        return None
+    sign = -1 if tz[0] == '-' else 1
+    tz = tz[1:].replace(':', '')
+    return sign * timedelta(hours=int(tz[:2]), minutes=int(tz[2:] or 0))
+
+
+def _parse(value):
+    match = _ISO_8601.match(value)
+    if match is None:
+        return datetime_from_string(value)
+    year, month, day, hour, minute, second, fraction, tz = match.groups()
+    micros = int((fraction or '0')[:6].ljust(6, '0'))
+    result = datetime(int(year), int(month), int(day),
+                      int(hour), int(minute), int(second or 0),
+                      micros)
+    offset = _offset(tz)
+    if offset:
+        result -= offset
+    return result
+
+
+def parse_datetime(value):
+    """
+    Parse the ISO-8601 `value` to a naive UTC datetime.
+    """
+    try:
+        return _memo[value]
+    except KeyError:
+        pass
+    result = _parse(value)
+    if len(_memo) >= MEMO_SIZE:
+        _memo.clear()
+    _memo[value] = result
+    return result
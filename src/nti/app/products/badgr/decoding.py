@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Decoding of Badgr JSON responses.
+
+Responses are decoded with the fastest JSON library available (orjson,
+ujson, simplejson, then the standard library). Listing pages may
+instead be parsed incrementally, with ijson, so their `data` items can
+be handled one at a time as they are read off the wire.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import json
+import hashlib
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The JSON libraries we may decode with, fastest first.
+DECODERS = ('orjson', 'ujson', 'simplejson', 'json')
+
+
+def _import_decoder(name):
+    try:
+        module = __import__(name)
+    except ImportError:
+        return None
+    return module.loads
+
+
+def _default_decoder():
+    for name in DECODERS:
+        loads = _import_decoder(name)
+        if loads is not None:
+            return name, loads
+    return 'json', json.loads  # pragma: no cover
+
+_decoder_name, _loads = _default_decoder()
+
+
+def get_decoder_name():
+    return _decoder_name
+
+
+def set_decoder(name):
+    """
+    Decode with the named library (one of :data:`DECODERS`). Returns
+    False if it is not available.
+    """
+    global _decoder_name, _loads
+    loads = _import_decoder(name)
+    if loads is None:
+        return False
+    _decoder_name, _loads = name, loads
+    return True
+
+
+def loads(content):
+    """
+    Decode the JSON text or bytes.
+    """
+    if _decoder_name != 'orjson' and isinstance(content, bytes):
+        content = content.decode('utf-8')
+    return _loads(content)
+
+
+def decode_response(response):
+    """
+    Decode the body of the (`requests`) response.
+    """
+    if not response.content:
+        raise ValueError('Empty badgr response body')
+    return loads(response.content)
+
+
+def body_hash(body):
+    """
+    A digest of the (undecoded) response `body` bytes.
+    """
+    return hashlib.sha1(body).hexdigest()
+
+
+def content_hash(content):
+    """
+    A digest of the decoded JSON `content`, independent of key order.
+    """
+    content = json.dumps(content, sort_keys=True, separators=(',', ':'),
+                         default=str)
+    return hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+def can_stream():
+    return ijson is not None
+
+
+class _Builder(object):
+    """
+    Builds the value at `path` from ijson parse events.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.builder = None
+
+    def event(self, path, event, value):
+        """
+        Feed a parse event; returns True once the value is complete.
+        """
+        if self.builder is not None:
+            self.builder.event(event, value)
+            return path == self.path and event in ('end_map', 'end_array')
+        if path != self.path:
+            return False
+        self.builder = ijson.ObjectBuilder()
+        self.builder.event(event, value)
+        return event not in ('start_map', 'start_array')
+
+    @property
+    def value(self):
+        return self.builder.value
+
+
+class StreamedPage(object):
+    """
+    Iterates over the `data` items of a listing page as they are parsed
+    from the response. The page's `metadata` is available once iteration
+    completes.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.metadata = None
+
+    def _iter_streamed(self):
+        raw = self.response.raw
+        # Let urllib3 undo any content encoding
+        raw.decode_content = True
+        item = _Builder('data.item')
+        metadata = _Builder('metadata')
+        for path, event, value in ijson.parse(raw, use_float=True):
+            if metadata.event(path, event, value):
+                self.metadata = metadata.value
+                metadata = _Builder('metadata')
+            elif item.event(path, event, value):
+                yield item.value
+                item = _Builder('data.item')
+
+    def __iter__(self):
+        try:
+            if ijson is None:
+                result = decode_response(self.response)
+                self.metadata = result.get('metadata')
+                for item in result.get('data') or ():
+                    yield item
+            else:
+                for item in self._iter_streamed():
+                    yield item
+        finally:
+            self.response.close()
+        if self.metadata is None:
+            self.metadata = {}
@@ -122,7 +122,8 @@ class _BadgeDecorator(AbstractAuthenticatedRequestAwareDecorator):
 
     def _do_decorate_external(self, context, mapping):
         integration = component.queryUtility(IBadgrIntegration)
-        current_organization_id = getattr(integration.organization, 'organization_id', None)
+        issuer = getattr(integration, 'issuer', None)
+        current_organization_id = getattr(issuer, 'entity_id', None)
         mapping['InvalidOrganization'] =   not current_organization_id \
                                         or context.organization_id != current_organization_id
 
@@ -149,3 +150,6 @@ class _BadgePageDecorator(Singleton):
     def decorateExternalMapping(self, context, mapping):
         mapping[ITEM_COUNT] = context.badges_count
         mapping[TOTAL] = context.total_badges_count
+        if getattr(context, 'stale', False):
+            # Let clients know this is degraded, possibly empty, data
+            mapping['Stale'] = True
@@ -8,9 +8,13 @@ from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
 
+import functools
+
 from zope import component
 from zope import interface
 
+from zope.annotation.interfaces import IAttributeAnnotatable
+
 from zope.component.hooks import getSite
 
 from zope.container.contained import Contained
@@ -29,8 +33,15 @@ from nti.app.products.badgr import BADGR_INTEGRATION_NAME
 from nti.app.products.badgr.interfaces import IBadgrIntegration
 from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
 
+from nti.app.products.badgr import token_cache
+
+from nti.app.products.badgr.sessions import get_session
+from nti.app.products.badgr.sessions import close_session
+
 from nti.app.products.badgr.utils import get_auth_tokens
 
+from nti.common.interfaces import IOAuthKeys
+
 from nti.dataserver.interfaces import IRedisClient
 
 from nti.dublincore.time_mixins import PersistentCreatedAndModifiedTimeObject
@@ -90,7 +101,7 @@ def _auth_badgr_factory(access_data):
 
 
 @WithRepr
-@interface.implementer(IBadgrAuthorizedIntegration)
+@interface.implementer(IBadgrAuthorizedIntegration, IAttributeAnnotatable)
 class BadgrAuthorizedIntegration(AbstractOAuthAuthorizedIntegration,
                                  PersistentCreatedAndModifiedTimeObject,
                                  SchemaConfigured):
@@ -107,20 +118,79 @@ class BadgrAuthorizedIntegration(AbstractOAuthAuthorizedIntegration,
     access_token_expiry = 60 * 60 * 24
     # ? days for refresh token (assume 30 days)
     refresh_token_expiry = 60 * 60 * 24 * 30
+    # Refresh the access token in the background this many seconds
+    # before it expires
+    access_token_refresh_margin = 60 * 60
+
+    # HTTP connection pooling for Badgr calls made with this integration
+    http_pool_connections = 4
+    http_pool_maxsize = 16
+    http_max_idle = 60 * 5
+
+    # Seconds the badge class catalog is served from cache before
+    # being revalidated with Badgr
+    catalog_cache_ttl = 60 * 10
+
+    # Seconds a user's awarded badges are served from cache; entries
+    # are invalidated when a badge is awarded to the user
+    awarded_badges_cache_ttl = 60 * 5
+
+    # Coalesce identical concurrent Badgr GETs across the cluster (through
+    # redis) rather than only within each process
+    single_flight_cluster = False
+
+    # Max concurrent Badgr calls when awarding a badge to many users
+    award_max_workers = 8
+
+    # Max concurrent page fetches when fetching all pages
+    page_max_workers = 4
+
+    # Seconds to wait for a connection to, and then a response from,
+    # Badgr; a call's read timeout is also capped by the time left
+    # before its retry deadline
+    connect_timeout = 5
+    read_timeout = 30
+
+    # Fail fast for `circuit_reset_timeout` seconds after this many
+    # Badgr failures within `circuit_failure_window` seconds
+    circuit_failure_threshold = 5
+    circuit_failure_window = 60
+    circuit_reset_timeout = 30
+
+    # Volatile; cached per process, never persisted
+    _v_intid = None
 
     @property
-    def _key_base_name(self):
-        intids = component.getUtility(IIntIds)
-        intid = intids.getId(self)
+    def key_base_name(self):
+        """
+        The base of the redis keys (tokens, rate limit, circuit breaker)
+        and the session key of this integration, unique across sites.
+        """
+        intid = self._v_intid
+        if intid is None:
+            intids = component.getUtility(IIntIds)
+            intid = self._v_intid = intids.getId(self)
         return 'badgr/tokens/%s/%s' % (getSite().__name__, intid)
 
     @property
     def _access_token_key_name(self):
-        return '%s/%s' % (self._key_base_name, 'access_token')
+        return '%s/%s' % (self.key_base_name, 'access_token')
 
     @property
     def _refresh_token_key_name(self):
-        return '%s/%s' % (self._key_base_name, 'refresh_token')
+        return '%s/%s' % (self.key_base_name, 'refresh_token')
+
+    @property
+    def tokens(self):
+        """
+        The :class:`BadgrTokens` of this integration, which may be used
+        from any thread.
+        """
+        return BadgrTokens(self.key_base_name,
+                           session_factory=self.session_factory,
+                           lock_timeout=self.lock_timeout,
+                           access_token_expiry=self.access_token_expiry,
+                           refresh_token_expiry=self.refresh_token_expiry)
 
     def store_tokens(self, access_token, refresh_token):
         """
@@ -128,50 +198,167 @@ class BadgrAuthorizedIntegration(AbstractOAuthAuthorizedIntegration,
         tokens. This should only be called with appropriate safeguarding of
         concurrency.
         """
-        self._redis_client.setex(self._access_token_key_name,
-                                 time=self.access_token_expiry,
-                                 value=access_token)
-        self._redis_client.setex(self._refresh_token_key_name,
-                                 time=self.refresh_token_expiry,
-                                 value=refresh_token)
+        self.tokens.store_tokens(access_token, refresh_token)
+
+    @property
+    def access_token(self):
+        return self.tokens.access_token
+
+    def get_access_token(self):
+        return self.access_token
+
+    @property
+    def refresh_token(self):
+        return self.tokens.refresh_token
+
+    def get_refresh_token(self):
+        return self.refresh_token
+
+    @property
+    def _rate_limit_key(self):
+        return '%s/%s' % (self.key_base_name, 'ratelimit')
+
+    @property
+    def _circuit_key(self):
+        return '%s/%s' % (self.key_base_name, 'circuit')
+
+    @property
+    def _session_key(self):
+        return self.key_base_name
+
+    @property
+    def session_factory(self):
+        """
+        A callable returning the pooled session for this integration,
+        which may be called from any thread.
+        """
+        return functools.partial(get_session,
+                                 self._session_key,
+                                 pool_connections=self.http_pool_connections,
+                                 pool_maxsize=self.http_pool_maxsize,
+                                 max_idle=self.http_max_idle)
+
+    @property
+    def session(self):
+        """
+        The pooled, keep-alive :class:`requests.Session` for this integration.
+        """
+        return self.session_factory()
+
+    def close_session(self):
+        """
+        Close the pooled connections for this integration; used when the
+        integration is removed or re-authorized.
+        """
+        return close_session(self._session_key)
+
+    def update_tokens(self, old_access_token=None):
+        return self.tokens.update_tokens(old_access_token)
+
+    def refresh_tokens_if_expiring(self, margin=None):
+        """
+        Proactively refresh the tokens if the access token expires within
+        `margin` seconds, so that foreground requests never have to.
+        Returns True if the tokens were refreshed.
+        """
+        if margin is None:
+            margin = self.access_token_refresh_margin
+        return self.tokens.refresh_tokens_if_expiring(margin)
+
+
+class BadgrTokens(object):
+    """
+    The tokens of an authorized integration, held in redis.
+
+    This holds only plain values resolved from the (persistent)
+    integration, so it may be used from worker threads, which must
+    never load persistent objects.
+    """
+
+    def __init__(self, key_base_name, session_factory=get_session,
+                 lock_timeout=60 * 3, access_token_expiry=60 * 60 * 24,
+                 refresh_token_expiry=60 * 60 * 24 * 30, auth_keys=None):
+        self.key_base_name = key_base_name
+        self.session_factory = session_factory
+        self.lock_timeout = lock_timeout
+        self.access_token_expiry = access_token_expiry
+        self.refresh_token_expiry = refresh_token_expiry
+        # Site-specific, so resolved now rather than in a worker
+        self.auth_keys = auth_keys or component.queryUtility(IOAuthKeys, name="badgr")
+
+    @property
+    def access_token_key_name(self):
+        return '%s/%s' % (self.key_base_name, 'access_token')
+
+    @property
+    def refresh_token_key_name(self):
+        return '%s/%s' % (self.key_base_name, 'refresh_token')
 
     @property
     def _redis_client(self):
         return component.getUtility(IRedisClient)
 
+    def store_tokens(self, access_token, refresh_token):
+        self._redis_client.setex(self.access_token_key_name,
+                                 time=self.access_token_expiry,
+                                 value=access_token)
+        self._redis_client.setex(self.refresh_token_key_name,
+                                 time=self.refresh_token_expiry,
+                                 value=refresh_token)
+        # Other processes must drop their cached access token
+        token_cache.evict(self.access_token_key_name)
+
     @property
     def access_token(self):
-        result = self._redis_client.get(self._access_token_key_name)
+        result = token_cache.get_access_token(self.access_token_key_name,
+                                              self._redis_client)
         if result is None:
             result = self.update_tokens()
         return result
 
-    def get_access_token(self):
-        return self.access_token
-
     @property
     def refresh_token(self):
         # This should never be None
-        return self._redis_client.get(self._refresh_token_key_name)
-
-    def get_refresh_token(self):
-        return self.refresh_token
+        return self._redis_client.get(self.refresh_token_key_name)
 
     @property
     def _lock(self):
-        return self._redis_client.lock(self._key_base_name,
+        return self._redis_client.lock(self.key_base_name,
                                        self.lock_timeout)
 
+    def _fetch_tokens(self):
+        access_token, refresh_token = get_auth_tokens(self.refresh_token,
+                                                      session=self.session_factory(),
+                                                      auth_keys=self.auth_keys)
+        self.store_tokens(access_token, refresh_token)
+        return access_token
+
     def update_tokens(self, old_access_token=None):
         with self._lock:
             # Someone may beat us; if so, use their new token
-            current_access_token = self._redis_client.get(self._access_token_key_name)
+            current_access_token = self._redis_client.get(self.access_token_key_name)
             if     not current_access_token \
                 or current_access_token == old_access_token:
                 # First one here, update and store
-                access_token, refresh_token = get_auth_tokens(self.refresh_token)
-                self.store_tokens(access_token, refresh_token)
-                result = access_token
+                result = self._fetch_tokens()
             else:
                 result = current_access_token
-        return result
\ No newline at end of file
+        return result
+
+    def refresh_tokens_if_expiring(self, margin):
+        redis = self._redis_client
+        access_token_key_name = self.access_token_key_name
+
+        def _expiring():
+            # -2 if missing, -1 if no expiry
+            ttl = redis.ttl(access_token_key_name)
+            return ttl is None or ttl == -2 or 0 <= ttl < margin
+
+        if not _expiring():
+            return False
+        with self._lock:
+            # Someone may beat us
+            if not _expiring():
+                return False
+            self._fetch_tokens()
+        return True
@@ -14,6 +14,10 @@ from zope import interface
 
 from zope.annotation.interfaces import IAttributeAnnotatable
 
+from nti.app.products.badgr import DEFAULT_RATE_LIMIT
+from nti.app.products.badgr import DEFAULT_RATE_LIMIT_BURST
+from nti.app.products.badgr import DEFAULT_RATE_LIMIT_TIMEOUT
+
 from nti.app.products.integration.interfaces import IIntegration
 from nti.app.products.integration.interfaces import IOAuthAuthorizedIntegration
 
@@ -114,6 +118,23 @@ class IBadgrAuthorizedIntegration(IOAuthAuthorizedIntegration,
     An :class:`IOAuthAuthorizedIntegration` for badgr.
     """
 
+    rate_limit = Int(title=u"Badgr calls per second",
+                     description=u"Shared by all processes using this integration; 0 does not limit calls.",
+                     required=True,
+                     min=0,
+                     default=DEFAULT_RATE_LIMIT)
+
+    rate_limit_burst = Int(title=u"Badgr calls allowed in a burst",
+                           required=True,
+                           min=1,
+                           default=DEFAULT_RATE_LIMIT_BURST)
+
+    rate_limit_timeout = Int(title=u"Seconds to wait for a Badgr call slot",
+                             description=u"None waits indefinitely; 0 fails fast.",
+                             required=False,
+                             min=0,
+                             default=DEFAULT_RATE_LIMIT_TIMEOUT)
+
 
 class IBadgrClient(interface.Interface):
     """
@@ -121,14 +142,14 @@ class IBadgrClient(interface.Interface):
     specific access_token. All badge calls must have an issuer id.
     """
 
-    def get_issuers(issuer_id):
+    def get_issuer(issuer_id):
         """
         Get the :class:`IBadgrIssuer` for this issuer id.
         """
 
     def get_issuers():
         """
-        Get all :class:`IBadgrIssuer` objects.
+        Get the :class:`IBadgrIssuerCollection` of all issuers.
         """
 
     def get_badge(badge_template_id):
@@ -136,25 +157,54 @@ class IBadgrClient(interface.Interface):
         Get the :class:`IBadgrBadge` associated with the template id.
         """
 
-    def get_badges(sort=None, filters=None, page=None):
+    def get_badges(sort=None, filters=None, page=None, all_pages=False,
+                   batch_start=None, batch_size=None):
         """
-        Return an :class:`IBadgrBadgeCollection`.
+        Return an :class:`IBadgrBadgeCollection`. If `all_pages`, the
+        remaining pages are fetched concurrently once the page count is
+        known, and merged into a single collection. If `batch_size`, the
+        collection holds that slice of all badges rather than a page.
 
         https://www.yourbadgr.com/docs/badge_templates
         """
 
-    def get_awarded_badges(user, sort=None, filters=None, page=None, public_only=None, accepted_only=False):
+    def get_awarded_badges(user, sort=None, filters=None, page=None, public_only=None,
+                           accepted_only=False, all_pages=False, batch_start=None,
+                           batch_size=None):
         """
-        Return an :class:`IAwardedBadgrBadgeCollection`.
+        Return an :class:`IAwardedBadgrBadgeCollection`. If `all_pages`, the
+        remaining pages are fetched concurrently once the page count is
+        known, and merged into a single collection. If `batch_size`, the
+        collection holds that slice of all badges rather than a page.
 
         public_only - only return public badges
         https://www.yourbadgr.com/docs/issued_badges filtered by user email.
         """
 
+    def iter_badges(sort=None, filters=None, stream=False):
+        """
+        Yield every :class:`IBadgrBadge`, across all pages. The next page is
+        fetched while the current one is consumed. If `stream`, each badge
+        is instead internalized as it is parsed from the response.
+        """
+
+    def iter_awarded_badges(user, sort=None, filters=None, public_only=None,
+                            accepted_only=False, stream=False):
+        """
+        Yield every :class:`IAwardedBadgrBadge` of the user, across all
+        pages. The next page is fetched while the current one is consumed.
+        If `stream`, each badge is instead internalized as it is parsed
+        from the response.
+        """
+
     def award_badge(user, badge_template_id, suppress_badge_notification_email=False,
                     locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
         """
-        Award a badge to a user.
+        Queue the award of a badge to a user, to be sent to Badgr after
+        the current transaction commits, returning the
+        :class:`IBadgrPendingAward`. Raises
+        :class:`DuplicateBadgrBadgeAwardedError` if the user is known to
+        hold the badge.
 
         evidence_ntiid - ntiid of object awarding the badge
         evidence_title - evidence title
@@ -162,6 +212,70 @@ class IBadgrClient(interface.Interface):
         https://www.yourbadgr.com/docs/issued_badges
         """
 
+    def award_badges(users, badge_template_id, suppress_badge_notification_email=False,
+                     locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        """
+        Queue the award of a badge to many users, as :meth:`award_badge`.
+        Returns a sequence of :class:`IBadgrBadgeAwardResult`, in the order
+        of the given users, each queued or (if known to the award ledger)
+        a duplicate.
+        """
+
+    def get_award_data(user, badge_template_id, suppress_badge_notification_email=False,
+                       locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        """
+        The JSON to send to Badgr to award the badge to the user.
+        """
+
+    def post_award(data):
+        """
+        Send the award data to Badgr, returning the awarded badge JSON.
+        Only the award outbox should send awards.
+        """
+
+    def post_awards(award_data, max_workers=None):
+        """
+        Send many awards to Badgr, with at most `max_workers` concurrent
+        calls, returning the awarded badge JSON (or the error raised) of
+        each, in order. Only the award outbox should send awards.
+        """
+
+
+class IBadgrResponseCache(interface.Interface):
+    """
+    A cache of decoded Badgr API responses, grouped by namespace.
+    """
+
+    def get(namespace, key):
+        """
+        Return the cache entry (with `value`, `etag`, `content_hash` and
+        `fresh` attributes) for the key, or None. Stale entries are returned
+        so that they may be revalidated.
+        """
+
+    def set(namespace, key, value, etag=None, ttl=None, content_hash=None):
+        """
+        Cache the value (with its ETag and the digest of the response it was
+        decoded from) for `ttl` seconds.
+        """
+
+    def touch(namespace, key, ttl=None):
+        """
+        Mark the entry fresh for another `ttl` seconds.
+        """
+
+    def invalidate(namespace, key=None):
+        """
+        Drop the entry for the key, or the entire namespace if no key is given.
+        """
+
+
+class IBadgrRepresentationCache(IBadgrResponseCache):
+    """
+    A process-local cache of the externalized collections of the Badgr
+    views; these hold objects (e.g. links) that are not JSON.
+    """
+
 
 class IBadgrBadge(IBadgrType):
     """
@@ -222,6 +336,198 @@ class IAwardedBadgrBadge(IBadgrType):
                            min_length=0)
 
 
+class IBadgrBadgeAwardResult(interface.Interface):
+    """
+    The outcome of awarding a badge to a single user in a bulk award.
+    """
+
+    username = ValidTextLine(title=u"The username",
+                             required=True)
+
+    status = ValidTextLine(title=u"Award status",
+                           description=u"Status - awarded, duplicate, failed",
+                           required=True)
+
+    awarded_badge = Object(IAwardedBadgrBadge,
+                           title=u'The awarded badge.',
+                           required=False)
+
+    error = ValidText(title=u"The error message, if the award failed",
+                      required=False)
+
+
+class IBadgrPendingAward(ILastModified):
+    """
+    A badge award queued in the :class:`IBadgrAwardOutbox`.
+    """
+
+    idempotency_key = ValidTextLine(title=u"Idempotency key",
+                                    description=u"Derived from the user, badge and evidence",
+                                    required=True)
+
+    username = ValidTextLine(title=u"The username",
+                             required=True)
+
+    user_intid = Int(title=u"The user intid",
+                     required=True)
+
+    badge_template_id = ValidTextLine(title=u"The badge to award",
+                                      required=True)
+
+    suppress_badge_notification_email = Bool(title=u"Suppress badge notification email",
+                                             required=False,
+                                             default=False)
+
+    locale = ValidTextLine(title=u"Badge user locale",
+                           required=False)
+
+    evidence_ntiid = ValidTextLine(title=u"Evidence ntiid",
+                                   required=False)
+
+    evidence_title = ValidTextLine(title=u"Evidence title",
+                                   required=False)
+
+    evidence_desc = ValidText(title=u"Evidence description",
+                              required=False)
+
+    state = ValidTextLine(title=u"Award state",
+                          description=u"State - queued, sending, sent, duplicate, failed",
+                          required=True)
+
+    attempts = Int(title=u"Send attempts",
+                   required=True,
+                   default=0)
+
+    next_attempt = ValidDatetime(title=u"Do not send before",
+                                 required=False)
+
+    lease_expires = ValidDatetime(title=u"A sending award may be reclaimed after",
+                                  required=False)
+
+    last_error = ValidText(title=u"The last send error",
+                           required=False)
+
+    awarded_badge_id = ValidTextLine(title=u"The awarded badge entity_id",
+                                     required=False)
+
+
+class IBadgrAwardOutbox(interface.Interface):
+    """
+    A durable queue of badge awards, sent to Badgr after the transaction
+    that queued them commits.
+    """
+
+    def queue_award(user, badge_template_id, suppress_badge_notification_email=False,
+                    locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        """
+        Queue the award, returning the :class:`IBadgrPendingAward`. Queueing
+        an award with the same idempotency key as an existing one returns
+        the existing award.
+        """
+
+    def claim(limit=None):
+        """
+        Mark up to `limit` due awards as sending and return them.
+        """
+
+    def record(idempotency_key, state, awarded_badge_id=None, error=None):
+        """
+        Record the outcome of sending a claimed award.
+        """
+
+    def values(state=None):
+        """
+        Return all awards, optionally only those in the given state.
+        """
+
+
+class IBadgrAwardLedger(interface.Interface):
+    """
+    The badges this site has awarded, indexed by user intid and badge
+    class entity_id.
+    """
+
+    def record_award(user_intid, badge_template_id):
+        """
+        Record that the user holds the badge.
+        """
+
+    def remove_award(user_intid, badge_template_id):
+        """
+        Forget that the user holds the badge.
+        """
+
+    def remove_user(user_intid):
+        """
+        Forget all badges held by the user.
+        """
+
+    def has_award(user_intid, badge_template_id):
+        """
+        Whether the user is known to hold the badge.
+        """
+
+    def awarded_badges(user_intid):
+        """
+        Return the badge class entity_ids the user is known to hold.
+        """
+
+    def awarded_intids(badge_template_id, user_intids=None):
+        """
+        Return the set of user intids known to hold the badge, restricted
+        to `user_intids`, if given.
+        """
+
+
+class IBadgrAssertionMirror(interface.Interface):
+    """
+    A local copy of the badges issued by an organization, indexed by
+    recipient email, user intid, badge class and state.
+    """
+
+    last_synced = ValidDatetime(title=u"When the mirror was last synced",
+                                required=False)
+
+    is_warm = Bool(title=u"Whether the mirror has been synced and may answer queries",
+                   readonly=True)
+
+    sync_watermark = ValidTextLine(title=u"The newest updated_at synced",
+                                   required=False)
+
+    sync_page = Int(title=u"The page of assertions updated since the watermark to sync next",
+                    required=True,
+                    default=1)
+
+    def upsert(data, user_intid=None):
+        """
+        Add or replace the awarded badge described by the JSON `data`.
+        """
+
+    def remove(entity_id):
+        """
+        Remove the awarded badge.
+        """
+
+    def query(emails=(), user_intid=None, badge_template_id=None,
+              states=None, public_only=False):
+        """
+        Return the records of the awarded badges of the recipient (by any
+        of `emails` or by `user_intid`), optionally only of the badge, in
+        one of `states` and public.
+        """
+
+    def mark_synced(now=None):
+        """
+        Record that the mirror is current.
+        """
+
+    def clear():
+        """
+        Drop all awarded badges, leaving the mirror cold. The next sync is
+        a full resync.
+        """
+
+
 class IBadgePageMetadata(interface.Interface):
     """
     Badge page metadata.
@@ -239,6 +545,14 @@ class IBadgePageMetadata(interface.Interface):
     total_pages = Int(title=u"Total page count",
                       required=True)
 
+    stale = Bool(title=u"Stale",
+                 description=u"Served from cache (or empty) while Badgr is unavailable",
+                 required=False,
+                 default=False)
+
+    content_hash = interface.Attribute(u"A digest of the Badgr responses (or mirror records) "
+                                       u"this page was built from, or None.")
+
 
 class IBadgrBadgeCollection(IBadgePageMetadata):
 
@@ -286,6 +600,20 @@ class MissingBadgrOrganizationError(BadgrClientError):
     """
 
 
+class BadgrRateLimitExceededError(BadgrClientError):
+    """
+    Raised when a Badgr call could not be made within its deadline
+    because the cluster-wide rate limit was reached.
+    """
+
+
+class BadgrCircuitOpenError(BadgrClientError):
+    """
+    Raised, without calling Badgr, while the circuit breaker for the
+    integration is open because Badgr is failing.
+    """
+
+
 class DuplicateBadgrBadgeAwardedError(Exception):
     """
     Issued when a badge is awarded to a user, but the user has already
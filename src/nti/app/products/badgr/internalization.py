@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Internalization of Badgr API payloads.
+
+In *strict* mode, objects are updated with
+:func:`update_from_external_object`, validating every field. Payloads
+from the authenticated Badgr API are trusted, so in *trusted* mode (the
+default) each field is instead assigned directly, through a coercion
+compiled once per :class:`FieldMapping` from the field's type. A sample of trusted
+objects (`sample_rate`) is validated after the fact, logging any
+errors, so schema drift in Badgr's responses is still noticed.
+
+Tests should use strict mode.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import random
+
+import six
+
+from zope.schema import Int
+from zope.schema import Bool
+from zope.schema import Text
+from zope.schema import Datetime
+from zope.schema import TextLine
+
+from zope.schema import getFieldsInOrder
+from zope.schema import getValidationErrors
+
+from zope.testing.cleanup import addCleanUp
+
+from nti.app.products.badgr.datetimes import parse_datetime
+
+from nti.base._compat import text_
+
+from nti.externalization.internalization import update_from_external_object
+
+logger = __import__('logging').getLogger(__name__)
+
+STRICT = 'strict'
+TRUSTED = 'trusted'
+
+#: The fraction of trusted objects validated.
+DEFAULT_SAMPLE_RATE = 0.01
+
+_mode = TRUSTED
+_sample_rate = DEFAULT_SAMPLE_RATE
+
+_marker = object()
+
+#: interface -> the default :class:`FieldMapping`
+_mappings = {}
+
+
+def get_internalization_mode():
+    return _mode
+
+
+def set_internalization_mode(mode, sample_rate=DEFAULT_SAMPLE_RATE):
+    global _mode, _sample_rate
+    if mode not in (STRICT, TRUSTED):
+        raise ValueError('Unknown internalization mode %r' % mode)
+    _mode = mode
+    _sample_rate = sample_rate
+
+
+def _coerce_text(value):
+    if value is None or isinstance(value, six.text_type):
+        return value
+    return text_(value)
+
+
+def _coerce_int(value):
+    return value if value is None else int(value)
+
+
+def _coerce_bool(value):
+    return value if value is None else bool(value)
+
+
+def _coerce_datetime(value):
+    if value is None or not isinstance(value, six.string_types):
+        return value
+    return parse_datetime(value)
+
+
+def _identity(value):
+    return value
+
+
+def _coercion(field):
+    # Datetime before the text types; order matters for subclasses
+    for field_type, coerce in ((Datetime, _coerce_datetime),
+                               (Bool, _coerce_bool),
+                               (Int, _coerce_int),
+                               (TextLine, _coerce_text),
+                               (Text, _coerce_text)):
+        if isinstance(field, field_type):
+            return coerce
+    # Object and sequence values are internalized by our factories
+    return _identity
+
+
+class FieldMapping(object):
+    """
+    A table of where the fields of `iface` are read from in a Badgr
+    payload, compiled once.
+
+    By default a field is read from the key of the same name. `sources`
+    may map a name (a field of `iface`, or any other attribute to set)
+    to a different key, or to a tuple path of keys into nested objects;
+    `converters` may map a name to a callable applied to the value read.
+    Names whose source is missing from the payload are left unset.
+
+    Payloads are only read, never modified, so the same (e.g. cached)
+    JSON may be internalized any number of times.
+    """
+
+    def __init__(self, iface, sources=None, converters=None):
+        self.iface = iface
+        sources = dict(sources or {})
+        converters = converters or {}
+        fields = dict(getFieldsInOrder(iface))
+        names = [name for name, field in getFieldsInOrder(iface)
+                 if not field.readonly]
+        names.extend(x for x in sorted(sources) if x not in fields)
+        table = []
+        for name in names:
+            source = sources.get(name, name)
+            if not isinstance(source, tuple):
+                source = (source,)
+            coerce = converters.get(name)
+            if coerce is None:
+                field = fields.get(name)
+                coerce = _coercion(field) if field is not None else _identity
+            table.append((name, source, coerce))
+        #: ((name, key path, coerce), ...)
+        self.table = tuple(table)
+        #: The names set on the object, rather than given to the
+        #: schema in strict mode.
+        self.extra = frozenset(x for x in names if x not in fields)
+
+    def read(self, ext):
+        """
+        Yield the (name, value) pairs read from `ext`, coerced.
+        """
+        for name, path, coerce in self.table:
+            value = ext
+            for key in path:
+                if not isinstance(value, dict):
+                    break
+                value = value.get(key, _marker)
+                if value is _marker:
+                    break
+            else:
+                yield name, coerce(value)
+
+    def internalize(self, obj, ext):
+        """
+        Update `obj` from the `ext`, in the current mode. Returns `obj`.
+        """
+        if _mode == STRICT:
+            values = {}
+            for name, value in self.read(ext):
+                if name in self.extra:
+                    setattr(obj, name, value)
+                else:
+                    values[name] = value
+            update_from_external_object(obj, values)
+            return obj
+        setter = _setter(obj)
+        for name, value in self.read(ext):
+            setter(name, value)
+        if _sample_rate and random.random() < _sample_rate:
+            _validate_sample(obj, self.iface)
+        return obj
+
+
+def _setter(obj):
+    # Bypass (validating) field properties, which store in the
+    # instance dict; slotted objects have no field properties.
+    try:
+        return obj.__dict__.__setitem__
+    except AttributeError:
+        return lambda name, value: setattr(obj, name, value)
+
+
+def _validate_sample(obj, iface):
+    errors = getValidationErrors(iface, obj)
+    if errors:
+        logger.warn('Badgr payload failed validation (%s) (%s)',
+                    iface.__name__, errors)
+
+
+def internalize(obj, ext, iface):
+    """
+    Update `obj` from the `ext` (a Badgr payload) per the fields of
+    `iface`, in the current mode. Returns `obj`.
+    """
+    mapping = _mappings.get(iface)
+    if mapping is None:
+        mapping = _mappings[iface] = FieldMapping(iface)
+    return mapping.internalize(obj, ext)
+
+
+def _reset():
+    set_internalization_mode(TRUSTED)
+
+
+addCleanUp(_reset)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A local ledger of the badges this site has awarded, so known duplicate
+awards can be refused without a round trip to Badgr.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import BTrees
+
+from BTrees.Length import Length
+
+from persistent import Persistent
+
+from zope import component
+from zope import interface
+
+from zope.container.contained import Contained
+
+from nti.app.products.badgr.interfaces import IBadgrAwardLedger
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+
+from nti.app.products.badgr.utils import site_local_factory
+
+LEDGER_NAME = 'nti.app.products.badgr.ledger.BadgrAwardLedger'
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@interface.implementer(IBadgrAwardLedger)
+class BadgrAwardLedger(Persistent, Contained):
+    """
+    Indexed both ways: badge entity_id -> set of user intids, and user
+    intid -> set of badge entity_ids.
+    """
+
+    family = BTrees.family64
+
+    def __init__(self):
+        self._by_badge = self.family.OO.BTree()
+        self._by_user = self.family.IO.BTree()
+        self._length = Length()
+
+    def __len__(self):
+        return self._length()
+
+    def record_award(self, user_intid, badge_template_id):
+        intids = self._by_badge.get(badge_template_id)
+        if intids is None:
+            intids = self._by_badge[badge_template_id] = self.family.II.TreeSet()
+        badges = self._by_user.get(user_intid)
+        if badges is None:
+            badges = self._by_user[user_intid] = self.family.OO.TreeSet()
+        intids.add(user_intid)
+        if badges.add(badge_template_id):
+            self._length.change(1)
+
+    def remove_award(self, user_intid, badge_template_id):
+        intids = self._by_badge.get(badge_template_id)
+        if intids is not None:
+            intids.discard(user_intid)
+            if not intids:
+                del self._by_badge[badge_template_id]
+        badges = self._by_user.get(user_intid)
+        if badges is not None and badge_template_id in badges:
+            badges.remove(badge_template_id)
+            self._length.change(-1)
+            if not badges:
+                del self._by_user[user_intid]
+
+    def remove_user(self, user_intid):
+        for badge_template_id in tuple(self.awarded_badges(user_intid)):
+            self.remove_award(user_intid, badge_template_id)
+
+    def has_award(self, user_intid, badge_template_id):
+        intids = self._by_badge.get(badge_template_id)
+        return intids is not None and user_intid in intids
+
+    def awarded_badges(self, user_intid):
+        return self._by_user.get(user_intid, ())
+
+    def awarded_intids(self, badge_template_id, user_intids=None):
+        intids = self._by_badge.get(badge_template_id)
+        if intids is None:
+            return self.family.II.TreeSet()
+        if user_intids is None:
+            return intids
+        if not isinstance(user_intids, (self.family.II.Set, self.family.II.TreeSet)):
+            user_intids = self.family.II.TreeSet(user_intids)
+        return self.family.II.intersection(intids, user_intids)
+
+
+_BadgrAwardLedgerFactory = site_local_factory(BadgrAwardLedger, LEDGER_NAME)
+
+
+def get_award_ledger(integration=None):
+    integration = integration or component.queryUtility(IBadgrAuthorizedIntegration)
+    return IBadgrAwardLedger(integration, None)
@@ -0,0 +1,373 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A site-local mirror of the badges issued by the integration's
+organization, so awarded badges can be listed without calling Badgr.
+
+The mirror stores the awarded badge JSON as Badgr returns it, less its
+inline (base64) images, indexed by recipient email, user intid, badge
+class and state. It is *cold* (and must not be used to answer queries)
+until a sync has completed.
+
+A user's badges are those awarded to them (by intid) or to any of their
+addresses: their profile and contact emails, and the recipient emails of
+the badges awarded to them, which Badgr matches as one account.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import hashlib
+
+from datetime import datetime
+
+import BTrees
+
+import six
+
+from persistent import Persistent
+
+from zope import component
+from zope import interface
+
+from zope.container.contained import Contained
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.products.badgr.interfaces import IBadgrAssertionMirror
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+from nti.app.products.badgr.interfaces import IAwardedBadgrBadgeCollection
+
+from nti.app.products.badgr.utils import site_local_factory
+
+from nti.dataserver.users.interfaces import IUserProfile
+
+MIRROR_NAME = 'nti.app.products.badgr.mirror.BadgrAssertionMirror'
+
+#: The page size of mirror query results, matching Badgr's.
+DEFAULT_PAGE_SIZE = 50
+
+#: The filters (from the awarded badge views) the mirror can answer.
+NAME_FILTER_KEY = 'badge_templates[name]'
+
+#: The sort keys the mirror can answer, to the JSON path of their value.
+SORT_KEYS = {
+    'created_at': ('created_at',),
+    'updated_at': ('updated_at',),
+    'issued_at': ('issued_at',),
+    'state_updated_at': ('state_updated_at',),
+    'badge_templates[name]': ('badge_template', 'name'),
+}
+
+#: The keys of inline images, left out of the mirrored JSON; badge
+#: templates keep their `image_url`.
+IMAGE_KEYS = ('image_string',)
+
+#: The profile fields holding a user's email addresses.
+EMAIL_FIELDS = ('email', 'contact_email')
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _lower(value):
+    return value.lower() if isinstance(value, six.string_types) else value
+
+
+def _json_value(data, path):
+    for name in path:
+        data = data.get(name) if isinstance(data, dict) else None
+    return data
+
+
+def _strip_images(data):
+    if isinstance(data, dict):
+        return dict((k, _strip_images(v)) for k, v in data.items()
+                    if k not in IMAGE_KEYS)
+    if isinstance(data, list):
+        return [_strip_images(x) for x in data]
+    return data
+
+
+def _records_hash(records, metadata):
+    # Records are replaced, never mutated, when Badgr updates them
+    key = [(x.entity_id, x.updated_at, x.state, x.public) for x in records]
+    key.append(sorted(metadata.items()))
+    return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+
+def _earner_intid(data):
+    try:
+        return int(data.get('issuer_earner_id'))
+    except (TypeError, ValueError):
+        return None
+
+
+class _AssertionRecord(Persistent):
+    """
+    An awarded badge in the mirror. The JSON is never mutated in place;
+    an update replaces the record's data.
+    """
+
+    def __init__(self, data, user_intid=None):
+        self.user_intid = user_intid
+        self.data = data
+
+    @property
+    def entity_id(self):
+        return self.data.get('id')
+
+    @property
+    def recipient_email(self):
+        return _lower(self.data.get('recipient_email'))
+
+    @property
+    def badge_template_id(self):
+        return _json_value(self.data, ('badge_template', 'id'))
+
+    @property
+    def state(self):
+        return self.data.get('state')
+
+    @property
+    def public(self):
+        return bool(self.data.get('public'))
+
+    @property
+    def updated_at(self):
+        return self.data.get('updated_at')
+
+
+@interface.implementer(IBadgrAssertionMirror)
+class BadgrAssertionMirror(Persistent, Contained):
+
+    family = BTrees.family64
+
+    #: When the mirror was last fully synced; None while cold.
+    last_synced = None
+
+    #: The newest `updated_at` synced, and the page of the assertions
+    #: updated since then to sync next.
+    sync_watermark = None
+    sync_page = 1
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._records = self.family.OO.BTree()
+        self._by_email = self.family.OO.BTree()
+        self._by_intid = self.family.IO.BTree()
+        self.last_synced = None
+        self.sync_watermark = None
+        self.sync_page = 1
+
+    def __len__(self):
+        return len(self._records)
+
+    def __contains__(self, entity_id):
+        return entity_id in self._records
+
+    def get(self, entity_id, default=None):
+        return self._records.get(entity_id, default)
+
+    @property
+    def is_warm(self):
+        return self.last_synced is not None
+
+    def mark_synced(self, now=None):
+        self.last_synced = now or datetime.utcnow()
+
+    def _indexes(self, record):
+        yield self._by_email, record.recipient_email
+        yield self._by_intid, record.user_intid
+
+    def _index(self, record):
+        for index, value in self._indexes(record):
+            if value is None:
+                continue
+            ids = index.get(value)
+            if ids is None:
+                ids = index[value] = self.family.OO.TreeSet()
+            ids.add(record.entity_id)
+
+    def _unindex(self, record):
+        for index, value in self._indexes(record):
+            ids = index.get(value) if value is not None else None
+            if ids is not None:
+                ids.discard(record.entity_id)
+                if not ids:
+                    del index[value]
+
+    def upsert(self, data, user_intid=None):
+        entity_id = data.get('id')
+        if not entity_id:
+            return None
+        data = _strip_images(data)
+        record = self._records.get(entity_id)
+        if user_intid is None and record is None:
+            # We award badges with the intid as the earner id
+            user_intid = _earner_intid(data)
+        if record is not None:
+            if user_intid is None:
+                user_intid = record.user_intid
+            self._unindex(record)
+            record.data = data
+            record.user_intid = user_intid
+        else:
+            record = self._records[entity_id] = _AssertionRecord(data, user_intid)
+        self._index(record)
+        return record
+
+    def remove(self, entity_id):
+        record = self._records.pop(entity_id, None)
+        if record is not None:
+            self._unindex(record)
+        return record
+
+    def emails(self, user_intid):
+        """
+        The recipient emails of the badges awarded to the user.
+        """
+        result = set()
+        for entity_id in self._by_intid.get(user_intid, ()):
+            email = self._records[entity_id].recipient_email
+            if email:
+                result.add(email)
+        return result
+
+    def _ids(self, index, values):
+        result = None
+        for value in values:
+            ids = index.get(value)
+            if ids is not None:
+                result = self.family.OO.union(result, ids)
+        return result or self.family.OO.TreeSet()
+
+    def query(self, emails=(), user_intid=None, badge_template_id=None,
+              states=None, public_only=False):
+        ids = self._ids(self._by_email, [_lower(x) for x in emails or ()])
+        if user_intid is not None:
+            ids = self.family.OO.union(ids, self._ids(self._by_intid, (user_intid,)))
+        records = (self._records[x] for x in ids)
+        # The user's own records are few; filtering them beats
+        # intersecting with every record of a badge or state
+        if badge_template_id is not None:
+            records = (x for x in records
+                       if x.badge_template_id == badge_template_id)
+        if states:
+            records = (x for x in records if x.state in states)
+        if public_only:
+            records = (x for x in records if x.public)
+        return list(records)
+
+
+_BadgrAssertionMirrorFactory = site_local_factory(BadgrAssertionMirror, MIRROR_NAME)
+
+
+def get_assertion_mirror(integration=None):
+    integration = integration or component.queryUtility(IBadgrAuthorizedIntegration)
+    return IBadgrAssertionMirror(integration, None)
+
+
+def record_awarded_badge(data, user=None, integration=None):
+    """
+    Write an awarded badge (JSON) through to the mirror, if any.
+    """
+    mirror = get_assertion_mirror(integration)
+    if mirror is None:
+        return None
+    if 'data' in data:
+        data = data['data']
+    user_intid = None
+    if user is not None:
+        user_intid = component.getUtility(IIntIds).queryId(user)
+    return mirror.upsert(data, user_intid)
+
+
+def _user_emails(user, mirror, user_intid=None):
+    result = set(mirror.emails(user_intid)) if user_intid is not None else set()
+    profile = IUserProfile(user, None)
+    for name in EMAIL_FIELDS:
+        email = _lower(getattr(profile, name, None))
+        if email:
+            result.add(email)
+    return result
+
+
+def _sort_records(records, sort):
+    # Apply the least significant key first; Python's sort is stable
+    for key in reversed(sort or ()):
+        reverse = key.startswith('-')
+        path = SORT_KEYS[key.lstrip('-')]
+
+        def _key(record, path=path):
+            value = _lower(_json_value(record.data, path))
+            # Missing values sort first
+            return (value is not None, value)
+        records.sort(key=_key, reverse=reverse)
+    return records
+
+
+def query_awarded_badges(user, sort=None, filters=None, page=None,
+                         public_only=None, accepted_only=False,
+                         batch_start=None, batch_size=None,
+                         integration=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Answer an awarded badges query, as
+    :meth:`IBadgrClient.get_awarded_badges` would, from the mirror.
+    A batch, if given, is used rather than the page.
+    Returns None if the mirror is cold or cannot answer the query, in
+    which case Badgr must be called.
+    """
+    mirror = get_assertion_mirror(integration)
+    if mirror is None or not mirror.is_warm:
+        return None
+    filters = dict(filters or {})
+    name_filter = _lower(filters.pop(NAME_FILTER_KEY, None))
+    if filters:
+        return None
+    sort = [x for x in sort or () if x]
+    if any(x.lstrip('-') not in SORT_KEYS for x in sort):
+        return None
+    try:
+        page = max(int(page or 1), 1)
+    except (TypeError, ValueError):
+        return None
+
+    states = ('accepted',) if accepted_only else ('pending', 'accepted')
+    user_intid = component.getUtility(IIntIds).queryId(user)
+    records = mirror.query(emails=_user_emails(user, mirror, user_intid),
+                           user_intid=user_intid,
+                           states=states,
+                           public_only=public_only)
+    if name_filter:
+        records = [x for x in records
+                   if name_filter in (_lower(_json_value(x.data, ('badge_template', 'name'))) or '')]
+    records = _sort_records(records, sort)
+
+    total = len(records)
+    if batch_size is not None:
+        start = max(batch_start or 0, 0)
+        items = records[start:start + max(batch_size, 0)]
+        page = 1
+        page_size = total or 1
+    else:
+        start = (page - 1) * page_size
+        items = records[start:start + page_size]
+    ext = {
+        'data': [x.data for x in items],
+        'metadata': {
+            'count': len(items),
+            'total_count': total,
+            'current_page': page,
+            'total_pages': max((total + page_size - 1) // page_size, 1),
+        }
+    }
+    result = IAwardedBadgrBadgeCollection(ext)
+    result.content_hash = _records_hash(items, ext['metadata'])
+    for awarded_badge in result.Items:
+        awarded_badge.User = user
+    return result
@@ -0,0 +1,399 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A durable outbox of badge awards.
+
+Awards are queued in the ZODB as part of the caller's transaction and
+sent to Badgr by a worker after that transaction commits, so awarding
+never holds a transaction open on Badgr, and a `ConflictError` retry of
+the caller cannot re-issue an award.
+
+The worker sends in three steps: it claims due awards (committed, so no
+other worker sends them), makes the Badgr calls (concurrently, with at
+most the integration's `award_max_workers` in flight) in a read-only
+transaction, and records the outcomes. Only the last step writes, and
+retrying it never re-sends. Each outcome is recorded in its own
+transaction, so one that cannot be recorded does not lose the others;
+its award is sent again once its claim expires, and Badgr (or the
+award ledger) reports it as a duplicate.
+
+Due awards are indexed by when they are due, so claiming never scans
+the whole outbox. Sent awards are pruned after `sent_retention`
+seconds; the award ledger still knows they were made.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+import hashlib
+import threading
+
+from datetime import datetime
+from datetime import timedelta
+
+import transaction
+
+from BTrees.OOBTree import OOBTree
+from BTrees.OOBTree import OOTreeSet
+
+from persistent import Persistent
+
+from zope import component
+from zope import interface
+
+from zope.component.hooks import getSite
+
+from zope.container.contained import Contained
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.products.badgr import OUTBOX_STATE_SENT
+from nti.app.products.badgr import OUTBOX_STATE_FAILED
+from nti.app.products.badgr import OUTBOX_STATE_QUEUED
+from nti.app.products.badgr import OUTBOX_STATE_SENDING
+from nti.app.products.badgr import OUTBOX_STATE_DUPLICATE
+
+from nti.app.products.badgr.cache import invalidate_awarded_badges
+
+from nti.app.products.badgr.interfaces import IBadgrClient
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import IAwardedBadgrBadge
+from nti.app.products.badgr.interfaces import IBadgrAwardLedger
+from nti.app.products.badgr.interfaces import IBadgrAwardOutbox
+from nti.app.products.badgr.interfaces import IBadgrPendingAward
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+from nti.app.products.badgr.interfaces import DuplicateBadgrBadgeAwardedError
+
+from nti.app.products.badgr.mirror import record_awarded_badge
+
+from nti.app.products.badgr.utils import site_local_factory
+
+from nti.base._compat import text_
+
+from nti.dataserver.interfaces import IDataserverTransactionRunner
+
+from nti.dublincore.time_mixins import PersistentCreatedAndModifiedTimeObject
+
+from nti.externalization.representation import WithRepr
+
+from nti.schema.fieldproperty import createDirectFieldProperties
+
+from nti.schema.schema import SchemaConfigured
+
+OUTBOX_NAME = 'nti.app.products.badgr.outbox.BadgrAwardOutbox'
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def get_idempotency_key(user_intid, badge_template_id, evidence_ntiid=None):
+    key = '%s:%s:%s' % (user_intid, badge_template_id, evidence_ntiid or '')
+    return text_(hashlib.sha256(key.encode('utf-8')).hexdigest())
+
+
+@WithRepr
+@interface.implementer(IBadgrPendingAward)
+class BadgrPendingAward(PersistentCreatedAndModifiedTimeObject,
+                        Contained,
+                        SchemaConfigured):
+
+    createDirectFieldProperties(IBadgrPendingAward)
+
+    mimeType = mime_type = "application/vnd.nextthought.badgr.pendingaward"
+
+    __parent__ = None
+    __name__ = None
+
+    def __init__(self, *args, **kwargs):
+        PersistentCreatedAndModifiedTimeObject.__init__(self)
+        SchemaConfigured.__init__(self, *args, **kwargs)
+
+
+@interface.implementer(IBadgrAwardOutbox)
+class BadgrAwardOutbox(Persistent, Contained):
+    """
+    The outbox of an authorized integration, keyed by idempotency key.
+    """
+
+    #: Give up on an award after this many failed sends.
+    max_attempts = 8
+
+    #: Seconds before a failed send is retried, doubling per attempt.
+    retry_backoff = 60
+
+    max_retry_backoff = 60 * 60 * 6
+
+    #: Seconds after which a claimed award is assumed abandoned (e.g. the
+    #: worker died) and may be claimed again.
+    lease_timeout = 60 * 10
+
+    #: Seconds sent (and duplicate) awards are kept before being pruned.
+    sent_retention = 60 * 60 * 24 * 7
+
+    def __init__(self):
+        self._awards = OOBTree()
+        # (due datetime, key) of queued and claimed awards
+        self._due = OOTreeSet()
+        # (lastModified, key) of sent and duplicate awards
+        self._done = OOTreeSet()
+
+    def __len__(self):
+        return len(self._awards)
+
+    def __getitem__(self, key):
+        return self._awards[key]
+
+    def get(self, key, default=None):
+        return self._awards.get(key, default)
+
+    def values(self, state=None):
+        for award in self._awards.values():
+            if state is None or award.state == state:
+                yield award
+
+    def _index_entry(self, award):
+        """
+        The (index, entry) of the award, if indexed in its state.
+        """
+        key = award.idempotency_key
+        if award.state == OUTBOX_STATE_QUEUED:
+            return self._due, (award.next_attempt or datetime.min, key)
+        if award.state == OUTBOX_STATE_SENDING:
+            return self._due, (award.lease_expires or datetime.min, key)
+        if award.state in (OUTBOX_STATE_SENT, OUTBOX_STATE_DUPLICATE):
+            return self._done, (award.lastModified, key)
+        return None, None
+
+    def _unindex(self, award):
+        index, entry = self._index_entry(award)
+        if index is not None:
+            try:
+                index.remove(entry)
+            except KeyError:
+                pass
+
+    def _index(self, award):
+        index, entry = self._index_entry(award)
+        if index is not None:
+            index.add(entry)
+
+    def queue_award(self, user, badge_template_id, suppress_badge_notification_email=False,
+                    locale=None, evidence_ntiid=None, evidence_title=None, evidence_desc=None):
+        user_intid = component.getUtility(IIntIds).getId(user)
+        key = get_idempotency_key(user_intid, badge_template_id, evidence_ntiid)
+        award = self._awards.get(key)
+        if award is not None:
+            if award.state == OUTBOX_STATE_FAILED:
+                # Given up on; queueing it again retries it
+                award.attempts = 0
+                award.next_attempt = None
+                award.state = OUTBOX_STATE_QUEUED
+                award.updateLastMod()
+                self._index(award)
+                _process_after_commit()
+            return award
+        award = BadgrPendingAward(idempotency_key=key,
+                                  username=user.username,
+                                  user_intid=user_intid,
+                                  badge_template_id=badge_template_id,
+                                  suppress_badge_notification_email=suppress_badge_notification_email,
+                                  locale=locale,
+                                  evidence_ntiid=evidence_ntiid,
+                                  evidence_title=evidence_title,
+                                  evidence_desc=evidence_desc,
+                                  state=OUTBOX_STATE_QUEUED,
+                                  attempts=0)
+        award.__parent__ = self
+        award.__name__ = key
+        self._awards[key] = award
+        self._index(award)
+        _process_after_commit()
+        return award
+
+    def _prune(self):
+        horizon = time.time() - self.sent_retention
+        pruned = []
+        for modified, key in self._done:
+            if modified > horizon:
+                break
+            pruned.append((modified, key))
+        for entry in pruned:
+            self._done.remove(entry)
+            del self._awards[entry[1]]
+        return len(pruned)
+
+    def claim(self, limit=None):
+        self._prune()
+        now = datetime.utcnow()
+        keys = []
+        for due, key in self._due:
+            if due > now or (limit is not None and len(keys) >= limit):
+                break
+            keys.append(key)
+        result = []
+        for key in keys:
+            award = self._awards[key]
+            self._unindex(award)
+            award.state = OUTBOX_STATE_SENDING
+            award.lease_expires = now + timedelta(seconds=self.lease_timeout)
+            award.updateLastMod()
+            self._index(award)
+            result.append(award)
+        return result
+
+    def record(self, idempotency_key, state, awarded_badge_id=None, error=None):
+        award = self._awards[idempotency_key]
+        self._unindex(award)
+        award.lease_expires = None
+        if state == OUTBOX_STATE_FAILED:
+            award.attempts += 1
+            award.last_error = text_(error) if error else None
+            if award.attempts >= self.max_attempts:
+                award.state = OUTBOX_STATE_FAILED
+            else:
+                delay = min(self.max_retry_backoff,
+                            self.retry_backoff * (2 ** (award.attempts - 1)))
+                award.next_attempt = datetime.utcnow() + timedelta(seconds=delay)
+                award.state = OUTBOX_STATE_QUEUED
+        else:
+            award.state = state
+            award.awarded_badge_id = awarded_badge_id
+        award.updateLastMod()
+        self._index(award)
+        return award
+
+
+_BadgrAwardOutboxFactory = site_local_factory(BadgrAwardOutbox, OUTBOX_NAME)
+
+
+def queue_badge_award(user, badge_template_id, integration=None, **kwargs):
+    """
+    Queue an award to be sent to Badgr after the current transaction
+    commits.
+    """
+    integration = integration or component.getUtility(IBadgrAuthorizedIntegration)
+    return IBadgrAwardOutbox(integration).queue_award(user, badge_template_id, **kwargs)
+
+
+def _after_commit(success, site_name):
+    if success:
+        thread = threading.Thread(target=process_award_outbox,
+                                  args=(site_name,),
+                                  name='badgr-award-outbox')
+        thread.daemon = True
+        thread.start()
+
+
+def _process_after_commit():
+    # One processing run per transaction is enough
+    txn = transaction.get()
+    for hook, unused_args, unused_kws in txn.getAfterCommitHooks():
+        if hook is _after_commit:
+            return
+    txn.addAfterCommitHook(_after_commit, args=(getSite().__name__,))
+
+
+def process_award_outbox(site_name, limit=50):
+    """
+    Send the due awards of the site's outbox. Must be called outside of
+    a transaction.
+    """
+    runner = component.getUtility(IDataserverTransactionRunner)
+
+    def _claim():
+        integration = component.queryUtility(IBadgrAuthorizedIntegration)
+        if integration is None:
+            return ()
+        client = IBadgrClient(integration)
+        intids = component.getUtility(IIntIds)
+        outbox = IBadgrAwardOutbox(integration)
+        ledger = IBadgrAwardLedger(integration, None)
+        result = []
+        for award in outbox.claim(limit):
+            user = intids.queryObject(award.user_intid)
+            if user is None:
+                outbox.record(award.idempotency_key,
+                              OUTBOX_STATE_FAILED,
+                              error=u'User not found')
+                continue
+            if      ledger is not None \
+                and ledger.has_award(award.user_intid, award.badge_template_id):
+                outbox.record(award.idempotency_key, OUTBOX_STATE_DUPLICATE)
+                continue
+            data = client.get_award_data(user, award.badge_template_id,
+                                         suppress_badge_notification_email=award.suppress_badge_notification_email,
+                                         locale=award.locale,
+                                         evidence_ntiid=award.evidence_ntiid,
+                                         evidence_title=award.evidence_title,
+                                         evidence_desc=award.evidence_desc)
+            result.append((award.idempotency_key, data))
+        return result
+
+    def _send(claimed):
+        integration = component.getUtility(IBadgrAuthorizedIntegration)
+        client = IBadgrClient(integration)
+        outcomes = []
+        results = client.post_awards([data for unused_key, data in claimed])
+        for (key, unused_data), awarded in zip(claimed, results):
+            try:
+                if isinstance(awarded, Exception):
+                    raise awarded
+                awarded_badge_id = IAwardedBadgrBadge(awarded).entity_id
+            except DuplicateBadgrBadgeAwardedError:
+                outcomes.append((key, OUTBOX_STATE_DUPLICATE, None, None, None))
+            except Exception as e:  # pylint: disable=broad-except
+                if not isinstance(e, BadgrClientError):
+                    logger.exception('Error while sending badge award (%s)', key)
+                else:
+                    logger.warn('Error while sending badge award (%s) (%s)', key, e)
+                outcomes.append((key, OUTBOX_STATE_FAILED, None, None,
+                                 str(e) or e.__class__.__name__))
+            else:
+                outcomes.append((key, OUTBOX_STATE_SENT, awarded_badge_id, awarded, None))
+        return outcomes
+
+    def _record(outcome):
+        key, state, awarded_badge_id, awarded, error = outcome
+        integration = component.getUtility(IBadgrAuthorizedIntegration)
+        intids = component.getUtility(IIntIds)
+        outbox = IBadgrAwardOutbox(integration)
+        ledger = IBadgrAwardLedger(integration, None)
+        award = outbox.record(key, state,
+                              awarded_badge_id=awarded_badge_id,
+                              error=error)
+        if      ledger is not None \
+            and state in (OUTBOX_STATE_SENT, OUTBOX_STATE_DUPLICATE):
+            ledger.record_award(award.user_intid, award.badge_template_id)
+        user = intids.queryObject(award.user_intid)
+        if state == OUTBOX_STATE_SENT and user is not None:
+            # Write-through so the user sees their new badge immediately
+            record_awarded_badge(awarded, user, integration=integration)
+            invalidate_awarded_badges(user)
+
+    try:
+        claimed = runner(_claim, site_names=(site_name,))
+        if not claimed:
+            return 0
+        outcomes = runner(lambda: _send(claimed),
+                          site_names=(site_name,),
+                          side_effect_free=True)
+    except Exception:  # pylint: disable=broad-except
+        # Claimed awards are retried once their lease expires
+        logger.exception('Error while processing badgr award outbox (%s)',
+                         site_name)
+        return 0
+    result = 0
+    for outcome in outcomes:
+        try:
+            runner(lambda outcome=outcome: _record(outcome),
+                   site_names=(site_name,))
+        except Exception:  # pylint: disable=broad-except
+            # Sent again once its lease expires; Badgr reports the duplicate
+            logger.exception('Error while recording badge award (%s) (%s)',
+                             site_name, outcome[0])
+        else:
+            result += 1
+    return result
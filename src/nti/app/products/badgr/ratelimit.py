@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+A cluster-wide token bucket rate limiter, coordinated through redis.
+
+Badgr throttles per access token, so all processes calling Badgr with
+the same authorized integration must share a single bucket.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+
+from zope import component
+
+from nti.app.products.badgr import DEFAULT_RATE_LIMIT
+from nti.app.products.badgr import DEFAULT_RATE_LIMIT_BURST
+
+from nti.app.products.badgr.interfaces import BadgrRateLimitExceededError
+
+from nti.dataserver.interfaces import IRedisClient
+
+logger = __import__('logging').getLogger(__name__)
+
+# Refill the bucket for the elapsed time and take a token if one is
+# available. Returns the number of seconds to wait for a token (as a
+# string, since redis truncates lua numbers to integers), "0" meaning
+# a token was taken. The time is redis', so the buckets of processes
+# whose clocks disagree still refill at the same rate; reading it
+# requires effects (rather than script) replication before redis 5.
+_TOKEN_BUCKET_SCRIPT = """
+pcall(redis.replicate_commands)
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HMSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class BadgrRateLimiter(object):
+    """
+    A token bucket allowing `rate` calls per second, with bursts of up
+    to `burst` calls, shared by every process using the same `key`.
+
+    If redis is unavailable, calls are not limited.
+    """
+
+    def __init__(self, key, rate=DEFAULT_RATE_LIMIT, burst=DEFAULT_RATE_LIMIT_BURST):
+        self.key = key
+        self.rate = rate
+        self.burst = max(burst, 1)
+
+    @property
+    def _redis(self):
+        return component.queryUtility(IRedisClient)
+
+    def _take(self, redis):
+        wait = redis.eval(_TOKEN_BUCKET_SCRIPT, 1, self.key,
+                          self.rate, self.burst)
+        if isinstance(wait, bytes):
+            wait = wait.decode('ascii')
+        return float(wait)
+
+    def take(self):
+        """
+        Try to take a token, without waiting. Returns the seconds to wait
+        before trying again, or 0 if a token was taken.
+        """
+        if not self.rate:
+            return 0
+        redis = self._redis
+        if redis is None:
+            return 0
+        try:
+            return self._take(redis)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while rate limiting badgr call (%s)',
+                             self.key)
+            return 0
+
+    def check_wait(self, wait, deadline):
+        """
+        Raise :class:`BadgrRateLimitExceededError` if waiting `wait`
+        seconds would pass the `deadline` (if any).
+        """
+        if deadline is not None and time.time() + wait > deadline:
+            raise BadgrRateLimitExceededError(
+                'Badgr rate limit exceeded (%s)' % self.key)
+
+    def acquire(self, timeout=None):
+        """
+        Take a token, waiting up to `timeout` seconds (indefinitely if None)
+        for one to become available. A `timeout` of 0 fails fast.
+
+        Raises :class:`BadgrRateLimitExceededError` if no token could be
+        taken in time.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait = self.take()
+            if not wait:
+                return
+            self.check_wait(wait, deadline)
+            time.sleep(wait)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Retry policies for transient Badgr failures.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+import random
+
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
+
+from requests.exceptions import Timeout
+from requests.exceptions import ConnectTimeout
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from urllib3.exceptions import NewConnectionError
+
+logger = __import__('logging').getLogger(__name__)
+
+
+class RetryPolicy(object):
+    """
+    Retry transient failures with capped exponential backoff and full
+    jitter, honoring `Retry-After`, within a total `deadline` (in seconds)
+    for the call.
+
+    Non-`idempotent` calls (e.g. awarding a badge) are only retried when
+    Badgr cannot have acted on the request: a `429` or a failure to
+    connect. Anything else could create a duplicate assertion.
+    """
+
+    #: Statuses that may be retried for idempotent calls.
+    retry_statuses = (429, 502, 503, 504)
+
+    #: Statuses that guarantee the request was not processed.
+    unprocessed_statuses = (429,)
+
+    def __init__(self, max_attempts=4, backoff=0.5, max_backoff=10,
+                 deadline=30, jitter=True, idempotent=True):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.deadline = deadline
+        self.jitter = jitter
+        self.idempotent = idempotent
+
+    def backoff_delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * (2 ** attempt))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def retry_after(self, response):
+        """
+        The delay requested by the `Retry-After` header (in seconds or as
+        an HTTP date), or None.
+        """
+        value = response.headers.get('Retry-After')
+        if not value:
+            return None
+        try:
+            return max(0, float(value))
+        except ValueError:
+            parsed = parsedate_tz(value)
+            if parsed is None:
+                return None
+            return max(0, mktime_tz(parsed) - time.time())
+
+    def _delay(self, attempt, started, delay):
+        if attempt + 1 >= self.max_attempts:
+            return None
+        if      self.deadline is not None \
+            and time.time() + delay - started > self.deadline:
+            return None
+        return delay
+
+    def delay_after_response(self, response, attempt, started):
+        """
+        Seconds to wait before retrying after this response, or None if
+        it should not be retried.
+        """
+        status = response.status_code
+        statuses = self.retry_statuses if self.idempotent else self.unprocessed_statuses
+        if status not in statuses:
+            return None
+        delay = self.retry_after(response)
+        if delay is None:
+            delay = self.backoff_delay(attempt)
+        return self._delay(attempt, started, delay)
+
+    def _was_sent(self, error):
+        if isinstance(error, ConnectTimeout):
+            return False
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return not isinstance(reason, NewConnectionError)
+
+    def delay_after_error(self, error, attempt, started):
+        """
+        Seconds to wait before retrying after this connection error,
+        or None if it should not be retried.
+        """
+        if not isinstance(error, (RequestsConnectionError, Timeout)):
+            return None
+        if not self.idempotent and self._was_sent(error):
+            return None
+        return self._delay(attempt, started, self.backoff_delay(attempt))
+
+
+#: Never retry.
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+DEFAULT_RETRY_POLICIES = {
+    'GET': RetryPolicy(),
+    'DELETE': RetryPolicy(),
+    'POST': RetryPolicy(idempotent=False),
+}
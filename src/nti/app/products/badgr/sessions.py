@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Pooled, keep-alive HTTP sessions for talking to Badgr.
+
+Sessions are held per process (they are discarded after a fork) and
+per authorized integration, so that repeated Badgr calls can reuse
+established TCP/TLS connections.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import time
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from zope.testing.cleanup import addCleanUp
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The session key used for calls not tied to an authorized integration
+#: (e.g. exchanging an authorization code for tokens).
+DEFAULT_SESSION_KEY = 'badgr/default'
+
+#: The number of distinct host pools to cache per session.
+DEFAULT_POOL_CONNECTIONS = 4
+
+#: The max number of connections to keep alive per host.
+DEFAULT_POOL_MAXSIZE = 16
+
+#: Sessions unused for this many seconds are recycled before use; Badgr
+#: (and intermediaries) will have closed the idle connections by then.
+DEFAULT_MAX_IDLE = 60 * 5
+
+
+class _PooledSession(object):
+
+    def __init__(self, session, max_idle):
+        self.session = session
+        self.max_idle = max_idle
+        self.last_used = time.time()
+
+    @property
+    def expired(self):
+        return self.max_idle and time.time() - self.last_used > self.max_idle
+
+    def close(self):
+        try:
+            self.session.close()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while closing badgr session')
+
+
+_lock = threading.Lock()
+_sessions = dict()
+_pid = None
+
+
+def _create_session(pool_connections, pool_maxsize):
+    session = requests.Session()
+    # We handle retries ourselves; do not let urllib3 re-send
+    # (possibly non-idempotent) requests.
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Connection'] = 'keep-alive'
+    return session
+
+
+def _check_pid():
+    """
+    Connections must never be shared across a fork; drop anything
+    created by our parent process.
+    """
+    global _pid
+    pid = os.getpid()
+    if _pid != pid:
+        _sessions.clear()
+        _pid = pid
+
+
+def get_session(key=DEFAULT_SESSION_KEY,
+                pool_connections=DEFAULT_POOL_CONNECTIONS,
+                pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                max_idle=DEFAULT_MAX_IDLE):
+    """
+    Return the pooled :class:`requests.Session` for the given key,
+    creating it if necessary.
+    """
+    with _lock:
+        _check_pid()
+        pooled = _sessions.get(key)
+        if pooled is not None and pooled.expired:
+            logger.debug('Recycling idle badgr session (%s)', key)
+            pooled.close()
+            pooled = None
+        if pooled is None:
+            session = _create_session(pool_connections, pool_maxsize)
+            pooled = _sessions[key] = _PooledSession(session, max_idle)
+        pooled.last_used = time.time()
+        return pooled.session
+
+
+def close_session(key):
+    """
+    Close and discard the pooled session for the given key, if any. The
+    next :func:`get_session` call for the key will create a fresh session.
+    """
+    with _lock:
+        pooled = _sessions.pop(key, None)
+    if pooled is not None:
+        pooled.close()
+    return pooled is not None
+
+
+recycle_session = close_session
+
+
+def close_all_sessions():
+    with _lock:
+        pooled_sessions = list(_sessions.values())
+        _sessions.clear()
+    for pooled in pooled_sessions:
+        pooled.close()
+
+
+addCleanUp(close_all_sessions)
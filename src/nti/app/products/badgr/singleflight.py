@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Coalescing of identical concurrent calls ("single flight").
+
+Concurrent callers asking for the same key share the result of one
+in-flight call rather than each making their own. Results are shared
+as-is; callers must not mutate them.
+
+Only callers that arrive while a call is in flight share its result
+(or error); a caller arriving after it has finished makes a new call.
+Across the cluster, the leader's result, or its error, is published
+under its flight's token, which only the followers of that flight know.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import json
+import time
+import uuid
+import hashlib
+import threading
+
+logger = __import__('logging').getLogger(__name__)
+
+#: Returned by :meth:`SingleFlight._join` to the cluster leader.
+_LEADER = object()
+
+#: Returned by :meth:`SingleFlight._join` to a follower that gave up.
+_ALONE = object()
+
+
+class _Call(object):
+
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Coalesces calls across the threads of this process and, optionally,
+    across the cluster using redis.
+    """
+
+    #: Seconds the cluster leader may hold its lock.
+    lock_ttl = 30
+
+    #: Seconds a cluster result is kept for the followers of its flight.
+    result_ttl = 5
+
+    #: Seconds a caller waits on another's call before making its own.
+    wait_timeout = 30
+
+    #: Seconds between checks for the cluster leader's result.
+    poll_interval = 0.05
+
+    key_prefix = 'badgr/singleflight'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = dict()
+
+    def do(self, key, func, redis=None, errors=()):
+        """
+        Return `func()`, sharing the call with any concurrent callers using
+        the same key. If `redis` is given, callers in other processes are
+        coalesced too; `func` must then return JSON serializable data.
+        The leader's error is raised in the other processes, with the
+        same message, as the first of the `errors` types it is an
+        instance of (else as an :class:`Exception`).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            if not call.event.wait(self.wait_timeout):
+                logger.warn('Timed out waiting on coalesced badgr call (%s)', key)
+                return func()
+            if call.error is not None:
+                raise call.error  # pylint: disable=raising-bad-type
+            return call.result
+        try:
+            if redis is not None:
+                call.result = self._do_cluster(key, func, redis, errors)
+            else:
+                call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+        return call.result
+
+    def _redis_keys(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        base = '%s/%s' % (self.key_prefix, digest)
+        return '%s/lock' % base, '%s/result' % base
+
+    def _text(self, value):
+        if isinstance(value, bytes):
+            value = value.decode('ascii')
+        return value
+
+    def _join(self, redis, lock_key, result_key, token):
+        """
+        Lead a new flight, returning `_LEADER`, or follow the one in
+        progress, returning what its leader published, or `_ALONE` if it
+        takes too long.
+        """
+        deadline = time.time() + self.wait_timeout
+        while True:
+            if redis.set(lock_key, token, nx=True, ex=self.lock_ttl):
+                return _LEADER
+            # Follow the flight in progress
+            flight = self._text(redis.get(lock_key))
+            while flight is not None:
+                data = redis.get('%s/%s' % (result_key, flight))
+                if data is not None:
+                    return json.loads(data)
+                if time.time() > deadline:
+                    # The leader is taking too long
+                    return _ALONE
+                time.sleep(self.poll_interval)
+                if self._text(redis.get(lock_key)) != flight:
+                    # Finished (its outcome is now published) or died
+                    data = redis.get('%s/%s' % (result_key, flight))
+                    if data is not None:
+                        return json.loads(data)
+                    flight = None
+
+    def _publish(self, redis, result_key, token, outcome):
+        try:
+            redis.setex('%s/%s' % (result_key, token),
+                        time=self.result_ttl,
+                        value=json.dumps(outcome, separators=(',', ':')))
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while publishing coalesced badgr call')
+
+    def _error_outcome(self, error, errors):
+        name = None
+        for factory in errors:
+            if isinstance(error, factory):
+                name = factory.__name__
+                break
+        return {'error': [name, str(error)]}
+
+    def _raise_published(self, outcome, errors):
+        name, message = outcome['error']
+        factories = [x for x in errors if x.__name__ == name]
+        factory = factories[0] if factories else Exception
+        raise factory(message)
+
+    def _do_cluster(self, key, func, redis, errors):
+        lock_key, result_key = self._redis_keys(key)
+        token = uuid.uuid4().hex
+        try:
+            outcome = self._join(redis, lock_key, result_key, token)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Error while coalescing badgr call in redis')
+            outcome = _ALONE
+        if outcome is _ALONE:
+            return func()
+        if outcome is not _LEADER:
+            if 'error' in outcome:
+                self._raise_published(outcome, errors)
+            return outcome['result']
+        # We are the cluster leader
+        try:
+            try:
+                result = func()
+            except Exception as e:
+                self._publish(redis, result_key, token,
+                              self._error_outcome(e, errors))
+                raise
+            self._publish(redis, result_key, token, {'result': result})
+            return result
+        finally:
+            try:
+                if self._text(redis.get(lock_key)) == token:
+                    redis.delete(lock_key)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error while releasing badgr coalescing lock')
+
+
+#: The process-wide instance.
+single_flight = SingleFlight()
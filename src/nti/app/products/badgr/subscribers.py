@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+from zope import component
+
+from zope.intid.interfaces import IIntIds
+from zope.intid.interfaces import IIntIdRemovedEvent
+
+from nti.app.products.badgr.interfaces import IBadgrAwardLedger
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+
+from nti.dataserver.interfaces import IUser
+
+logger = __import__('logging').getLogger(__name__)
+
+
+@component.adapter(IBadgrAuthorizedIntegration, IIntIdRemovedEvent)
+def _on_authorized_integration_removed(integration, unused_event=None):
+    """
+    The integration is being removed (disconnected or replaced by a
+    re-authorization); drop its pooled connections. This fires before
+    the intid is unregistered, so the session key can still be computed.
+    """
+    integration.close_session()
+
+
+@component.adapter(IUser, IIntIdRemovedEvent)
+def _on_user_removed(user, unused_event=None):
+    """
+    Drop the user's awards from the ledger, so a user later given the
+    same intid does not inherit them.
+    """
+    integration = component.queryUtility(IBadgrAuthorizedIntegration)
+    ledger = IBadgrAwardLedger(integration, None)
+    if ledger is not None:
+        intids = component.getUtility(IIntIds)
+        user_intid = intids.queryId(user)
+        if user_intid is not None:
+            ledger.remove_user(user_intid)
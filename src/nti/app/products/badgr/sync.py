@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Incremental sync of the organization's issued assertions into the
+:class:`IBadgrAssertionMirror`.
+
+Assertions are fetched oldest-updated first, starting from the mirror's
+`sync_watermark` (the newest `updated_at` synced). Each page is fetched
+in a read-only transaction and applied, advancing the watermark, in its
+own transaction, so a sync that dies midway resumes from its last
+applied page. A full resync is only done after the mirror is explicitly
+cleared.
+
+Assertions Badgr has revoked (or their recipients rejected) are removed
+from the award ledger, so the badge can be awarded to them again.
+
+Badgr's listing does not show deleted assertions, so an assertion
+deleted (rather than revoked) in Badgr stays in the mirror, and in the
+award ledger, until the mirror is cleared and fully resynced (the sync
+view's `full` parameter); the ledger entry must be removed by hand.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import threading
+
+import transaction
+
+from zope import component
+
+from zope.component.hooks import getSite
+
+from nti.app.products.badgr.datetimes import parse_datetime
+
+from nti.app.products.badgr.interfaces import IBadgrClient
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+from nti.app.products.badgr.interfaces import MissingBadgrOrganizationError
+
+from nti.app.products.badgr.ledger import get_award_ledger
+
+from nti.app.products.badgr.mirror import get_assertion_mirror
+
+from nti.dataserver.interfaces import IDataserverTransactionRunner
+
+logger = __import__('logging').getLogger(__name__)
+
+#: The most pages synced per site per run.
+DEFAULT_MAX_PAGES = 100
+
+#: The assertion states that no longer count as an award.
+REVOKED_STATES = ('revoked', 'rejected')
+
+
+def _newest(assertions, watermark):
+    # Badgr's timestamps differ in precision and offset, so they do not
+    # order as strings
+    result = watermark
+    newest = parse_datetime(watermark) if watermark else None
+    for assertion in assertions:
+        updated_at = assertion.get('updated_at')
+        if not updated_at:
+            continue
+        parsed = parse_datetime(updated_at)
+        if newest is None or parsed > newest:
+            result, newest = updated_at, parsed
+    return result
+
+
+def _apply_page(mirror, watermark, page, ext, ledger=None):
+    """
+    Upsert the page, removing revoked awards from the ledger, and advance
+    the sync position. Returns whether there is more to sync.
+    """
+    if (mirror.sync_watermark, mirror.sync_page) != (watermark, page):
+        # Another sync moved on while we were fetching
+        return False
+    assertions = ext.get('data') or ()
+    for assertion in assertions:
+        record = mirror.upsert(assertion)
+        if      ledger is not None \
+            and record is not None \
+            and record.user_intid is not None \
+            and record.state in REVOKED_STATES:
+            ledger.remove_award(record.user_intid, record.badge_template_id)
+    metadata = ext.get('metadata') or {}
+    newest = _newest(assertions, watermark)
+    if page >= (metadata.get('total_pages') or 1):
+        # Caught up
+        mirror.sync_watermark = newest
+        mirror.sync_page = 1
+        mirror.mark_synced()
+        return False
+    if newest != watermark:
+        # Restart from the newest change we have; re-fetching the
+        # assertions updated at exactly `newest` is harmless.
+        mirror.sync_watermark = newest
+        mirror.sync_page = 1
+    else:
+        # A whole page updated at the same instant
+        mirror.sync_page = page + 1
+    return True
+
+
+def sync_assertion_mirror(site_name, max_pages=DEFAULT_MAX_PAGES):
+    """
+    Sync the site's mirror with the assertions changed since its
+    watermark. Must be called outside of a transaction. Returns the
+    number of pages synced.
+    """
+    runner = component.getUtility(IDataserverTransactionRunner)
+
+    def _fetch():
+        integration = component.queryUtility(IBadgrAuthorizedIntegration)
+        mirror = get_assertion_mirror(integration)
+        if mirror is None:
+            return None
+        watermark, page = mirror.sync_watermark, mirror.sync_page
+        client = IBadgrClient(integration)
+        try:
+            ext = client.get_issuer_assertions(updated_since=watermark, page=page)
+        except MissingBadgrOrganizationError:
+            return None
+        return watermark, page, ext
+
+    def _apply(watermark, page, ext):
+        mirror = get_assertion_mirror()
+        if mirror is None:
+            return False
+        return _apply_page(mirror, watermark, page, ext, get_award_ledger())
+
+    result = 0
+    try:
+        while result < max_pages:
+            fetched = runner(_fetch,
+                             site_names=(site_name,),
+                             side_effect_free=True)
+            if fetched is None:
+                break
+            result += 1
+            if not runner(lambda: _apply(*fetched), site_names=(site_name,)):
+                break
+    except Exception:  # pylint: disable=broad-except
+        # We resume from the last applied page next time
+        logger.exception('Error while syncing badgr assertions (%s)', site_name)
+    return result
+
+
+def _after_commit(success, site_name):
+    if success:
+        thread = threading.Thread(target=sync_assertion_mirror,
+                                  args=(site_name,),
+                                  name='badgr-assertion-sync')
+        thread.daemon = True
+        thread.start()
+
+
+def sync_after_commit():
+    """
+    Sync the current site's mirror once the current transaction commits.
+    """
+    txn = transaction.get()
+    for hook, unused_args, unused_kws in txn.getAfterCommitHooks():
+        if hook is _after_commit:
+            return
+    txn.addAfterCommitHook(_after_commit, args=(getSite().__name__,))
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Background maintenance of Badgr integrations.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import threading
+
+from zope import component
+
+from zope.component.hooks import site as current_site
+
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+
+from nti.app.products.badgr.outbox import process_award_outbox
+
+from nti.app.products.badgr.sync import sync_assertion_mirror
+
+from nti.dataserver.interfaces import IRedisClient
+from nti.dataserver.interfaces import IDataserverTransactionRunner
+
+from nti.processlifetime import IApplicationTransactionOpenedEvent
+
+from nti.site.hostpolicy import get_all_host_sites
+
+logger = __import__('logging').getLogger(__name__)
+
+#: Seconds between token refresh sweeps.
+DEFAULT_REFRESH_INTERVAL = 60 * 10
+
+#: Seconds between award outbox sweeps.
+DEFAULT_OUTBOX_INTERVAL = 60
+
+#: Seconds between assertion mirror syncs.
+DEFAULT_SYNC_INTERVAL = 60 * 5
+
+
+def _site_integrations():
+    """
+    Yield (site, integration) for every site with its own authorized
+    integration.
+    """
+    seen = set()
+    for site in get_all_host_sites():
+        with current_site(site):
+            integration = component.queryUtility(IBadgrAuthorizedIntegration)
+            if integration is None:
+                continue
+            key = integration.key_base_name
+            if key in seen:
+                # Inherited from a parent site
+                continue
+            seen.add(key)
+            yield site, integration
+
+
+def _site_names():
+    runner = component.getUtility(IDataserverTransactionRunner)
+    return runner(lambda: [site.__name__ for site, _ in _site_integrations()],
+                  side_effect_free=True)
+
+
+def _refresh_site_tokens():
+    integration = component.queryUtility(IBadgrAuthorizedIntegration)
+    return integration is not None and integration.refresh_tokens_if_expiring()
+
+
+def refresh_expiring_tokens():
+    """
+    Refresh the tokens of every site's integration that will expire within
+    its `access_token_refresh_margin`, each site in a transaction of its
+    own. Must be called outside of a transaction.
+    """
+    runner = component.getUtility(IDataserverTransactionRunner)
+    result = 0
+    for site_name in _site_names():
+        try:
+            if runner(_refresh_site_tokens, site_names=(site_name,)):
+                result += 1
+                logger.info('Refreshed badgr tokens (%s)', site_name)
+        except Exception:  # pylint: disable=broad-except
+            # Foreground requests will still refresh on demand
+            logger.exception('Error while refreshing badgr tokens (%s)',
+                             site_name)
+    return result
+
+
+def process_award_outboxes():
+    """
+    Send the due awards in every site's outbox. Must be called outside
+    of a transaction.
+    """
+    for site_name in _site_names():
+        process_award_outbox(site_name)
+
+
+def sync_assertion_mirrors():
+    """
+    Sync every site's assertion mirror. Must be called outside of a
+    transaction.
+    """
+    for site_name in _site_names():
+        sync_assertion_mirror(site_name)
+
+
+class BadgrPeriodicTask(object):
+    """
+    Runs `func` (in a transaction, if `transactional`) every `interval`
+    seconds, on a daemon thread. Only one process in the cluster runs it
+    per interval.
+    """
+
+    def __init__(self, name, func, interval, transactional=True):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.transactional = transactional
+        self._thread = None
+        self._stopped = threading.Event()
+
+    @property
+    def _leader_key(self):
+        return 'badgr/tasks/%s' % self.name
+
+    def _is_leader(self):
+        redis = component.queryUtility(IRedisClient)
+        if redis is None:
+            return True
+        return redis.set(self._leader_key, 1, nx=True, ex=max(int(self.interval) - 1, 1))
+
+    def run_once(self):
+        if not self._is_leader():
+            return
+        if self.transactional:
+            runner = component.getUtility(IDataserverTransactionRunner)
+            runner(self.func)
+        else:
+            self.func()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception('Error while running badgr task (%s)', self.name)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='badgr-%s' % self.name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread = None
+
+
+token_refresher = BadgrPeriodicTask('token_refresh',
+                                    refresh_expiring_tokens,
+                                    DEFAULT_REFRESH_INTERVAL,
+                                    transactional=False)
+
+
+# Retries failed sends and picks up awards whose after-commit
+# processing was lost (e.g. the process exited)
+award_outbox_processor = BadgrPeriodicTask('award_outbox',
+                                           process_award_outboxes,
+                                           DEFAULT_OUTBOX_INTERVAL,
+                                           transactional=False)
+
+
+assertion_syncer = BadgrPeriodicTask('assertion_sync',
+                                     sync_assertion_mirrors,
+                                     DEFAULT_SYNC_INTERVAL,
+                                     transactional=False)
+
+
+@component.adapter(IApplicationTransactionOpenedEvent)
+def _start_background_tasks(unused_event=None):
+    token_refresher.start()
+    award_outbox_processor.start()
+    assertion_syncer.start()
@@ -21,7 +21,7 @@ class SharedConfiguringTestLayer(ZopeComponentLayer,
                                  ConfiguringLayerMixin):
 
     set_up_packages = ('nti.dataserver',
-                       'nti.app.products.acclaim',)
+                       'nti.app.products.badgr',)
 
     @classmethod
     def setUp(cls):
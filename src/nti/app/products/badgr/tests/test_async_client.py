@@ -0,0 +1,366 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import is_not
+from hamcrest import calling
+from hamcrest import raises
+from hamcrest import contains
+from hamcrest import has_entry
+from hamcrest import assert_that
+from hamcrest import has_length
+from hamcrest import instance_of
+from hamcrest import less_than_or_equal_to
+
+import sys
+import json
+import unittest
+import threading
+
+import fudge
+
+from nti.app.products.badgr import AWARD_STATUS_QUEUED
+from nti.app.products.badgr import AWARD_STATUS_DUPLICATE
+
+from nti.app.products.badgr.interfaces import IBadgrIssuer
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import IBadgrIssuerCollection
+from nti.app.products.badgr.interfaces import BadgrRateLimitExceededError
+from nti.app.products.badgr.interfaces import MissingBadgrOrganizationError
+from nti.app.products.badgr.interfaces import DuplicateBadgrBadgeAwardedError
+
+from nti.app.products.badgr.ledger import BadgrAwardLedger
+
+from nti.app.products.badgr.retry import RetryPolicy
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+from nti.app.products.badgr.tests.test_awards import _User
+
+from nti.testing.matchers import verifiably_provides
+
+if sys.version_info >= (3, 6):
+    import asyncio
+    import aiohttp
+    from nti.app.products.badgr.async_client import AsyncBadgrClient
+
+
+class _Issuer(object):
+
+    entity_id = 'org1'
+
+
+class _Tokens(object):
+
+    access_token = 'token1'
+
+    def __init__(self):
+        self.threads = []
+
+    def update_tokens(self, unused_old_access_token):
+        self.threads.append(threading.current_thread())
+        self.access_token = 'token2'
+        return self.access_token
+
+
+class _RateLimiter(object):
+
+    rate = 1
+
+    def __init__(self, waits):
+        self.waits = list(waits)
+
+    def take(self):
+        return self.waits.pop(0) if self.waits else 0
+
+    def check_wait(self, wait, deadline):
+        if deadline is not None:
+            raise BadgrRateLimitExceededError()
+
+
+class _ConnectionKey(object):
+
+    host = 'api.badgr.io'
+    port = 443
+    ssl = True
+
+
+class _Badge(object):
+    pass
+
+
+class _Collection(object):
+
+    def __init__(self, items):
+        self.Items = items
+
+
+class _Integration(object):
+
+    issuer = _Issuer()
+    session_factory = None
+    award_max_workers = 2
+    circuit_failure_threshold = 0
+    rate_limit = 0
+    _rate_limit_key = 'badgr/rate'
+    _circuit_key = 'badgr/circuit'
+
+    def __init__(self):
+        self.tokens = _Tokens()
+
+
+class _Response(object):
+    """
+    An `aiohttp` response, usable without the async syntax.
+    """
+
+    def __init__(self, session, status, body=None, headers=None):
+        self.session = session
+        self.status = status
+        self.body = json.dumps(body if body is not None else {})
+        self.headers = headers or {}
+
+    def text(self):
+        return asyncio.sleep(0.01, result=self.body)
+
+    def __aenter__(self):
+        self.session.active += 1
+        self.session.most_active = max(self.session.most_active,
+                                       self.session.active)
+        return asyncio.sleep(0, result=self)
+
+    def __aexit__(self, *unused_args):
+        self.session.active -= 1
+        return asyncio.sleep(0)
+
+
+class _Session(object):
+
+    def __init__(self, responder):
+        self.responder = responder
+        self.calls = []
+        self.active = self.most_active = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        status, body = self.responder(method, url, kwargs)
+        return _Response(self, status, body)
+
+
+@unittest.skipIf(sys.version_info < (3, 6), "asyncio client requires Python 3")
+class TestAsyncBadgrClient(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _client(self, responder):
+        result = AsyncBadgrClient(_Integration(), loop=self.loop)
+        result._aiohttp_session = _Session(responder)
+        result.client.retry_policies = {'GET': RetryPolicy(backoff=0, jitter=False),
+                                        'POST': RetryPolicy(backoff=0, jitter=False,
+                                                            idempotent=False)}
+        return result
+
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_retries(self):
+        statuses = [503, 200]
+        client = self._client(lambda *args: (statuses.pop(0), {'ok': 1}))
+        result = self._run(client._make_call('/issuers'))
+        assert_that(result, is_({'ok': 1}))
+        assert_that(client._aiohttp_session.calls, has_length(2))
+        assert_that(client._aiohttp_session.calls[0],
+                    contains('GET', 'https://api.badgr.io/v2/issuers',
+                             has_entry('headers',
+                                       has_entry('Authorization', 'Bearer token1'))))
+
+        # Connection errors are retried, up to the policy
+        def _timeout(*unused_args):
+            raise asyncio.TimeoutError()
+        client = self._client(_timeout)
+        assert_that(calling(self._run).with_args(client._make_call('/issuers')),
+                    raises(BadgrClientError))
+        assert_that(client._aiohttp_session.calls, has_length(4))
+
+    def test_connection_errors(self):
+        # A failure to connect may be retried, even for an award
+        def _refused(*unused_args):
+            raise aiohttp.ClientConnectorError(_ConnectionKey(),
+                                               OSError(111, 'refused'))
+        client = self._client(_refused)
+        call = client._make_call('/awards', post_data={'id': 1})
+        assert_that(calling(self._run).with_args(call),
+                    raises(BadgrClientError))
+        assert_that(client._aiohttp_session.calls, has_length(4))
+
+        # But not a dropped connection, as Badgr may have made the award
+        def _dropped(*unused_args):
+            raise aiohttp.ServerDisconnectedError()
+        client = self._client(_dropped)
+        call = client._make_call('/awards', post_data={'id': 1})
+        assert_that(calling(self._run).with_args(call),
+                    raises(BadgrClientError))
+        assert_that(client._aiohttp_session.calls, has_length(1))
+
+    def test_refresh_token(self):
+        statuses = [401, 200]
+        client = self._client(lambda *args: (statuses.pop(0), None))
+        self._run(client._make_call('/issuers'))
+        calls = client._aiohttp_session.calls
+        assert_that(calls[1][2]['headers'],
+                    has_entry('Authorization', 'Bearer token2'))
+        # The refresh calls Badgr with requests, off the loop's thread
+        tokens = client.client._tokens
+        assert_that(tokens.threads, has_length(1))
+        assert_that(tokens.threads[0], is_not(threading.current_thread()))
+
+    def test_errors(self):
+        client = self._client(lambda *args: (500, {'error': 'down'}))
+        assert_that(calling(self._run).with_args(client._make_call('/issuers')),
+                    raises(BadgrClientError))
+
+    def test_rate_limit(self):
+        client = self._client(lambda *args: (200, None))
+        client.client._rate_limiter = _RateLimiter([0.01, 0.01])
+        client.client.rate_limit_timeout = None
+        self._run(client._make_call('/issuers'))
+        assert_that(client.client._rate_limiter.waits, is_([]))
+
+        client.client._rate_limiter = _RateLimiter([0.01])
+        client.client.rate_limit_timeout = 0
+        assert_that(calling(self._run).with_args(client._make_call('/issuers')),
+                    raises(BadgrRateLimitExceededError))
+
+    def test_post_awards(self):
+        def _respond(unused_method, unused_url, kwargs):
+            username = kwargs['json']['username']
+            if username == u'user1':
+                return 422, {'data': {'message': 'already has this badge'}}
+            if username == u'user2':
+                return 400, {'error': 'bad'}
+            return 201, {'id': username}
+        client = self._client(_respond)
+
+        award_data = [{'username': u'user%s' % i} for i in range(4)]
+        results = self._run(client.post_awards(award_data, max_workers=2))
+        assert_that(results[0], is_({'id': u'user0'}))
+        assert_that(results[1], instance_of(DuplicateBadgrBadgeAwardedError))
+        assert_that(results[2], instance_of(BadgrClientError))
+        assert_that(results[3], is_({'id': u'user3'}))
+        assert_that(client._aiohttp_session.calls, has_length(4))
+        assert_that(client._aiohttp_session.most_active, less_than_or_equal_to(2))
+
+    def test_session(self):
+        client = AsyncBadgrClient(_Integration(), loop=self.loop)
+
+        # Created while the loop runs, as in a service
+        future = self.loop.create_future()
+        self.loop.call_soon(lambda: future.set_result(client._get_aiohttp_session()))
+        session = self._run(future)
+        assert_that(client._get_aiohttp_session(), is_(session))
+        self._run(client.__aexit__(None, None, None))
+        assert_that(client._aiohttp_session, is_(None))
+        assert_that(session.closed, is_(True))
+
+    @fudge.patch('nti.app.products.badgr.async_client.IAwardedBadgrBadgeCollection')
+    def test_get(self, mock_awarded):
+        badge = _Badge()
+        mock_awarded.is_callable().returns(_Collection([badge]))
+
+        def _respond(unused_method, url, unused_kwargs):
+            if '/issuers' in url and 'badgeclasses' not in url:
+                return 200, {'result': [{'entityType': 'Issuer',
+                                         'entityId': 'issuer1',
+                                         'name': 'Issuer 1'}]}
+            return 200, {'data': {'id': 'badge1', 'name': 'Badge 1'}}
+        client = self._client(_respond)
+        client.client._get_awarded_badges_params = lambda user, **kwargs: {'filter': user}
+
+        result = self._run(client.get_issuers())
+        assert_that(result, verifiably_provides(IBadgrIssuerCollection))
+        assert_that(result.issuers[0].entity_id, is_(u'issuer1'))
+        result = self._run(client.get_issuer('issuer1'))
+        assert_that(result, verifiably_provides(IBadgrIssuer))
+        assert_that(client._aiohttp_session.calls[-1][1],
+                    is_('https://api.badgr.io/v2/issuers/issuer1'))
+
+        result = self._run(client.get_badge('badge1'))
+        assert_that(result.template_id, is_(u'badge1'))
+        assert_that(client._aiohttp_session.calls[-1][1],
+                    is_('https://api.badgr.io/v2/badgeclasses/badge1'))
+        self._run(client.get_badges())
+        assert_that(client._aiohttp_session.calls[-1][1],
+                    is_('https://api.badgr.io/v2/issuers/org1/badgeclasses'))
+
+        user = _User(u'user1', 1)
+        self._run(client.get_awarded_badges(user))
+        assert_that(client._aiohttp_session.calls[-1][2],
+                    has_entry('params', {'filter': user}))
+        assert_that(badge.User, is_(user))
+
+        client.client.organization_id = None
+        for call in (client.get_badge('badge1'),
+                     client.get_badges(),
+                     client.get_awarded_badges(user),
+                     client.award_badge(user, 'badge1'),
+                     client.award_badges([user], 'badge1')):
+            assert_that(calling(self._run).with_args(call),
+                        raises(MissingBadgrOrganizationError))
+
+    def test_iter_badges(self):
+        def _respond(unused_method, unused_url, kwargs):
+            page = kwargs['params']['page']
+            return 200, {'data': [{'id': 'badge%s' % page}],
+                         'metadata': {'current_page': page, 'total_pages': 3}}
+        client = self._client(_respond)
+
+        # Without the async syntax, which Python 2 cannot compile
+        badges = client.iter_badges()
+        result = []
+        while True:
+            try:
+                result.append(self._run(badges.__anext__()).template_id)
+            except StopAsyncIteration:  # pylint: disable=undefined-variable
+                break
+        assert_that(result, is_([u'badge1', u'badge2', u'badge3']))
+        assert_that(client._aiohttp_session.calls, has_length(3))
+
+    @fudge.patch('nti.app.products.badgr.client.queue_badge_award')
+    def test_award_badge(self, mock_queue):
+        # Queued in the award outbox, as by the sync client
+        queued = []
+
+        def _queue(user, badge_template_id, **unused_kwargs):
+            queued.append(user.username)
+            return badge_template_id
+        mock_queue.is_callable().calls(_queue)
+        client = self._client(lambda *args: (201, {}))
+        client.client._award_ledger = BadgrAwardLedger()
+        client.client._get_user_id = lambda user: user.intid
+
+        user1 = _User(u'user1', 1)
+        assert_that(self._run(client.award_badge(user1, 'badge1')), is_('badge1'))
+        # Known to the ledger
+        client.client._award_ledger.record_award(1, 'badge1')
+        assert_that(calling(self._run).with_args(client.award_badge(user1, 'badge1')),
+                    raises(DuplicateBadgrBadgeAwardedError))
+
+        user2 = _User(u'user2', 2)
+        result = self._run(client.award_badges([user1, user2], 'badge1'))
+        assert_that([x.status for x in result],
+                    is_([AWARD_STATUS_DUPLICATE, AWARD_STATUS_QUEUED]))
+        assert_that(queued, is_([u'user1', u'user2']))
+        # Nothing was sent to Badgr
+        assert_that(client._aiohttp_session.calls, has_length(0))
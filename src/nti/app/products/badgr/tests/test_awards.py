@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import has_entry
+from hamcrest import assert_that
+from hamcrest import has_entries
+from hamcrest import instance_of
+from hamcrest import less_than_or_equal_to
+
+import time
+import unittest
+import threading
+
+import fudge
+
+from pyramid.testing import DummyRequest
+
+from zope import interface
+
+from nti.app.products.badgr import AWARD_STATUS_FAILED
+from nti.app.products.badgr import AWARD_STATUS_QUEUED
+from nti.app.products.badgr import AWARD_STATUS_DUPLICATE
+
+from nti.app.products.badgr.client import BadgrClient
+
+from nti.app.products.badgr.client_models import BadgrBadgeAwardResult
+
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import DuplicateBadgrBadgeAwardedError
+
+from nti.app.products.badgr.ledger import BadgrAwardLedger
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+from nti.app.products.badgr.views.awards import BadgrBulkAwardView
+
+from nti.dataserver.interfaces import IUser
+
+
+@interface.implementer(IUser)
+class _User(object):
+
+    def __init__(self, username, intid):
+        self.username = username
+        self.intid = intid
+
+
+class _Integration(object):
+
+    award_max_workers = 2
+
+
+def _client():
+    client = BadgrClient(_Integration(), rate_limit_timeout=None)
+    # Resolved state, as if from a real integration
+    client.organization_id = 'org1'
+    client._tokens = object()
+    client._access_token = 'token'
+    client._session_factory = None
+    client._rate_limiter = None
+    client._circuit_breaker = None
+    client._single_flight_cluster = False
+    client._award_ledger = BadgrAwardLedger()
+    client._get_user_id = lambda user: user.intid
+    client.get_award_data = lambda user, badge, **kwargs: {'username': user.username}
+    return client
+
+
+class TestAwardBadges(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    @fudge.patch('nti.app.products.badgr.client.queue_badge_award')
+    def test_award_badges(self, mock_queue):
+        queued = []
+        mock_queue.is_callable().calls(lambda user, badge, **kwargs: queued.append((user.username, kwargs)))
+        client = _client()
+        users = [_User(u'user%s' % i, i) for i in range(3)]
+        # The ledger knows user1 has the badge
+        client._award_ledger.record_award(1, 'badge1')
+
+        results = client.award_badges(users, 'badge1', locale=u'en')
+        assert_that([x.username for x in results],
+                    is_([u'user0', u'user1', u'user2']))
+        assert_that([x.status for x in results],
+                    is_([AWARD_STATUS_QUEUED, AWARD_STATUS_DUPLICATE,
+                         AWARD_STATUS_QUEUED]))
+        # Queued in the outbox; nothing is sent to Badgr
+        assert_that([username for username, unused in queued],
+                    is_([u'user0', u'user2']))
+        assert_that(queued[0][1], has_entries('integration', client.authorized_integration,
+                                              'locale', u'en'))
+
+    def test_no_users(self):
+        assert_that(_client().award_badges((), 'badge1'), is_([]))
+
+    def test_post_awards(self):
+        client = _client()
+        lock = threading.Lock()
+        active = [0]
+        most_active = [0]
+        posted = []
+
+        def _post_award(data):
+            with lock:
+                active[0] += 1
+                most_active[0] = max(most_active[0], active[0])
+                posted.append(data['username'])
+            try:
+                time.sleep(0.05)
+                if data['username'] == u'user1':
+                    raise DuplicateBadgrBadgeAwardedError()
+                if data['username'] == u'user2':
+                    raise BadgrClientError('Badgr is down')
+                return {'id': data['username']}
+            finally:
+                with lock:
+                    active[0] -= 1
+        client.post_award = _post_award
+
+        award_data = [{'username': u'user%s' % i} for i in range(5)]
+        results = client.post_awards(award_data)
+        assert_that(results[0], is_({'id': u'user0'}))
+        assert_that(results[1], instance_of(DuplicateBadgrBadgeAwardedError))
+        assert_that(results[2], instance_of(BadgrClientError))
+        assert_that(results[3:], is_([{'id': u'user3'}, {'id': u'user4'}]))
+        # At most `award_max_workers` at once
+        assert_that(sorted(posted), is_([u'user%s' % i for i in range(5)]))
+        assert_that(most_active[0], less_than_or_equal_to(2))
+
+        assert_that(client.post_awards(()), is_([]))
+
+
+class TestBulkAwardView(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def _request(self, **params):
+        request = DummyRequest(params=params)
+        request.body = b''
+        request.context = _Integration()
+        return request
+
+    @fudge.patch('nti.app.products.badgr.views.awards.User.get_user',
+                 'nti.app.products.badgr.views.awards.IBadgrClient')
+    def test_bulk_award(self, mock_get_user, mock_client):
+        users = {u'user1': _User(u'user1', 1),
+                 u'user2': _User(u'user2', 2)}
+        mock_get_user.is_callable().calls(users.get)
+        award_calls = []
+
+        def _award_badges(users, unused_badge_template_id, **kwargs):
+            award_calls.append(kwargs)
+            return [BadgrBadgeAwardResult(username=user.username,
+                                          status=AWARD_STATUS_DUPLICATE if user.username == u'user2'
+                                                 else AWARD_STATUS_QUEUED)
+                    for user in users]
+        client = fudge.Fake('BadgrClient').provides('award_badges').calls(_award_badges)
+        mock_client.is_callable().returns(client)
+
+        request = self._request(badge_template_id=u'badge1',
+                                usernames=u'user1,user2,missing',
+                                suppress_badge_notification_email=u'false')
+        result = BadgrBulkAwardView(request)()
+        assert_that(result, has_entries('Total', 3,
+                                        'ItemCount', 3))
+        assert_that([(x.username, x.status) for x in result['Items']],
+                    contains((u'user1', AWARD_STATUS_QUEUED),
+                             (u'user2', AWARD_STATUS_DUPLICATE),
+                             (u'missing', AWARD_STATUS_FAILED)))
+        # "false" is not true
+        assert_that(award_calls[0],
+                    has_entry('suppress_badge_notification_email', False))
+
+        request = self._request(badge_template_id=u'badge1',
+                                usernames=u'user1,user2',
+                                suppress_badge_notification_email=u'true')
+        BadgrBulkAwardView(request)()
+        assert_that(award_calls[1],
+                    has_entry('suppress_badge_notification_email', True))
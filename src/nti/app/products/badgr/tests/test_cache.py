@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import not_none
+from hamcrest import assert_that
+from hamcrest import has_properties
+
+import unittest
+
+import fakeredis
+
+import fudge
+
+from zope import component
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.products.badgr.cache import BadgrResponseCache
+from nti.app.products.badgr.cache import RedisBadgrResponseCache
+
+from nti.app.products.badgr.cache import awarded_badges_namespace
+from nti.app.products.badgr.cache import invalidate_awarded_badges
+
+from nti.app.products.badgr.interfaces import IBadgrResponseCache
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_cache(self):
+        cache = BadgrResponseCache()
+        assert_that(cache.get('catalog/site', 'key'), none())
+
+        cache.set('catalog/site', 'key', {'data': []}, etag='"abc"', ttl=60,
+                  content_hash='hash')
+        entry = cache.get('catalog/site', 'key')
+        assert_that(entry, has_properties('value', {'data': []},
+                                          'etag', '"abc"',
+                                          'content_hash', 'hash',
+                                          'fresh', True))
+
+        # Expired entries are still returned for revalidation
+        cache.set('catalog/site', 'key', {'data': []}, etag='"abc"', ttl=-1,
+                  content_hash='hash')
+        entry = cache.get('catalog/site', 'key')
+        assert_that(entry.fresh, is_(False))
+        cache.touch('catalog/site', 'key', ttl=60)
+        assert_that(entry, has_properties('fresh', True,
+                                          'content_hash', 'hash'))
+
+        cache.set('catalog/other', 'key', {})
+        cache.invalidate('catalog/site')
+        assert_that(cache.get('catalog/site', 'key'), none())
+        assert_that(cache.get('catalog/other', 'key'), not_none())
+
+    def test_eviction(self):
+        cache = BadgrResponseCache()
+        cache.max_entries = 2
+        cache.set('ns', 'a', 1)
+        cache.set('ns', 'b', 2)
+        # Touch `a` so that `b` is the least recently used
+        cache.get('ns', 'a')
+        cache.set('ns', 'c', 3)
+        assert_that(cache.get('ns', 'b'), none())
+        assert_that(cache.get('ns', 'a'), not_none())
+        assert_that(cache.get('ns', 'c'), not_none())
+
+
+def _redis_cache(redis):
+
+    class _Cache(RedisBadgrResponseCache):
+        _redis = redis
+
+    return _Cache()
+
+
+class TestRedisResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+
+    def test_shared(self):
+        cache = _redis_cache(self.redis)
+        other = _redis_cache(self.redis)
+        cache.set('catalog/site', 'key', {'data': [1]}, etag='"abc"', ttl=60,
+                  content_hash='hash')
+        entry = other.get('catalog/site', 'key')
+        assert_that(entry, has_properties('value', {'data': [1]},
+                                          'etag', '"abc"',
+                                          'content_hash', 'hash',
+                                          'fresh', True))
+        # Now held locally
+        assert_that(BadgrResponseCache.get(other, 'catalog/site', 'key'),
+                    has_properties('content_hash', 'hash'))
+
+    def test_invalidation_seen_by_local_copies(self):
+        cache = _redis_cache(self.redis)
+        other = _redis_cache(self.redis)
+        cache.set('awarded/site/1', 'key', {'data': []})
+        assert_that(other.get('awarded/site/1', 'key'), not_none())
+        # Invalidated (e.g. by an award) in another process
+        cache.invalidate('awarded/site/1')
+        assert_that(other.get('awarded/site/1', 'key'), none())
+
+        cache.set('awarded/site/1', 'key', {'data': [1]})
+        assert_that(other.get('awarded/site/1', 'key').value, is_({'data': [1]}))
+
+    def test_stale_revalidation(self):
+        cache = _redis_cache(self.redis)
+        cache.set('catalog/site', 'key', {'data': []}, etag='"abc"', ttl=-1,
+                  content_hash='hash')
+        other = _redis_cache(self.redis)
+        entry = other.get('catalog/site', 'key')
+        # Expired, but still available to be revalidated by ETag
+        assert_that(entry, has_properties('etag', '"abc"',
+                                          'fresh', False))
+        other.touch('catalog/site', 'key', ttl=60)
+        assert_that(cache.get('catalog/site', 'key'),
+                    has_properties('fresh', True,
+                                   'content_hash', 'hash'))
+
+    def test_redis_unavailable(self):
+
+        class _Broken(object):
+
+            def __getattr__(self, name):
+                raise ValueError(name)
+
+        cache = _redis_cache(_Broken())
+        cache.set('catalog/site', 'key', {'data': []})
+        # Degrades to the local tier
+        assert_that(cache.get('catalog/site', 'key').value, is_({'data': []}))
+        cache.invalidate('catalog/site')
+        assert_that(cache.get('catalog/site', 'key'), none())
+
+
+class TestAwardedBadgesInvalidation(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def test_award_seen_across_processes(self):
+        redis = fakeredis.FakeStrictRedis()
+        cache = _redis_cache(redis)
+        other = _redis_cache(redis)
+        user = object()
+        intids = fudge.Fake('IntIds').provides('getId').returns(42)
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(intids, IIntIds)
+        gsm.registerUtility(cache, IBadgrResponseCache)
+        try:
+            namespace = awarded_badges_namespace(user, site_name='site')
+            assert_that(namespace, is_('awarded/site/42'))
+            cache.set(namespace, 'page1', {'data': []})
+            assert_that(other.get(namespace, 'page1'), not_none())
+            # Awarding in this process; the other must not serve its copy
+            invalidate_awarded_badges(user, site_name='site')
+            assert_that(other.get(namespace, 'page1'), none())
+        finally:
+            gsm.unregisterUtility(intids, IIntIds)
+            gsm.unregisterUtility(cache, IBadgrResponseCache)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import raises
+from hamcrest import calling
+from hamcrest import assert_that
+
+import unittest
+
+import fakeredis
+
+from requests.exceptions import ReadTimeout
+
+from nti.app.products.badgr.circuit import BadgrCircuitBreaker
+
+from nti.app.products.badgr.client import BadgrClient
+
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import BadgrCircuitOpenError
+from nti.app.products.badgr.interfaces import BadgrRateLimitExceededError
+
+from nti.app.products.badgr.ratelimit import BadgrRateLimiter
+
+from nti.app.products.badgr.retry import NO_RETRY
+
+
+def _breaker(redis, **kwargs):
+
+    class _Breaker(BadgrCircuitBreaker):
+        _redis = redis
+
+    return _Breaker('badgr/circuit', **kwargs)
+
+
+class _Response(object):
+
+    status_code = 200
+    headers = {}
+
+
+class _Session(object):
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    def get(self, unused_url, **unused_kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return _Response()
+
+
+class _RateLimiter(object):
+
+    def acquire(self, timeout=None):
+        raise BadgrRateLimitExceededError()
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+
+    def _half_open(self, breaker):
+        breaker._open(self.redis)
+        # The open period has passed
+        self.redis.delete(breaker._open_key)
+
+    def test_open(self):
+        breaker = _breaker(self.redis, failure_threshold=2)
+        assert_that(breaker.before_call(), is_(False))
+        breaker.record_failure()
+        assert_that(breaker.before_call(), is_(False))
+        breaker.record_failure()
+        assert_that(calling(breaker.before_call),
+                    raises(BadgrCircuitOpenError))
+
+    def test_probe(self):
+        breaker = _breaker(self.redis, failure_threshold=2)
+        self._half_open(breaker)
+        assert_that(breaker.before_call(), is_(True))
+        # A single probe at a time
+        assert_that(calling(breaker.before_call),
+                    raises(BadgrCircuitOpenError))
+        breaker.release_probe(True)
+        probe = breaker.before_call()
+        assert_that(probe, is_(True))
+        breaker.record_success(probe)
+        assert_that(breaker.before_call(), is_(False))
+
+        # A failed probe re-opens the circuit
+        self._half_open(breaker)
+        breaker.record_failure(breaker.before_call())
+        assert_that(calling(breaker.before_call),
+                    raises(BadgrCircuitOpenError))
+
+    def _client(self, breaker, session):
+        client = BadgrClient(object(), rate_limit_timeout=0)
+        client._access_token = 'token'
+        client._session_factory = lambda: session
+        client._circuit_breaker = breaker
+        client.retry_policies = {'GET': NO_RETRY}
+        return client
+
+    def test_rate_limited_probe(self):
+        breaker = _breaker(self.redis, failure_threshold=2)
+        self._half_open(breaker)
+        session = _Session()
+        client = self._client(breaker, session)
+        client._rate_limiter = _RateLimiter()
+        assert_that(calling(client._make_call).with_args('/issuers'),
+                    raises(BadgrRateLimitExceededError))
+        assert_that(session.calls, is_(0))
+        # The probe slot was given up, without re-opening the circuit
+        assert_that(breaker.before_call(), is_(True))
+
+    def test_timeouts(self):
+        # A slow Badgr trips the circuit
+        breaker = _breaker(self.redis, failure_threshold=2)
+        session = _Session(ReadTimeout('slow'))
+        client = self._client(breaker, session)
+        client._rate_limiter = BadgrRateLimiter('badgr/rate', rate=0)
+        for unused_i in range(2):
+            assert_that(calling(client._make_call).with_args('/issuers'),
+                        raises(BadgrClientError))
+        assert_that(calling(client._make_call).with_args('/issuers'),
+                    raises(BadgrCircuitOpenError))
+        assert_that(session.calls, is_(2))
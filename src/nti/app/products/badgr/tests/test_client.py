@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import raises
+from hamcrest import calling
+from hamcrest import has_length
+from hamcrest import assert_that
+from hamcrest import has_properties
+
+import os
+import json
+import unittest
+
+import fudge
+
+from nti.app.products.badgr.client import BadgrClient
+
+from nti.app.products.badgr.interfaces import IBadgrIssuer
+from nti.app.products.badgr.interfaces import IBadgrIssuerCollection
+from nti.app.products.badgr.interfaces import MissingBadgrOrganizationError
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+from nti.testing.matchers import verifiably_provides
+
+
+class _Response(object):
+
+    closed = False
+
+    def __init__(self, status_code, ext=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = json.dumps(ext).encode('utf-8') if ext else b''
+        self.text = self.content.decode('utf-8')
+
+    def close(self):
+        self.closed = True
+
+
+def _badge(index):
+    return {'id': u'badge%s' % index,
+            'name': u'Badge %s' % index,
+            'owner': {'id': u'issuer1', 'name': u'Issuer 1'}}
+
+
+def _badges_page(params, total=5, size=2):
+    page = params.get('page') or 1
+    start = (page - 1) * size
+    data = [_badge(x) for x in range(start, min(start + size, total))]
+    return {'data': data,
+            'metadata': {'count': len(data),
+                         'total_count': total,
+                         'current_page': page,
+                         'total_pages': (total + size - 1) // size}}
+
+
+class _Session(object):
+    """
+    Serves Badgr payloads by url path, recording the path and params
+    of each call.
+    """
+
+    def __init__(self, payloads):
+        self.payloads = payloads
+        self.calls = []
+
+    def get(self, url, params=None, **unused_kwargs):
+        path = url[len(BadgrClient.BASE_URL):]
+        self.calls.append((path, params))
+        payload = self.payloads[path]
+        if callable(payload):
+            payload = payload(params or {})
+        return _Response(200, payload)
+
+
+class _Issuer(object):
+
+    entity_id = u'issuer1'
+
+
+class _Tokens(object):
+
+    access_token = 'token'
+
+
+class _Integration(object):
+
+    _rate_limit_key = 'badgr/rate'
+    _circuit_key = 'badgr/circuit'
+    rate_limit = 0
+    circuit_failure_threshold = 0
+    single_flight_cluster = False
+    page_max_workers = 2
+
+    def __init__(self, session, issuer=_Issuer()):
+        self.issuer = issuer
+        self.tokens = _Tokens()
+        self.session_factory = lambda: session
+
+
+class TestBadgrClient(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def _client(self, payloads, issuer=_Issuer()):
+        session = _Session(payloads)
+        return BadgrClient(_Integration(session, issuer), rate_limit_timeout=None), session
+
+    def _load_resource(self, name):
+        path = os.path.join(os.path.dirname(__file__), 'data', name)
+        with open(path) as f:
+            return json.load(f)
+
+    def test_issuers(self):
+        issuers = self._load_resource('issuer_collection.json')
+        client, session = self._client({'/issuers': {'status': {'success': True},
+                                                     'result': issuers},
+                                        '/issuers/123456': {'status': {'success': True},
+                                                            'result': issuers}})
+        collection = client.get_issuers()
+        assert_that(collection, verifiably_provides(IBadgrIssuerCollection))
+        assert_that(collection.issuers, has_length(1))
+        assert_that(collection.issuers[0],
+                    has_properties(entity_id=u'123456',
+                                   entity_type=u'Issuer',
+                                   email=u'user@example.com'))
+
+        issuer = client.get_issuer(u'123456')
+        assert_that(issuer, verifiably_provides(IBadgrIssuer))
+        assert_that(issuer.entity_id, is_(u'123456'))
+        assert_that([path for path, unused in session.calls],
+                    is_(['/issuers', '/issuers/123456']))
+
+    @fudge.patch('nti.app.products.badgr.client.catalog_namespace')
+    def test_get_badge(self, mock_namespace):
+        mock_namespace.is_callable().returns('catalog/test_get_badge')
+        client, session = self._client({'/badgeclasses/badge1': {'data': _badge(1)}})
+        badge = client.get_badge(u'badge1')
+        assert_that(badge, has_properties(template_id=u'badge1',
+                                          organization_id=u'issuer1'))
+        assert_that(session.calls, is_([('/badgeclasses/badge1', None)]))
+
+    @fudge.patch('nti.app.products.badgr.client.catalog_namespace')
+    def test_get_badges(self, mock_namespace):
+        mock_namespace.is_callable().returns('catalog/test_get_badges')
+        client, session = self._client({'/issuers/issuer1/badgeclasses': _badges_page})
+
+        collection = client.get_badges(page=2)
+        assert_that([x.template_id for x in collection.Items],
+                    is_([u'badge2', u'badge3']))
+        assert_that(collection.current_page, is_(2))
+
+        collection = client.get_badges(all_pages=True)
+        assert_that(collection.Items, has_length(5))
+
+        collection = client.get_badges(batch_start=1, batch_size=3)
+        assert_that([x.template_id for x in collection.Items],
+                    is_([u'badge1', u'badge2', u'badge3']))
+        assert_that(set(path for path, unused in session.calls),
+                    is_({'/issuers/issuer1/badgeclasses'}))
+
+    @fudge.patch('nti.app.products.badgr.client.catalog_namespace')
+    def test_iter_badges(self, mock_namespace):
+        mock_namespace.is_callable().returns('catalog/test_iter_badges')
+        client, unused_session = self._client({'/issuers/issuer1/badgeclasses': _badges_page})
+        assert_that([x.template_id for x in client.iter_badges()],
+                    is_([u'badge%s' % x for x in range(5)]))
+
+    def test_no_issuer(self):
+        client, session = self._client({}, issuer=None)
+        assert_that(calling(client.get_badges),
+                    raises(MissingBadgrOrganizationError))
+        assert_that(calling(list).with_args(client.iter_badges()),
+                    raises(MissingBadgrOrganizationError))
+        assert_that(session.calls, is_([]))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import assert_that
+from hamcrest import same_instance
+
+import unittest
+
+from datetime import datetime
+
+from nti.app.products.badgr import datetimes
+
+from nti.app.products.badgr.datetimes import parse_datetime
+
+from nti.externalization.datetime import datetime_from_string
+
+
+class TestDatetimes(unittest.TestCase):
+
+    def test_parse(self):
+        for value, expected in (('2019-03-07T19:44:21Z', datetime(2019, 3, 7, 19, 44, 21)),
+                                ('2019-03-07T19:44:21.123Z', datetime(2019, 3, 7, 19, 44, 21, 123000)),
+                                ('2019-03-07T19:44:21.1234567Z', datetime(2019, 3, 7, 19, 44, 21, 123456)),
+                                ('2019-03-07T19:44:21-05:00', datetime(2019, 3, 8, 0, 44, 21)),
+                                ('2019-03-07T19:44:21+0130', datetime(2019, 3, 7, 18, 14, 21)),
+                                ('2019-03-07 19:44', datetime(2019, 3, 7, 19, 44)),
+                                ('2019-03-07T19:44:21', datetime(2019, 3, 7, 19, 44, 21))):
+            result = parse_datetime(value)
+            assert_that(result, is_(expected))
+            assert_that(result.tzinfo, none())
+            assert_that(result, is_(datetime_from_string(value)))
+
+    def test_memo(self):
+        datetimes._memo.clear()
+        value = '2019-03-07T19:44:21.000Z'
+        assert_that(parse_datetime(value), same_instance(parse_datetime(value)))
+
+        old_size = datetimes.MEMO_SIZE
+        datetimes.MEMO_SIZE = 2
+        try:
+            parse_datetime('2019-03-08T19:44:21Z')
+            parse_datetime('2019-03-09T19:44:21Z')
+            assert_that(len(datetimes._memo), is_(1))
+        finally:
+            datetimes.MEMO_SIZE = old_size
+
+    def test_fallback(self):
+        # Not a date-time we parse ourselves
+        assert_that(parse_datetime('2019-03-07'),
+                    is_(datetime_from_string('2019-03-07')))
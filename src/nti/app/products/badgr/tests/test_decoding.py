@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import assert_that
+
+import io
+import json
+import unittest
+
+from nti.app.products.badgr.decoding import StreamedPage
+
+from nti.app.products.badgr.decoding import loads
+from nti.app.products.badgr.decoding import content_hash
+from nti.app.products.badgr.decoding import set_decoder
+from nti.app.products.badgr.decoding import get_decoder_name
+
+
+class _Raw(io.BytesIO):
+    decode_content = False
+
+
+class _Response(object):
+
+    closed = False
+
+    def __init__(self, ext):
+        self.content = json.dumps(ext).encode('utf-8')
+        self.raw = _Raw(self.content)
+
+    def close(self):
+        self.closed = True
+
+
+class TestDecoding(unittest.TestCase):
+
+    def test_loads(self):
+        assert_that(loads(b'{"a": [1, "b"]}'), is_({'a': [1, 'b']}))
+        assert_that(loads(u'{"a": null}'), is_({'a': None}))
+        name = get_decoder_name()
+        try:
+            assert_that(set_decoder('json'), is_(True))
+            assert_that(loads(b'{"a": 1.5}'), is_({'a': 1.5}))
+            assert_that(set_decoder('not_a_json_library'), is_(False))
+            assert_that(get_decoder_name(), is_('json'))
+        finally:
+            set_decoder(name)
+
+    def test_streamed_page(self):
+        ext = {'data': [{'id': 'a', 'nested': {'items': [1, 2]}},
+                        {'id': 'b', 'nested': {}}],
+               'metadata': {'total_pages': 2, 'count': 2}}
+        response = _Response(ext)
+        page = StreamedPage(response)
+        assert_that(list(page), is_(ext['data']))
+        assert_that(page.metadata, is_(ext['metadata']))
+        assert_that(response.closed, is_(True))
+
+    def test_content_hash(self):
+        ext = {'data': [{'id': u'a', 'name': u'badge'}], 'metadata': {'count': 1}}
+        same = {'metadata': {'count': 1}, 'data': [{'name': u'badge', 'id': u'a'}]}
+        assert_that(content_hash(ext), is_(content_hash(same)))
+        same['metadata']['count'] = 2
+        assert_that(content_hash(ext) == content_hash(same), is_(False))
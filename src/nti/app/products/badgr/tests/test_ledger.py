@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import contains
+from hamcrest import assert_that
+
+import unittest
+
+from nti.app.products.badgr.ledger import BadgrAwardLedger
+
+
+class TestAwardLedger(unittest.TestCase):
+
+    def test_ledger(self):
+        ledger = BadgrAwardLedger()
+        assert_that(ledger.has_award(1, u'badge1'), is_(False))
+        ledger.record_award(1, u'badge1')
+        ledger.record_award(2, u'badge1')
+        ledger.record_award(2, u'badge2')
+        # Recording an award again does not count it twice
+        ledger.record_award(2, u'badge2')
+        assert_that(ledger.has_award(1, u'badge1'), is_(True))
+        assert_that(ledger.has_award(1, u'badge2'), is_(False))
+        assert_that(len(ledger), is_(3))
+        assert_that(list(ledger.awarded_badges(2)), contains(u'badge1', u'badge2'))
+
+        # Bulk lookups
+        assert_that(list(ledger.awarded_intids(u'badge1', range(5))), contains(1, 2))
+        assert_that(list(ledger.awarded_intids(u'badge2', [1, 2])), contains(2))
+        assert_that(list(ledger.awarded_intids(u'badge3', [1, 2])), is_([]))
+
+        ledger.remove_award(2, u'badge1')
+        ledger.remove_award(2, u'badge1')
+        assert_that(len(ledger), is_(2))
+        assert_that(list(ledger.awarded_intids(u'badge1')), contains(1))
+        ledger.remove_user(2)
+        assert_that(list(ledger.awarded_badges(2)), is_([]))
+        assert_that(len(ledger), is_(1))
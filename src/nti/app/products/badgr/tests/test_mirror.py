@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import is_not
+from hamcrest import has_key
+from hamcrest import has_entry
+from hamcrest import contains
+from hamcrest import assert_that
+
+import unittest
+
+from zope import interface
+
+from nti.app.products.badgr.ledger import BadgrAwardLedger
+
+from nti.app.products.badgr.mirror import BadgrAssertionMirror
+
+from nti.app.products.badgr.mirror import _user_emails
+from nti.app.products.badgr.mirror import _records_hash
+from nti.app.products.badgr.mirror import _sort_records
+
+from nti.app.products.badgr.sync import _apply_page
+
+from nti.dataserver.users.interfaces import IUserProfile
+
+
+def _assertion(entity_id, email, badge, state='accepted', public=True,
+               issued_at=u'2020-01-01T00:00:00Z'):
+    return {'id': entity_id,
+            'recipient_email': email,
+            'badge_template': {'id': badge, 'name': badge.upper()},
+            'state': state,
+            'public': public,
+            'issued_at': issued_at}
+
+
+class TestAssertionMirror(unittest.TestCase):
+
+    def test_mirror(self):
+        mirror = BadgrAssertionMirror()
+        assert_that(mirror.is_warm, is_(False))
+        mirror.upsert(_assertion(u'a1', u'User1@example.com', u'b1'), user_intid=1)
+        mirror.upsert(_assertion(u'a2', u'user1@example.com', u'b2', state=u'pending',
+                                 issued_at=u'2021-01-01T00:00:00Z'))
+        mirror.upsert(_assertion(u'a3', u'user2@example.com', u'b1', public=False))
+        mirror.upsert(_assertion(u'a4', u'other@example.com', u'b2'), user_intid=1)
+        assert_that(len(mirror), is_(4))
+
+        def _ids(records):
+            return [x.entity_id for x in records]
+
+        records = mirror.query(emails=(u'user1@example.com',),
+                               states=(u'pending', u'accepted'))
+        assert_that(_ids(records), contains(u'a1', u'a2'))
+        records = mirror.query(emails=(u'user1@example.com',),
+                               user_intid=1,
+                               states=(u'accepted',))
+        assert_that(_ids(records), contains(u'a1', u'a4'))
+        records = mirror.query(emails=(u'user1@example.com',),
+                               badge_template_id=u'b2',
+                               states=(u'pending', u'accepted'))
+        assert_that(_ids(records), contains(u'a2'))
+        records = mirror.query(emails=(u'user2@example.com',),
+                               states=(u'accepted',),
+                               public_only=True)
+        assert_that(records, is_([]))
+
+        records = mirror.query(emails=(u'user1@example.com',), user_intid=1,
+                               states=(u'pending', u'accepted'))
+        records = _sort_records(records, ['-issued_at', 'badge_templates[name]'])
+        assert_that(_ids(records), contains(u'a2', u'a1', u'a4'))
+
+        # Updates are re-indexed
+        mirror.upsert(_assertion(u'a2', u'user1@example.com', u'b2', state=u'revoked'))
+        records = mirror.query(emails=(u'user1@example.com',),
+                               states=(u'pending', u'accepted'))
+        assert_that(_ids(records), contains(u'a1'))
+        assert_that(mirror.remove(u'a1').entity_id, is_(u'a1'))
+        assert_that(mirror.remove(u'a1'), none())
+        assert_that(mirror.query(emails=(u'user1@example.com',), states=(u'accepted',)),
+                    is_([]))
+
+    def test_images(self):
+        mirror = BadgrAssertionMirror()
+        data = _assertion(u'a1', u'user1@example.com', u'b1')
+        data['image_string'] = u'aGVsbG8='
+        data['badge_template']['image_string'] = u'aGVsbG8='
+        data['badge_template']['image_url'] = u'https://example.com/b1.png'
+        record = mirror.upsert(data)
+        assert_that(record.data, is_not(has_key('image_string')))
+        assert_that(record.data['badge_template'],
+                    is_not(has_key('image_string')))
+        assert_that(record.data['badge_template'],
+                    has_entry('image_url', u'https://example.com/b1.png'))
+        # The caller's JSON is left alone
+        assert_that(data, has_key('image_string'))
+
+    def test_records_hash(self):
+        mirror = BadgrAssertionMirror()
+        records = [mirror.upsert(_assertion(u'a1', u'user1@example.com', u'b1')),
+                   mirror.upsert(_assertion(u'a2', u'user1@example.com', u'b2'))]
+        metadata = {'count': 2, 'total_count': 2}
+        digest = _records_hash(records, metadata)
+        assert_that(_records_hash(list(records), dict(metadata)), is_(digest))
+        assert_that(_records_hash(records[:1], metadata), is_not(digest))
+        assert_that(_records_hash(records, {'count': 2, 'total_count': 3}),
+                    is_not(digest))
+        # Updates replace the record
+        records[1] = mirror.upsert(_assertion(u'a2', u'user1@example.com', u'b2',
+                                              public=False))
+        assert_that(_records_hash(records, metadata), is_not(digest))
+
+    def test_user_emails(self):
+
+        @interface.implementer(IUserProfile)
+        class _Profile(object):
+            email = u'User1@example.com'
+            contact_email = u'contact@example.com'
+
+        mirror = BadgrAssertionMirror()
+        mirror.upsert(_assertion(u'a1', u'old@example.com', u'b1'), user_intid=1)
+        mirror.upsert(_assertion(u'a2', u'old@example.com', u'b2'))
+        mirror.upsert(_assertion(u'a3', u'contact@example.com', u'b3'))
+        mirror.upsert(_assertion(u'a4', u'other@example.com', u'b4'), user_intid=2)
+        emails = _user_emails(_Profile(), mirror, 1)
+        assert_that(sorted(emails),
+                    contains(u'contact@example.com', u'old@example.com',
+                             u'user1@example.com'))
+        # Every address of the user, and their intid, matches
+        records = mirror.query(emails=emails, user_intid=1,
+                               states=(u'accepted',))
+        assert_that(sorted(x.entity_id for x in records),
+                    contains(u'a1', u'a2', u'a3'))
+
+
+class TestAssertionSync(unittest.TestCase):
+
+    def _page(self, updated, total_pages=3):
+        return {'data': [{'id': u'a%s' % i, 'updated_at': x} for i, x in updated],
+                'metadata': {'total_pages': total_pages}}
+
+    def test_apply_page(self):
+        mirror = BadgrAssertionMirror()
+        ext = self._page([(1, u'2020-01-01T00:00:00Z'), (2, u'2020-01-02T00:00:00Z')])
+        assert_that(_apply_page(mirror, None, 1, ext), is_(True))
+        assert_that(mirror.sync_watermark, is_(u'2020-01-02T00:00:00Z'))
+        assert_that(mirror.sync_page, is_(1))
+        assert_that(mirror.is_warm, is_(False))
+
+        # A stale position is not applied
+        assert_that(_apply_page(mirror, None, 1, ext), is_(False))
+
+        # A page all updated at the watermark moves on to the next page
+        ext = self._page([(2, u'2020-01-02T00:00:00Z'), (3, u'2020-01-02T00:00:00Z')])
+        assert_that(_apply_page(mirror, u'2020-01-02T00:00:00Z', 1, ext), is_(True))
+        assert_that(mirror.sync_watermark, is_(u'2020-01-02T00:00:00Z'))
+        assert_that(mirror.sync_page, is_(2))
+
+        # The last page
+        ext = self._page([(4, u'2020-01-03T00:00:00Z')], total_pages=2)
+        assert_that(_apply_page(mirror, u'2020-01-02T00:00:00Z', 2, ext), is_(False))
+        assert_that(mirror.sync_watermark, is_(u'2020-01-03T00:00:00Z'))
+        assert_that(mirror.sync_page, is_(1))
+        assert_that(mirror.is_warm, is_(True))
+        assert_that(len(mirror), is_(4))
+
+    def test_revoked(self):
+        mirror = BadgrAssertionMirror()
+        ledger = BadgrAwardLedger()
+        ledger.record_award(1, u'b1')
+        ledger.record_award(1, u'b2')
+        ledger.record_award(2, u'b1')
+        ledger.record_award(3, u'b1')
+        ext = {'data': [dict(_assertion(u'a1', u'user1@example.com', u'b1', state=u'revoked'),
+                             issuer_earner_id=u'1'),
+                        dict(_assertion(u'a2', u'user2@example.com', u'b1', state=u'rejected'),
+                             issuer_earner_id=u'2'),
+                        dict(_assertion(u'a3', u'user3@example.com', u'b1'),
+                             issuer_earner_id=u'3'),
+                        # Not one of our earners
+                        _assertion(u'a4', u'user4@example.com', u'b2', state=u'revoked')],
+               'metadata': {'total_pages': 1}}
+        assert_that(_apply_page(mirror, None, 1, ext, ledger), is_(False))
+        assert_that(ledger.has_award(1, u'b1'), is_(False))
+        assert_that(ledger.has_award(2, u'b1'), is_(False))
+        assert_that(ledger.has_award(1, u'b2'), is_(True))
+        assert_that(ledger.has_award(3, u'b1'), is_(True))
+        assert_that(len(mirror), is_(4))
@@ -0,0 +1,265 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import contains
+from hamcrest import assert_that
+from hamcrest import has_properties
+
+import time
+import unittest
+
+from datetime import datetime
+from datetime import timedelta
+
+import fudge
+
+from zope import component
+from zope import interface
+
+from zope.intid.interfaces import IIntIds
+
+from nti.app.products.badgr import OUTBOX_STATE_SENT
+from nti.app.products.badgr import OUTBOX_STATE_FAILED
+from nti.app.products.badgr import OUTBOX_STATE_QUEUED
+from nti.app.products.badgr import OUTBOX_STATE_SENDING
+from nti.app.products.badgr import OUTBOX_STATE_DUPLICATE
+
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+
+from nti.app.products.badgr.ledger import BadgrAwardLedger
+
+from nti.app.products.badgr.outbox import BadgrAwardOutbox
+from nti.app.products.badgr.outbox import process_award_outbox
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+from nti.dataserver.interfaces import IDataserverTransactionRunner
+
+
+class _User(object):
+
+    def __init__(self, username):
+        self.username = username
+
+
+class _IntIds(object):
+
+    def __init__(self):
+        self.users = {}
+
+    def register(self, user):
+        intid = len(self.users) + 1
+        self.users[intid] = user
+        return intid
+
+    def getId(self, user):
+        for intid, value in self.users.items():
+            if value is user:
+                return intid
+        raise KeyError(user)
+
+    def queryObject(self, intid, default=None):
+        return self.users.get(intid, default)
+
+
+class _Runner(object):
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, func, **unused_kwargs):
+        self.calls += 1
+        return func()
+
+
+@interface.implementer(IBadgrAuthorizedIntegration)
+class _Integration(object):
+    pass
+
+
+class _OutboxTestMixin(object):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.intids = _IntIds()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(self.intids, IIntIds)
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.intids, IIntIds)
+
+    def _user(self, username):
+        user = _User(username)
+        self.intids.register(user)
+        return user
+
+
+class TestAwardOutbox(_OutboxTestMixin, unittest.TestCase):
+
+    @fudge.patch('nti.app.products.badgr.outbox._process_after_commit')
+    def test_claim(self, mock_process):
+        mock_process.is_callable()
+        outbox = BadgrAwardOutbox()
+        users = [self._user(u'user%s' % i) for i in range(3)]
+        awards = [outbox.queue_award(user, u'badge1') for user in users]
+        # Queueing again is idempotent
+        assert_that(outbox.queue_award(users[0], u'badge1'), is_(awards[0]))
+        assert_that(len(outbox), is_(3))
+
+        # Due awards are claimed in order, up to the limit
+        outbox._unindex(awards[0])
+        awards[0].next_attempt = datetime.utcnow() + timedelta(seconds=60)
+        outbox._index(awards[0])
+        claimed = outbox.claim(limit=1)
+        assert_that(len(claimed), is_(1))
+        assert_that(claimed[0].state, is_(OUTBOX_STATE_SENDING))
+        claimed.extend(outbox.claim())
+        assert_that(sorted(x.username for x in claimed),
+                    contains(u'user1', u'user2'))
+        # Nothing else is due: the first is not, the others are leased
+        assert_that(outbox.claim(), is_([]))
+
+        # An abandoned claim is claimed again once its lease expires
+        award = claimed[0]
+        outbox._unindex(award)
+        award.lease_expires = datetime.utcnow() - timedelta(seconds=1)
+        outbox._index(award)
+        assert_that(outbox.claim(), contains(award))
+
+    @fudge.patch('nti.app.products.badgr.outbox._process_after_commit')
+    def test_record(self, mock_process):
+        mock_process.is_callable()
+        outbox = BadgrAwardOutbox()
+        outbox.max_attempts = 2
+        user = self._user(u'user1')
+        award = outbox.queue_award(user, u'badge1')
+        key = award.idempotency_key
+        outbox.claim()
+
+        # A failure backs off, then gives up
+        outbox.record(key, OUTBOX_STATE_FAILED, error=u'Badgr is down')
+        assert_that(award, has_properties('state', OUTBOX_STATE_QUEUED,
+                                          'attempts', 1,
+                                          'lease_expires', none(),
+                                          'last_error', u'Badgr is down'))
+        assert_that(outbox.claim(), is_([]))
+        outbox._unindex(award)
+        award.next_attempt = datetime.utcnow()
+        outbox._index(award)
+        assert_that(outbox.claim(), contains(award))
+        outbox.record(key, OUTBOX_STATE_FAILED, error=u'Badgr is down')
+        assert_that(award.state, is_(OUTBOX_STATE_FAILED))
+        assert_that(outbox.claim(), is_([]))
+
+        # Queueing it again retries it
+        assert_that(outbox.queue_award(user, u'badge1'), is_(award))
+        assert_that(award, has_properties('state', OUTBOX_STATE_QUEUED,
+                                          'attempts', 0))
+        assert_that(outbox.claim(), contains(award))
+        outbox.record(key, OUTBOX_STATE_SENT, awarded_badge_id=u'abc')
+        assert_that(award, has_properties('state', OUTBOX_STATE_SENT,
+                                          'awarded_badge_id', u'abc'))
+        assert_that(outbox.claim(), is_([]))
+
+    @fudge.patch('nti.app.products.badgr.outbox._process_after_commit')
+    def test_prune(self, mock_process):
+        mock_process.is_callable()
+        outbox = BadgrAwardOutbox()
+        old = outbox.queue_award(self._user(u'user1'), u'badge1')
+        new = outbox.queue_award(self._user(u'user2'), u'badge1')
+        outbox.claim()
+        outbox.record(old.idempotency_key, OUTBOX_STATE_DUPLICATE)
+        outbox.record(new.idempotency_key, OUTBOX_STATE_SENT)
+        outbox._unindex(old)
+        old.lastModified = time.time() - outbox.sent_retention - 1
+        outbox._index(old)
+
+        assert_that(outbox._prune(), is_(1))
+        assert_that(outbox.get(old.idempotency_key), none())
+        assert_that(outbox.get(new.idempotency_key), is_(new))
+        assert_that(len(outbox), is_(1))
+
+
+class TestProcessAwardOutbox(_OutboxTestMixin, unittest.TestCase):
+
+    def setUp(self):
+        super(TestProcessAwardOutbox, self).setUp()
+        self.runner = _Runner()
+        self.integration = _Integration()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(self.runner, IDataserverTransactionRunner)
+        gsm.registerUtility(self.integration, IBadgrAuthorizedIntegration)
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.runner, IDataserverTransactionRunner)
+        gsm.unregisterUtility(self.integration, IBadgrAuthorizedIntegration)
+        super(TestProcessAwardOutbox, self).tearDown()
+
+    @fudge.patch('nti.app.products.badgr.outbox._process_after_commit',
+                 'nti.app.products.badgr.outbox.IBadgrClient',
+                 'nti.app.products.badgr.outbox.IBadgrAwardOutbox',
+                 'nti.app.products.badgr.outbox.IBadgrAwardLedger',
+                 'nti.app.products.badgr.outbox.IAwardedBadgrBadge',
+                 'nti.app.products.badgr.outbox.record_awarded_badge',
+                 'nti.app.products.badgr.outbox.invalidate_awarded_badges')
+    def test_process(self, mock_process, mock_client, mock_outbox, mock_ledger,
+                     mock_awarded, mock_record, mock_invalidate):
+        mock_process.is_callable()
+        outbox = BadgrAwardOutbox()
+        ledger = BadgrAwardLedger()
+        mock_outbox.is_callable().returns(outbox)
+        mock_ledger.is_callable().returns(ledger)
+        mock_awarded.is_callable().calls(lambda awarded: fudge.Fake().has_attr(entity_id=awarded['id']))
+        recorded = []
+        mock_record.is_callable().calls(lambda awarded, user, **unused: recorded.append(user.username))
+        mock_invalidate.is_callable()
+
+        users = [self._user(u'user%s' % i) for i in range(4)]
+        awards = [outbox.queue_award(user, u'badge1') for user in users]
+        # The ledger knows user3 has the badge
+        ledger.record_award(self.intids.getId(users[3]), u'badge1')
+
+        def _post_award(data):
+            if data['username'] == u'user1':
+                return BadgrClientError('Badgr is down')
+            return {'id': data['username']}
+        client = fudge.Fake('BadgrClient')
+        client.provides('get_award_data').calls(lambda user, badge, **unused: {'username': user.username})
+        client.provides('post_awards').calls(lambda award_data: [_post_award(x) for x in award_data])
+        mock_client.is_callable().returns(client)
+
+        # Recording user2's outcome fails; the others are still recorded
+        record = outbox.record
+
+        def _record(key, state, **kwargs):
+            if key == awards[2].idempotency_key:
+                raise ValueError('Conflict')
+            return record(key, state, **kwargs)
+        outbox.record = _record
+
+        assert_that(process_award_outbox('site'), is_(2))
+        assert_that([x.state for x in awards],
+                    is_([OUTBOX_STATE_SENT, OUTBOX_STATE_QUEUED,
+                         OUTBOX_STATE_SENDING, OUTBOX_STATE_DUPLICATE]))
+        assert_that(awards[0].awarded_badge_id, is_(u'user0'))
+        assert_that(awards[1].last_error, is_(u'Badgr is down'))
+        assert_that(recorded, is_([u'user0']))
+        assert_that(ledger.has_award(self.intids.getId(users[0]), u'badge1'),
+                    is_(True))
+        # One claim, one send, and a record per outcome
+        assert_that(self.runner.calls, is_(5))
+
+        # Nothing is due
+        assert_that(process_award_outbox('site'), is_(0))
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import is_not
+from hamcrest import has_item
+from hamcrest import assert_that
+
+import io
+import json
+import hashlib
+import unittest
+import threading
+
+import fudge
+
+from nti.app.products.badgr import decoding
+
+from nti.app.products.badgr.client import BadgrClient
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+
+class _Raw(io.BytesIO):
+    decode_content = False
+
+
+class _Response(object):
+
+    closed = False
+
+    def __init__(self, status_code, ext=None):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = json.dumps(ext).encode('utf-8') if ext else b''
+        self.text = self.content.decode('utf-8')
+        self.raw = _Raw(self.content)
+
+    def close(self):
+        self.closed = True
+
+
+class _Session(object):
+    """
+    Serves pages of `total` items, `size` a page, recording the thread of
+    each call. Pages are tagged with `etag`, if given.
+    """
+
+    def __init__(self, total, size=2, expired=(), etag=None):
+        self.total = total
+        self.size = size
+        self.expired = expired
+        self.etag = etag
+        self.calls = []
+        self.responses = []
+
+    def get(self, unused_url, params=None, headers=None, stream=False,
+            **unused_kwargs):
+        page = params['page']
+        self.calls.append((page, threading.current_thread()))
+        if page in self.expired and headers['Authorization'] == 'Bearer token':
+            return _Response(401)
+        if self.etag and headers.get('If-None-Match') == self.etag:
+            return _Response(304)
+        start = (page - 1) * self.size
+        data = [{'id': x} if stream else x
+                for x in range(start, min(start + self.size, self.total))]
+        total_pages = max((self.total + self.size - 1) // self.size, 1)
+        response = _Response(200, {'data': data,
+                                   'metadata': {'count': len(data),
+                                                'total_count': self.total,
+                                                'current_page': page,
+                                                'total_pages': total_pages}})
+        if self.etag:
+            response.headers['ETag'] = self.etag
+        self.responses.append(response)
+        return response
+
+
+class _Tokens(object):
+
+    access_token = 'token'
+
+    def __init__(self):
+        self.updates = []
+
+    def update_tokens(self, old_access_token):
+        self.updates.append(old_access_token)
+        return 'token2'
+
+
+class _Organization(object):
+
+    organization_id = 'org1'
+
+
+class _Integration(object):
+    """
+    An integration recording the threads that read it; as it is
+    persistent, only the calling thread may.
+    """
+
+    _rate_limit_key = 'badgr/rate'
+    _circuit_key = 'badgr/circuit'
+    rate_limit = 0
+    circuit_failure_threshold = 0
+    single_flight_cluster = False
+    page_max_workers = 4
+
+    def __init__(self, session):
+        self.organization = _Organization()
+        self.tokens = _Tokens()
+        self.session_factory = lambda: session
+        self.threads = set()
+
+    def __getattribute__(self, name):
+        if not name.startswith('__') and name != 'threads':
+            object.__getattribute__(self, 'threads').add(threading.current_thread())
+        return object.__getattribute__(self, name)
+
+
+class TestPages(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def _client(self, session):
+        integration = _Integration(session)
+        return BadgrClient(integration, rate_limit_timeout=None), integration
+
+    def test_iter_pages(self):
+        session = _Session(5)
+        client, integration = self._client(session)
+        pages = list(client._iter_pages('/things', 'test/iter_pages', {}, 60))
+        assert_that([x['data'] for x in pages], is_([[0, 1], [2, 3], [4]]))
+        assert_that([page for page, unused in session.calls], is_([1, 2, 3]))
+        # Pages are prefetched on another thread ...
+        assert_that([thread for unused, thread in session.calls],
+                    has_item(is_not(threading.current_thread())))
+        # ... which never reads the integration
+        assert_that(integration.threads, is_({threading.current_thread()}))
+
+        # Cached pages are served without calling Badgr
+        del session.calls[:]
+        pages = list(client._iter_pages('/things', 'test/iter_pages', {}, 60))
+        assert_that(len(pages), is_(3))
+        assert_that(session.calls, is_([]))
+
+    def test_get_pages_json(self):
+        # The token expired; the refresh happens in a worker
+        session = _Session(7, expired=(3,))
+        client, integration = self._client(session)
+        results = client._get_pages_json('/things', 'test/pages_json', {}, 60,
+                                          range(2, 5))
+        assert_that([x['data'] for x, unused_stale, unused_hash in results],
+                    is_([[2, 3], [4, 5], [6]]))
+        assert_that(sorted(page for page, unused in session.calls),
+                    is_([2, 3, 3, 4]))
+        assert_that(set(thread for unused, thread in session.calls),
+                    is_not(has_item(threading.current_thread())))
+        assert_that(client._access_token, is_('token2'))
+        assert_that(integration.tokens.updates, is_(['token']))
+        assert_that(integration.threads, is_({threading.current_thread()}))
+
+        assert_that(client._get_pages_json('/things', 'test/pages_json', {}, 60, ()),
+                    is_([]))
+
+    def test_get_batch_json(self):
+        # Badgr pages by 3, not BADGR_PAGE_SIZE
+        session = _Session(10, size=3)
+        client, unused_integration = self._client(session)
+
+        def _batch(start, size):
+            result, stale, unused_hash = client._get_batch_json('/things', 'test/batch_json',
+                                                                {}, 60, start, size)
+            assert_that(stale, is_(False))
+            assert_that(result['metadata']['count'], is_(len(result['data'])))
+            assert_that(result['metadata']['total_count'], is_(10))
+            return result['data']
+
+        assert_that(_batch(0, 2), is_([0, 1]))
+        assert_that(_batch(2, 5), is_([2, 3, 4, 5, 6]))
+        assert_that(_batch(7, 10), is_([7, 8, 9]))
+        assert_that(_batch(9, 1), is_([9]))
+        assert_that(_batch(20, 5), is_([]))
+        assert_that(_batch(4, 0), is_([]))
+        # Only the pages covering a batch are fetched (the first is cached)
+        del session.calls[:]
+        assert_that(_batch(3, 3), is_([3, 4, 5]))
+        assert_that(session.calls, is_([]))
+        client._response_cache.invalidate('test/batch_json')
+        assert_that(_batch(3, 3), is_([3, 4, 5]))
+        assert_that(sorted(page for page, unused in session.calls), is_([1, 2]))
+
+        # A single page listing
+        session = _Session(2, size=3)
+        client, unused_integration = self._client(session)
+        assert_that(client._get_batch_json('/things', 'test/batch_json/single', {}, 60,
+                                           1, 5)[0]['data'],
+                    is_([1]))
+
+    @fudge.patch('nti.app.products.badgr.client.content_hash')
+    def test_content_hash(self, unused_mock_content_hash):
+        # Never called: the digest of each response is cached with it
+        session = _Session(3, etag='"v1"')
+        client, unused_integration = self._client(session)
+        params = {'page': 1}
+        result, stale, digest = client._get_cached_json('/things', 'test/content_hash',
+                                                        params=params, ttl=-1)
+        assert_that(digest, is_(hashlib.sha1(session.responses[0].content).hexdigest()))
+        entry = client._response_cache.get('test/content_hash',
+                                           client._cache_key('/things', params))
+        assert_that(entry.content_hash, is_(digest))
+
+        # Revalidated: not modified
+        assert_that(client._get_cached_json('/things', 'test/content_hash',
+                                            params=params, ttl=60),
+                    is_((result, stale, digest)))
+        assert_that(len(session.calls), is_(2))
+        assert_that(len(session.responses), is_(1))
+        # Fresh
+        assert_that(client._get_cached_json('/things', 'test/content_hash',
+                                            params=params, ttl=60),
+                    is_((result, stale, digest)))
+        assert_that(len(session.calls), is_(2))
+
+        # Merged pages hash their pages (and the batch)
+        first = client._get_batch_json('/things', 'test/content_hash', {}, 60, 0, 2)[2]
+        assert_that(client._get_batch_json('/things', 'test/content_hash', {}, 60, 0, 2)[2],
+                    is_(first))
+        assert_that(client._get_batch_json('/things', 'test/content_hash', {}, 60, 1, 2)[2],
+                    is_not(first))
+        assert_that(client._get_all_pages_json('/things', 'test/content_hash', {}, 60)[2],
+                    is_not(first))
+
+    def _check_streamed_items(self):
+        session = _Session(5)
+        client, unused_integration = self._client(session)
+        items = client._iter_streamed_items('/things', {'sort': 'name'})
+        assert_that(next(items), is_({'id': 0}))
+        # Pages are fetched as they are reached
+        assert_that(len(session.calls), is_(1))
+        assert_that(list(items), is_([{'id': x} for x in range(1, 5)]))
+        assert_that([page for page, unused in session.calls], is_([1, 2, 3]))
+        assert_that([x.closed for x in session.responses], is_([True] * 3))
+
+        # Never cached
+        assert_that(len(list(client._iter_streamed_items('/things', {}))), is_(5))
+        assert_that(len(session.calls), is_(6))
+
+    @unittest.skipIf(decoding.ijson is None, "requires ijson")
+    def test_iter_streamed_items(self):
+        self._check_streamed_items()
+
+    def test_iter_streamed_items_without_ijson(self):
+        ijson = decoding.ijson
+        decoding.ijson = None
+        try:
+            self._check_streamed_items()
+        finally:
+            decoding.ijson = ijson
+
+    @fudge.patch('nti.app.products.badgr.client.IAwardedBadgrBadge')
+    def test_iter_awarded_badges_stream(self, mock_awarded):
+        mock_awarded.is_callable().calls(lambda item: fudge.Fake().has_attr(entity_id=item['id']))
+        session = _Session(3)
+        client, unused_integration = self._client(session)
+        client._get_user_email = lambda unused_user: u'user1@example.com'
+        user = object()
+        badges = list(client.iter_awarded_badges(user, stream=True))
+        assert_that([x.entity_id for x in badges], is_([0, 1, 2]))
+        assert_that([x.User for x in badges], is_([user] * 3))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import raises
+from hamcrest import calling
+from hamcrest import assert_that
+from hamcrest import greater_than
+
+import time
+import unittest
+
+import fakeredis
+
+from nti.app.products.badgr.interfaces import BadgrRateLimitExceededError
+
+from nti.app.products.badgr.ratelimit import BadgrRateLimiter
+
+
+def _limiter(redis, rate, burst):
+
+    class _Limiter(BadgrRateLimiter):
+        _redis = redis
+
+    return _Limiter('badgr/rate', rate=rate, burst=burst)
+
+
+class _BrokenRedis(object):
+
+    def eval(self, *unused_args):
+        raise ValueError('redis is down')
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+
+    def test_burst(self):
+        limiter = _limiter(self.redis, rate=1, burst=2)
+        assert_that(limiter.take(), is_(0))
+        assert_that(limiter.take(), is_(0))
+        # The bucket is empty; a token refills in about a second
+        assert_that(limiter.take(), greater_than(0.9))
+        assert_that(calling(limiter.acquire).with_args(timeout=0),
+                    raises(BadgrRateLimitExceededError))
+        assert_that(calling(limiter.acquire).with_args(timeout=0.5),
+                    raises(BadgrRateLimitExceededError))
+
+    def test_shared(self):
+        # Limiters with the same key share a bucket
+        limiter = _limiter(self.redis, rate=1, burst=1)
+        other = _limiter(self.redis, rate=1, burst=1)
+        limiter.acquire(timeout=0)
+        assert_that(calling(other.acquire).with_args(timeout=0),
+                    raises(BadgrRateLimitExceededError))
+
+    def test_wait(self):
+        limiter = _limiter(self.redis, rate=20, burst=1)
+        limiter.acquire()
+        start = time.time()
+        limiter.acquire(timeout=1)
+        assert_that(time.time() - start, greater_than(0.03))
+
+    def test_unlimited(self):
+        # No rate, no redis, or a failing redis: never limited
+        for limiter in (_limiter(self.redis, rate=0, burst=1),
+                        _limiter(None, rate=1, burst=1),
+                        _limiter(_BrokenRedis(), rate=1, burst=1)):
+            for unused_i in range(3):
+                limiter.acquire(timeout=0)
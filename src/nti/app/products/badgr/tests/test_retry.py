@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import raises
+from hamcrest import calling
+from hamcrest import contains
+from hamcrest import assert_that
+from hamcrest import has_length
+from hamcrest import less_than_or_equal_to
+
+import time
+import unittest
+
+from requests.exceptions import ReadTimeout
+from requests.exceptions import ConnectTimeout
+from requests.exceptions import ConnectionError as RequestsConnectionError
+
+from nti.app.products.badgr.circuit import BadgrCircuitBreaker
+
+from nti.app.products.badgr.client import BadgrClient
+
+from nti.app.products.badgr.interfaces import BadgrClientError
+
+from nti.app.products.badgr.ratelimit import BadgrRateLimiter
+
+from nti.app.products.badgr.retry import RetryPolicy
+
+
+class _Response(object):
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def test_idempotent(self):
+        policy = RetryPolicy(max_attempts=3, backoff=1, max_backoff=5)
+        started = time.time()
+        assert_that(policy.delay_after_response(_Response(200), 0, started), none())
+        assert_that(policy.delay_after_response(_Response(422), 0, started), none())
+        delay = policy.delay_after_response(_Response(503), 0, started)
+        assert_that(delay, less_than_or_equal_to(1))
+        delay = policy.delay_after_response(_Response(503), 1, started)
+        assert_that(delay, less_than_or_equal_to(2))
+        # Out of attempts
+        assert_that(policy.delay_after_response(_Response(503), 2, started), none())
+
+        # Connection resets are retried
+        delay = policy.delay_after_error(RequestsConnectionError('reset'), 0, started)
+        assert_that(delay, less_than_or_equal_to(1))
+
+    def test_retry_after(self):
+        policy = RetryPolicy(deadline=10)
+        started = time.time()
+        response = _Response(429, {'Retry-After': '3'})
+        assert_that(policy.delay_after_response(response, 0, started), is_(3))
+        # Beyond our deadline
+        response = _Response(429, {'Retry-After': '30'})
+        assert_that(policy.delay_after_response(response, 0, started), none())
+        response = _Response(429, {'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        assert_that(policy.delay_after_response(response, 0, started), is_(0))
+
+    def test_non_idempotent(self):
+        policy = RetryPolicy(idempotent=False, deadline=None)
+        started = time.time()
+        # The award may have been issued
+        assert_that(policy.delay_after_response(_Response(503), 0, started), none())
+        assert_that(policy.delay_after_response(_Response(502), 0, started), none())
+        assert_that(policy.delay_after_error(RequestsConnectionError('reset'), 0, started),
+                    none())
+        # But never reached Badgr
+        assert_that(policy.delay_after_response(_Response(429, {'Retry-After': '1'}), 0, started),
+                    is_(1))
+        assert_that(policy.delay_after_error(ConnectTimeout('timeout'), 0, started),
+                    less_than_or_equal_to(0.5))
+
+
+class _SlowSession(object):
+
+    def __init__(self):
+        self.timeouts = []
+
+    def get(self, unused_url, **kwargs):
+        self.timeouts.append(kwargs['timeout'])
+        time.sleep(0.1)
+        raise ReadTimeout('slow')
+
+
+class _Integration(object):
+
+    connect_timeout = 2
+    read_timeout = 10
+
+
+class TestClientTimeouts(unittest.TestCase):
+
+    def _client(self, session):
+        client = BadgrClient(_Integration(), rate_limit_timeout=None)
+        client._access_token = 'token'
+        client._session_factory = lambda: session
+        client._rate_limiter = BadgrRateLimiter('badgr/rate', rate=0)
+        client._circuit_breaker = BadgrCircuitBreaker('badgr/circuit',
+                                                      failure_threshold=0)
+        return client
+
+    def test_timeout(self):
+        client = self._client(None)
+        now = time.time()
+        assert_that(client._timeout(RetryPolicy(deadline=None), now),
+                    is_((2, 10)))
+        assert_that(client._timeout(RetryPolicy(deadline=60), now),
+                    is_((2, 10)))
+        # Capped by the time left before the deadline
+        unused_connect, read = client._timeout(RetryPolicy(deadline=60), now - 55)
+        assert_that(read, less_than_or_equal_to(5))
+        assert_that(client._timeout(RetryPolicy(deadline=60), now - 70),
+                    is_((2, 0.5)))
+
+    def test_calls_time_out(self):
+        session = _SlowSession()
+        client = self._client(session)
+        policy = RetryPolicy(max_attempts=3, backoff=0, jitter=False, deadline=3)
+        assert_that(calling(client._make_call).with_args('/issuers', retry_policy=policy),
+                    raises(BadgrClientError))
+        # Every attempt had a timeout, shrinking with the deadline
+        assert_that(session.timeouts, has_length(3))
+        assert_that(session.timeouts[0], contains(2, less_than_or_equal_to(3)))
+        assert_that(session.timeouts[2][1], less_than_or_equal_to(2.8))
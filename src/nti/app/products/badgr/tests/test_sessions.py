@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import not_
+from hamcrest import has_key
+from hamcrest import assert_that
+from hamcrest import same_instance
+
+import unittest
+
+import fudge
+
+from nti.app.products.badgr import sessions
+
+from nti.app.products.badgr.sessions import get_session
+from nti.app.products.badgr.sessions import close_session
+from nti.app.products.badgr.sessions import recycle_session
+from nti.app.products.badgr.sessions import close_all_sessions
+
+
+class TestSessions(unittest.TestCase):
+
+    def tearDown(self):
+        close_all_sessions()
+
+    def test_pooled(self):
+        session = get_session('badgr/a')
+        assert_that(get_session('badgr/a'), same_instance(session))
+        assert_that(get_session('badgr/b'), not_(same_instance(session)))
+        adapter = session.get_adapter('https://api.badgr.io')
+        assert_that(adapter._pool_maxsize, is_(sessions.DEFAULT_POOL_MAXSIZE))
+        assert_that(adapter.max_retries.total, is_(0))
+
+    def test_close(self):
+        session = get_session('badgr/a')
+        assert_that(close_session('badgr/a'), is_(True))
+        assert_that(close_session('badgr/a'), is_(False))
+        assert_that(get_session('badgr/a'), not_(same_instance(session)))
+        assert_that(recycle_session, same_instance(close_session))
+
+        get_session('badgr/b')
+        close_all_sessions()
+        assert_that(sessions._sessions, is_({}))
+
+    def test_recycle_idle(self):
+        session = get_session('badgr/a', max_idle=60)
+        pooled = sessions._sessions['badgr/a']
+        pooled.last_used -= 61
+        with fudge.patched_context(pooled.session, 'close',
+                                   fudge.Fake('close').expects_call()):
+            assert_that(get_session('badgr/a', max_idle=60),
+                        not_(same_instance(session)))
+        # Never recycled without a max idle
+        session = get_session('badgr/b', max_idle=0)
+        sessions._sessions['badgr/b'].last_used -= 10 ** 6
+        assert_that(get_session('badgr/b'), same_instance(session))
+
+    def test_fork(self):
+        get_session('badgr/a')
+        assert_that(sessions._sessions, has_key('badgr/a'))
+        # Sessions from our "parent" process are dropped
+        sessions._pid = -1
+        get_session('badgr/b')
+        assert_that(sessions._sessions, not_(has_key('badgr/a')))
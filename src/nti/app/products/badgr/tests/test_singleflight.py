@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import raises
+from hamcrest import calling
+from hamcrest import assert_that
+from hamcrest import has_length
+
+import time
+import unittest
+import threading
+
+import fakeredis
+
+from nti.app.products.badgr.singleflight import SingleFlight
+
+
+class _Counter(object):
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        calls = self.calls
+        time.sleep(self.delay)
+        return {'call': calls}
+
+
+def _in_thread(func, results):
+    thread = threading.Thread(target=lambda: results.append(func()))
+    thread.start()
+    return thread
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_coalesced(self):
+        flight = SingleFlight()
+        func = _Counter()
+        results = []
+        threads = [_in_thread(lambda: flight.do('key', func), results)
+                   for unused_i in range(3)]
+        for thread in threads:
+            thread.join()
+        assert_that(results, is_([{'call': 1}] * 3))
+        assert_that(func.calls, is_(1))
+        # A later caller makes its own call
+        assert_that(flight.do('key', func), is_({'call': 2}))
+
+    def test_error(self):
+        flight = SingleFlight()
+
+        def _fail():
+            time.sleep(0.1)
+            raise ValueError('failed')
+        errors = []
+
+        def _follow():
+            try:
+                flight.do('key', _fail)
+            except ValueError as e:
+                errors.append(e)
+        threads = [threading.Thread(target=_follow) for unused_i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert_that(errors, is_([errors[0], errors[0]]))
+
+    def test_wait_timeout(self):
+        flight = SingleFlight()
+        flight.wait_timeout = 0.05
+        results = []
+        thread = _in_thread(lambda: flight.do('key', _Counter(0.5)), results)
+        time.sleep(0.05)
+        # Rather than wait on the slow call, make our own
+        assert_that(flight.do('key', lambda: 'own'), is_('own'))
+        thread.join()
+        assert_that(results, is_([{'call': 1}]))
+
+
+class TestClusterSingleFlight(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+
+    def test_coalesced(self):
+        # Two processes
+        flight, other = SingleFlight(), SingleFlight()
+        func = _Counter()
+        results = []
+        thread = _in_thread(lambda: flight.do('key', func, redis=self.redis),
+                            results)
+        time.sleep(0.05)
+        assert_that(other.do('key', func, redis=self.redis), is_({'call': 1}))
+        thread.join()
+        assert_that(results, is_([{'call': 1}]))
+        assert_that(func.calls, is_(1))
+
+        # A late caller does not get the finished flight's result
+        assert_that(other.do('key', func, redis=self.redis), is_({'call': 2}))
+        lock_key, unused_result_key = flight._redis_keys('key')
+        assert_that(self.redis.get(lock_key), is_(None))
+
+    def test_failed_leader(self):
+        flight, other = SingleFlight(), SingleFlight()
+
+        def _fail():
+            time.sleep(0.1)
+            raise ValueError('failed')
+        errors = []
+
+        def _lead():
+            try:
+                flight.do('key', _fail, redis=self.redis, errors=(ValueError,))
+            except ValueError as e:
+                errors.append(e)
+        thread = threading.Thread(target=_lead)
+        thread.start()
+        time.sleep(0.05)
+        # The follower gets the leader's error rather than making its own call
+        func = _Counter(0)
+        assert_that(calling(other.do).with_args('key', func, redis=self.redis,
+                                                errors=(KeyError, ValueError)),
+                    raises(ValueError, 'failed'))
+        thread.join()
+        assert_that(errors, has_length(1))
+        assert_that(func.calls, is_(0))
+
+        # Errors of other types are raised as an Exception
+        thread = threading.Thread(target=_lead)
+        thread.start()
+        time.sleep(0.05)
+        assert_that(calling(other.do).with_args('key', func, redis=self.redis),
+                    raises(Exception, 'failed'))
+        thread.join()
+        assert_that(func.calls, is_(0))
+
+    def test_slow_leader(self):
+        flight, other = SingleFlight(), SingleFlight()
+        other.wait_timeout = 0.05
+        results = []
+        thread = _in_thread(lambda: flight.do('key', _Counter(0.3), redis=self.redis),
+                            results)
+        time.sleep(0.05)
+        assert_that(other.do('key', lambda: 'own', redis=self.redis), is_('own'))
+
+        # Our own call is made once, even if it fails
+        calls = []
+
+        def _fail():
+            calls.append(1)
+            raise ValueError('failed')
+        assert_that(calling(other.do).with_args('key', _fail, redis=self.redis),
+                    raises(ValueError))
+        assert_that(calls, has_length(1))
+        thread.join()
+        assert_that(results, is_([{'call': 1}]))
+
+    def test_redis_errors(self):
+        class _Broken(object):
+            def set(self, *unused_args, **unused_kwargs):
+                raise ValueError('redis is down')
+        flight = SingleFlight()
+        assert_that(flight.do('key', lambda: 'result', redis=_Broken()),
+                    is_('result'))
@@ -0,0 +1,172 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import assert_that
+
+import unittest
+
+import fudge
+
+from zope import component
+from zope import interface
+
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+from nti.app.products.badgr.interfaces import MissingBadgrOrganizationError
+
+from nti.app.products.badgr.ledger import BadgrAwardLedger
+
+from nti.app.products.badgr.mirror import BadgrAssertionMirror
+
+from nti.app.products.badgr.sync import _newest
+from nti.app.products.badgr.sync import sync_assertion_mirror
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+from nti.dataserver.interfaces import IDataserverTransactionRunner
+
+
+class _Runner(object):
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, func, site_names=(), side_effect_free=False):
+        self.calls.append((site_names, side_effect_free))
+        return func()
+
+
+@interface.implementer(IBadgrAuthorizedIntegration)
+class _Integration(object):
+    pass
+
+
+def _page(updated, total_pages):
+    return {'data': [{'id': u'a%s' % i, 'updated_at': x} for i, x in updated],
+            'metadata': {'total_pages': total_pages}}
+
+
+#: Badgr's answer to each (updated_since, page)
+PAGES = {
+    (None, 1): _page([(1, u'2020-01-01T00:00:00Z'), (2, u'2020-01-02T00:00:00Z')], 3),
+    # Restarted from the newest change; a whole page at that instant
+    (u'2020-01-02T00:00:00Z', 1): _page([(2, u'2020-01-02T00:00:00Z'), (3, u'2020-01-02T00:00:00Z')], 2),
+    (u'2020-01-02T00:00:00Z', 2): _page([(4, u'2020-01-03T00:00:00Z')], 2),
+    (u'2020-01-03T00:00:00Z', 1): _page([(4, u'2020-01-03T00:00:00Z')], 1),
+}
+
+
+class TestSyncAssertionMirror(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.runner = _Runner()
+        self.integration = _Integration()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(self.runner, IDataserverTransactionRunner)
+        gsm.registerUtility(self.integration, IBadgrAuthorizedIntegration)
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.runner, IDataserverTransactionRunner)
+        gsm.unregisterUtility(self.integration, IBadgrAuthorizedIntegration)
+
+    def _client(self, mock_client, fetched, error=None):
+
+        def _get_issuer_assertions(updated_since=None, page=None):
+            fetched.append((updated_since, page))
+            if error is not None:
+                raise error
+            return PAGES[(updated_since, page)]
+        client = fudge.Fake('BadgrClient')
+        client.provides('get_issuer_assertions').calls(_get_issuer_assertions)
+        mock_client.is_callable().returns(client)
+
+    @fudge.patch('nti.app.products.badgr.sync.IBadgrClient',
+                 'nti.app.products.badgr.sync.get_award_ledger',
+                 'nti.app.products.badgr.sync.get_assertion_mirror')
+    def test_sync(self, mock_client, mock_ledger, mock_mirror):
+        mirror = BadgrAssertionMirror()
+        mock_mirror.is_callable().returns(mirror)
+        mock_ledger.is_callable().returns(BadgrAwardLedger())
+        fetched = []
+        self._client(mock_client, fetched)
+
+        assert_that(sync_assertion_mirror('site'), is_(3))
+        assert_that(fetched, is_([(None, 1),
+                                  (u'2020-01-02T00:00:00Z', 1),
+                                  (u'2020-01-02T00:00:00Z', 2)]))
+        assert_that(mirror.is_warm, is_(True))
+        assert_that(mirror.sync_watermark, is_(u'2020-01-03T00:00:00Z'))
+        assert_that(mirror.sync_page, is_(1))
+        assert_that(len(mirror), is_(4))
+        # Fetched read-only, applied in a transaction of its own
+        assert_that(self.runner.calls,
+                    is_([(('site',), True), (('site',), False)] * 3))
+
+        # The next run starts from the watermark
+        del fetched[:]
+        assert_that(sync_assertion_mirror('site'), is_(1))
+        assert_that(fetched, is_([(u'2020-01-03T00:00:00Z', 1)]))
+
+    @fudge.patch('nti.app.products.badgr.sync.IBadgrClient',
+                 'nti.app.products.badgr.sync.get_award_ledger',
+                 'nti.app.products.badgr.sync.get_assertion_mirror')
+    def test_resume(self, mock_client, mock_ledger, mock_mirror):
+        mirror = BadgrAssertionMirror()
+        mock_mirror.is_callable().returns(mirror)
+        mock_ledger.is_callable().returns(None)
+        fetched = []
+        self._client(mock_client, fetched)
+
+        # Stopped at the page limit, resumes from the last applied page
+        assert_that(sync_assertion_mirror('site', max_pages=2), is_(2))
+        assert_that(mirror.is_warm, is_(False))
+        assert_that((mirror.sync_watermark, mirror.sync_page),
+                    is_((u'2020-01-02T00:00:00Z', 2)))
+        del fetched[:]
+        assert_that(sync_assertion_mirror('site'), is_(1))
+        assert_that(fetched, is_([(u'2020-01-02T00:00:00Z', 2)]))
+        assert_that(mirror.is_warm, is_(True))
+
+    @fudge.patch('nti.app.products.badgr.sync.IBadgrClient',
+                 'nti.app.products.badgr.sync.get_assertion_mirror')
+    def test_errors(self, mock_client, mock_mirror):
+        mirror = BadgrAssertionMirror()
+        mock_mirror.is_callable().returns(mirror)
+        fetched = []
+
+        # Badgr errors are logged; nothing is applied
+        self._client(mock_client, fetched, BadgrClientError('Badgr is down'))
+        assert_that(sync_assertion_mirror('site'), is_(0))
+        assert_that((mirror.sync_watermark, mirror.sync_page), is_((None, 1)))
+
+        # Nothing to sync without an organization
+        self._client(mock_client, fetched, MissingBadgrOrganizationError())
+        assert_that(sync_assertion_mirror('site'), is_(0))
+
+        # Nor without a mirror
+        del fetched[:]
+        mock_mirror.is_callable().returns(None)
+        assert_that(sync_assertion_mirror('site'), is_(0))
+        assert_that(fetched, is_([]))
+
+    def test_newest(self):
+        # Neither of these is newest as a string
+        assertions = [{'updated_at': u'2020-01-01T10:00:00.500Z'},
+                      {'updated_at': u'2020-01-01T10:00:00Z'},
+                      {'updated_at': u'2020-01-01T11:00:00+02:00'},
+                      {}]
+        assert_that(_newest(assertions, None),
+                    is_(u'2020-01-01T10:00:00.500Z'))
+        assert_that(_newest(assertions, u'2020-01-01T10:00:01Z'),
+                    is_(u'2020-01-01T10:00:01Z'))
+        assert_that(_newest((), None), is_(None))
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import assert_that
+
+import unittest
+import threading
+
+import fudge
+
+import fakeredis
+
+from zope import component
+from zope import interface
+
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+
+from nti.app.products.badgr.tasks import BadgrPeriodicTask
+from nti.app.products.badgr.tasks import refresh_expiring_tokens
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+from nti.dataserver.interfaces import IRedisClient
+from nti.dataserver.interfaces import IDataserverTransactionRunner
+
+
+class _Runner(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.site_names = []
+
+    def __call__(self, func, site_names=(), **unused_kwargs):
+        self.calls += 1
+        self.site_names.append(site_names)
+        return func()
+
+
+@interface.implementer(IBadgrAuthorizedIntegration)
+class _Integration(object):
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+
+    def refresh_tokens_if_expiring(self):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class TestPeriodicTask(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        self.runner = _Runner()
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(self.redis, IRedisClient)
+        gsm.registerUtility(self.runner, IDataserverTransactionRunner)
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.redis, IRedisClient)
+        gsm.unregisterUtility(self.runner, IDataserverTransactionRunner)
+
+    def test_leader(self):
+        calls = []
+        task = BadgrPeriodicTask('test', lambda: calls.append('task'), 60)
+        other = BadgrPeriodicTask('test', lambda: calls.append('other'), 60)
+        task.run_once()
+        # Another process, in the same interval, is not the leader
+        other.run_once()
+        task.run_once()
+        assert_that(calls, is_(['task']))
+        assert_that(self.runner.calls, is_(1))
+        assert_that(self.redis.ttl(task._leader_key), is_(59))
+
+        # Until the interval has passed
+        self.redis.delete(task._leader_key)
+        other.run_once()
+        assert_that(calls, is_(['task', 'other']))
+
+        # Other tasks elect their own leader
+        BadgrPeriodicTask('sync', lambda: calls.append('sync'), 60,
+                          transactional=False).run_once()
+        assert_that(calls, is_(['task', 'other', 'sync']))
+        assert_that(self.runner.calls, is_(2))
+
+    def test_thread(self):
+        ran = threading.Event()
+
+        def _func():
+            ran.set()
+            raise ValueError('errors do not stop the task')
+        task = BadgrPeriodicTask('thread', _func, 0.01)
+        task.start()
+        try:
+            thread = task._thread
+            task.start()
+            assert_that(task._thread, is_(thread))
+            assert_that(ran.wait(5), is_(True))
+            assert_that(thread.is_alive(), is_(True))
+        finally:
+            task.stop()
+        thread.join(5)
+        assert_that(thread.is_alive(), is_(False))
+
+    def test_no_redis(self):
+        # Without redis, every process runs the task
+        component.getGlobalSiteManager().unregisterUtility(self.redis, IRedisClient)
+        calls = []
+        BadgrPeriodicTask('test', lambda: calls.append('task'), 60).run_once()
+        BadgrPeriodicTask('test', lambda: calls.append('other'), 60).run_once()
+        assert_that(calls, is_(['task', 'other']))
+
+
+class TestRefreshExpiringTokens(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.runner = _Runner()
+        self.integration = _Integration([ValueError('Badgr is down'), True, False])
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(self.runner, IDataserverTransactionRunner)
+        gsm.registerUtility(self.integration, IBadgrAuthorizedIntegration)
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.runner, IDataserverTransactionRunner)
+        gsm.unregisterUtility(self.integration, IBadgrAuthorizedIntegration)
+
+    @fudge.patch('nti.app.products.badgr.tasks._site_names')
+    def test_refresh(self, mock_site_names):
+        mock_site_names.is_callable().returns(['site1', 'site2', 'site3'])
+        # A failing site does not stop the others
+        assert_that(refresh_expiring_tokens(), is_(1))
+        # Each in a transaction of its own
+        assert_that(self.runner.site_names,
+                    is_([('site1',), ('site2',), ('site3',)]))
+        assert_that(self.integration.outcomes, is_([]))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import assert_that
+
+import unittest
+
+import fakeredis
+
+import fudge
+
+from nti.app.products.badgr import token_cache
+
+KEY = 'badgr/site/access_token'
+
+
+class _EvictingRedis(object):
+    """
+    Evicts `key` just after its token is read, as an invalidation from
+    another process may.
+    """
+
+    def __init__(self, redis, key):
+        self.redis = redis
+        self.key = key
+
+    def pipeline(self):
+        pipe = self.redis.pipeline()
+        execute = pipe.execute
+
+        def _execute():
+            result = execute()
+            token_cache.evict(self.key, publish=False)
+            return result
+        pipe.execute = _execute
+        return pipe
+
+
+class TestTokenCache(unittest.TestCase):
+
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        token_cache._clear()
+
+    def tearDown(self):
+        token_cache._clear()
+
+    @fudge.patch('nti.app.products.badgr.token_cache._ensure_listener')
+    def test_cache(self, mock_listening):
+        mock_listening.is_callable().returns(True)
+        assert_that(token_cache.get_access_token(KEY, self.redis), none())
+
+        self.redis.setex(KEY, 3600, b'token1')
+        assert_that(token_cache.get_access_token(KEY, self.redis), is_(b'token1'))
+        # Served locally until evicted
+        self.redis.setex(KEY, 3600, b'token2')
+        assert_that(token_cache.get_access_token(KEY, self.redis), is_(b'token1'))
+        token_cache.evict(KEY, publish=False)
+        assert_that(token_cache.get_access_token(KEY, self.redis), is_(b'token2'))
+
+        # Tokens about to expire are not cached
+        self.redis.setex(KEY, 10, b'token3')
+        token_cache.evict(KEY, publish=False)
+        assert_that(token_cache.get_access_token(KEY, self.redis), is_(b'token3'))
+        self.redis.setex(KEY, 3600, b'token4')
+        assert_that(token_cache.get_access_token(KEY, self.redis), is_(b'token4'))
+
+    @fudge.patch('nti.app.products.badgr.token_cache._ensure_listener')
+    def test_evicted_while_reading(self, mock_listening):
+        mock_listening.is_callable().returns(True)
+        self.redis.setex(KEY, 3600, b'token1')
+        redis = _EvictingRedis(self.redis, KEY)
+        assert_that(token_cache.get_access_token(KEY, redis), is_(b'token1'))
+        # The token read before the eviction is not served after it
+        self.redis.setex(KEY, 3600, b'token2')
+        assert_that(token_cache.get_access_token(KEY, self.redis), is_(b'token2'))
+
+    @fudge.patch('nti.app.products.badgr.token_cache._ensure_listener')
+    def test_not_listening(self, mock_listening):
+        # Without invalidations, tokens are never cached
+        mock_listening.is_callable().returns(False)
+        self.redis.setex(KEY, 3600, b'token1')
+        assert_that(token_cache.get_access_token(KEY, self.redis), is_(b'token1'))
+        self.redis.setex(KEY, 3600, b'token2')
+        assert_that(token_cache.get_access_token(KEY, self.redis), is_(b'token2'))
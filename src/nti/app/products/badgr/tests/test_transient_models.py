@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import raises
+from hamcrest import calling
+from hamcrest import contains
+from hamcrest import assert_that
+from hamcrest import has_property
+from hamcrest import has_properties
+
+import copy
+import unittest
+
+from datetime import datetime
+
+from zope.schema.interfaces import ValidationError
+
+from nti.testing.matchers import verifiably_provides
+
+from nti.app.products.badgr import NT_EVIDENCE_NTIID_ID
+
+from nti.app.products.badgr.client_models import _awarded_badgr_badge_factory
+
+from nti.app.products.badgr.interfaces import IBadgrIdEvidence
+from nti.app.products.badgr.interfaces import IAwardedBadgrBadge
+from nti.app.products.badgr.interfaces import IAwardedBadgrBadgeCollection
+
+from nti.app.products.badgr.internalization import STRICT
+from nti.app.products.badgr.internalization import TRUSTED
+
+from nti.app.products.badgr.internalization import FieldMapping
+
+from nti.app.products.badgr.internalization import internalize
+from nti.app.products.badgr.internalization import set_internalization_mode
+
+from nti.app.products.badgr.transient_models import TransientBadgrBadge
+from nti.app.products.badgr.transient_models import TransientBadgrIdEvidence
+from nti.app.products.badgr.transient_models import TransientAwardedBadgrBadgeCollection
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+
+class TestTransientModels(unittest.TestCase):
+
+    def test_slotted(self):
+        evidence = TransientBadgrIdEvidence(ntiid=u'tag:nextthought.com,2011-10:NTI-1',
+                                            name=u'evidence')
+        assert_that(evidence, verifiably_provides(IBadgrIdEvidence))
+        assert_that(evidence, has_property('type', u'IdEvidence'))
+        assert_that(evidence.id, is_(u'tag:nextthought.com,2011-10:NTI-1'))
+        assert_that(hasattr(evidence, '__dict__'), is_(False))
+
+        badge = TransientBadgrBadge(entity_id=u'badge1')
+        assert_that(badge.__parent__, none())
+        assert_that(badge.__class__.__external_class_name__, is_('BadgrBadge'))
+        assert_that(hasattr(badge, '__dict__'), is_(False))
+
+        collection = TransientAwardedBadgrBadgeCollection(Items=[],
+                                                          badges_count=0,
+                                                          current_page=1,
+                                                          total_pages=1)
+        assert_that(collection, verifiably_provides(IAwardedBadgrBadgeCollection))
+        assert_that(collection.stale, is_(False))
+        assert_that(collection.badges, is_([]))
+
+    def test_trusted_internalization(self):
+        set_internalization_mode(TRUSTED, sample_rate=1)
+        try:
+            ext = {'ntiid': b'tag:nextthought.com,2011-10:NTI-1',
+                   'name': u'evidence',
+                   'ignored': u'value'}
+            evidence = internalize(TransientBadgrIdEvidence(), ext, IBadgrIdEvidence)
+            assert_that(evidence.ntiid, is_(u'tag:nextthought.com,2011-10:NTI-1'))
+            assert_that(evidence.name, is_(u'evidence'))
+            assert_that(evidence, verifiably_provides(IBadgrIdEvidence))
+        finally:
+            set_internalization_mode(TRUSTED)
+
+    def test_field_mapping(self):
+        mapping = FieldMapping(IBadgrIdEvidence,
+                               sources={'ntiid': 'id',
+                                        'name': ('meta', 'name')},
+                               converters={'name': lambda x: x.upper()})
+        ext = {'id': u'tag:nextthought.com,2011-10:NTI-1',
+               'meta': {'name': u'evidence'}}
+        original = copy.deepcopy(ext)
+        for unused in range(2):
+            evidence = mapping.internalize(TransientBadgrIdEvidence(), ext)
+            assert_that(evidence.ntiid, is_(u'tag:nextthought.com,2011-10:NTI-1'))
+            assert_that(evidence.name, is_(u'EVIDENCE'))
+            assert_that(ext, is_(original))
+
+        # Missing sources are left unset
+        evidence = mapping.internalize(TransientBadgrIdEvidence(), {'meta': None})
+        assert_that(evidence.ntiid, none())
+        assert_that(evidence.name, none())
+
+
+AWARDED_BADGE = {
+    'entity_id': u'assertion1',
+    'entity_type': u'Assertion',
+    'badge_template': {'entity_id': u'badge1',
+                       'issuer_entity_id': u'issuer1',
+                       'name': u'Badge 1',
+                       'created_at': u'2020-01-01T00:00:00Z'},
+    'created_at': u'2020-01-02T00:00:00Z',
+    'updated_at': u'2020-01-03T00:30:00+01:00',
+    'public': True,
+    'locale': u'en',
+    'recipient_email': u'user1@example.com',
+    'state': u'accepted',
+    'evidence': [{'id': u'tag:nextthought.com,2011-10:NTI-1',
+                  'name': NT_EVIDENCE_NTIID_ID},
+                 {'id': u'other', 'name': u'other'}],
+}
+
+
+class TestInternalizationModes(unittest.TestCase):
+    """
+    Tests run in the (production) trusted mode; these check that the
+    strict mode, which validates every field, builds the same objects.
+    """
+
+    layer = SharedConfiguringTestLayer
+
+    def tearDown(self):
+        set_internalization_mode(TRUSTED)
+
+    def test_modes(self):
+        for mode in (TRUSTED, STRICT):
+            set_internalization_mode(mode, sample_rate=1)
+            ext = copy.deepcopy(AWARDED_BADGE)
+            awarded = _awarded_badgr_badge_factory(ext)
+            assert_that(ext, is_(AWARDED_BADGE))
+            assert_that(awarded, verifiably_provides(IAwardedBadgrBadge))
+            assert_that(awarded,
+                        has_properties('entity_id', u'assertion1',
+                                       'created_at', datetime(2020, 1, 2),
+                                       'updated_at', datetime(2020, 1, 2, 23, 30),
+                                       'public', True,
+                                       'locale', u'en',
+                                       'state', u'accepted'))
+            assert_that(awarded.badge_template,
+                        has_properties('entity_id', u'badge1',
+                                       'name', u'Badge 1',
+                                       'created_at', datetime(2020, 1, 1)))
+            assert_that([x.ntiid for x in awarded.evidence],
+                        contains(u'tag:nextthought.com,2011-10:NTI-1'))
+
+    def test_invalid(self):
+        ext = dict(AWARDED_BADGE, locale=u'')
+        set_internalization_mode(STRICT)
+        assert_that(calling(_awarded_badgr_badge_factory).with_args(ext),
+                    raises(ValidationError))
+        # Trusted payloads are not validated (only logged, if sampled)
+        set_internalization_mode(TRUSTED, sample_rate=1)
+        assert_that(_awarded_badgr_badge_factory(ext).locale, is_(u''))
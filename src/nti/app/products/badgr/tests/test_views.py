@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+# pylint: disable=protected-access,too-many-public-methods
+
+from hamcrest import is_
+from hamcrest import none
+from hamcrest import is_not
+from hamcrest import not_none
+from hamcrest import assert_that
+from hamcrest import instance_of
+
+import unittest
+
+import fudge
+
+from pyramid import httpexceptions as hexc
+
+from pyramid.testing import DummyRequest
+
+from webob.etag import NoETag
+from webob.etag import ETagMatcher
+
+from zope import component
+from zope import interface
+
+from nti.app.products.badgr.client_models import AwardedBadgrBadgeCollection
+
+from nti.app.products.badgr.interfaces import IBadgrIntegration
+from nti.app.products.badgr.interfaces import IBadgrRepresentationCache
+
+from nti.app.products.badgr.tests import SharedConfiguringTestLayer
+
+from nti.app.products.badgr.views.badges import UserAwardedBadgesView
+
+
+@interface.implementer(IBadgrIntegration)
+class _Integration(object):
+    pass
+
+
+class _User(object):
+
+    def __init__(self, username):
+        self.username = username
+
+
+class _AwardedBadgesView(UserAwardedBadgesView):
+
+    remoteUser = None
+
+
+def _collection(content_hash, stale=False):
+    result = AwardedBadgrBadgeCollection(Items=[],
+                                         badges_count=0,
+                                         total_badges_count=0,
+                                         current_page=1,
+                                         total_pages=1,
+                                         stale=stale)
+    result.content_hash = content_hash
+    return result
+
+
+class TestUserAwardedBadgesView(unittest.TestCase):
+
+    layer = SharedConfiguringTestLayer
+
+    def setUp(self):
+        self.integration = _Integration()
+        self.user = _User(u'user1')
+        gsm = component.getGlobalSiteManager()
+        gsm.registerUtility(self.integration, IBadgrIntegration)
+
+    def tearDown(self):
+        gsm = component.getGlobalSiteManager()
+        gsm.unregisterUtility(self.integration, IBadgrIntegration)
+
+    def _view(self, remote_user, query_string='', if_none_match=NoETag):
+        request = DummyRequest()
+        request.context = self.user
+        request.query_string = query_string
+        request.if_none_match = if_none_match
+        view = _AwardedBadgesView(request)
+        view.remoteUser = remote_user
+        return view
+
+    @fudge.patch('nti.app.products.badgr.views.badges.query_awarded_badges',
+                 'nti.app.products.badgr.views.badges.representation_namespace')
+    def test_etag(self, mock_query, mock_namespace):
+        collection = _collection(u'views/etag')
+        collections = [collection]
+        mock_query.is_callable().calls(lambda *unused_args, **unused_kwargs: collections[-1])
+        mock_namespace.is_callable().returns('representation/test')
+        cache = component.getUtility(IBadgrRepresentationCache)
+
+        view = self._view(self.user)
+        result = view()
+        assert_that(result, not_none())
+        etag = view.request.response.etag
+        assert_that(etag, not_none())
+        key = view._representation_key(collection)
+        assert_that(cache.get('representation/test', key), not_none())
+
+        # Unchanged: not modified
+        view = self._view(self.user,
+                          if_none_match=ETagMatcher.parse('"%s"' % etag))
+        result = view()
+        assert_that(result, instance_of(hexc.HTTPNotModified))
+        assert_that(result.etag, is_(etag))
+
+        # Another query of the same content has an ETag of its own,
+        # but shares its representation
+        view = self._view(self.user, query_string='page=1')
+        view()
+        assert_that(view.request.response.etag, is_not(etag))
+        assert_that(view._representation_key(collection), is_(key))
+
+        # Changed content is not
+        collections.append(_collection(u'views/etag2'))
+        view = self._view(self.user,
+                          if_none_match=ETagMatcher.parse('"%s"' % etag))
+        result = view()
+        assert_that(result, is_not(instance_of(hexc.HTTPNotModified)))
+        assert_that(view.request.response.etag, is_not(etag))
+
+    @fudge.patch('nti.app.products.badgr.views.badges.query_awarded_badges',
+                 'nti.app.products.badgr.views.badges.representation_namespace')
+    def test_self_and_other(self, mock_query, mock_namespace):
+        collection = _collection(u'views/self')
+        mock_query.is_callable().returns(collection)
+        mock_namespace.is_callable().returns('representation/test')
+
+        own = self._view(self.user)
+        own()
+        other = self._view(_User(u'user2'))
+        other()
+        # Badge URLs are only externalized for their recipient
+        assert_that(own._representation_key(collection),
+                    is_not(other._representation_key(collection)))
+        assert_that(own.request.response.etag,
+                    is_not(other.request.response.etag))
+
+        # Nor may the recipient's ETag be used by anyone else
+        other = self._view(_User(u'user2'),
+                           if_none_match=ETagMatcher.parse('"%s"' % own.request.response.etag))
+        assert_that(other(), is_not(instance_of(hexc.HTTPNotModified)))
+
+    @fudge.patch('nti.app.products.badgr.views.badges.query_awarded_badges')
+    def test_stale(self, mock_query):
+        # Served while Badgr is down; neither tagged nor cached
+        collection = _collection(u'views/stale', stale=True)
+        mock_query.is_callable().returns(collection)
+        view = self._view(self.user)
+        assert_that(view._representation_key(collection), none())
+        assert_that(view(), not_none())
+        assert_that(view.request.response.etag, none())
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+An in-process cache of Badgr access tokens.
+
+Tokens are cached for at most `LOCAL_TTL` seconds, and never beyond
+their remaining lifetime in redis. Whenever tokens are stored, anywhere
+in the cluster, an invalidation is published through redis; each
+process listens for these and evicts its cached copy.
+
+Every eviction bumps a generation. A token read from redis is only
+cached if no eviction happened while it was being read, and a cached
+token is only served while its generation is current, so a token read
+just before an eviction is never served after it.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import os
+import time
+import threading
+
+from zope import component
+
+from zope.testing.cleanup import addCleanUp
+
+from nti.dataserver.interfaces import IRedisClient
+
+logger = __import__('logging').getLogger(__name__)
+
+#: Max seconds a token is served locally without checking redis.
+LOCAL_TTL = 60 * 5
+
+#: Stop serving a token locally this many seconds before it expires.
+EXPIRY_SAFETY_MARGIN = 30
+
+INVALIDATION_CHANNEL = 'badgr/tokens/invalidate'
+
+_lock = threading.Lock()
+_tokens = dict()
+_generation = 0
+_listener = None
+_pid = None
+
+
+def _redis():
+    return component.queryUtility(IRedisClient)
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8')
+    return value
+
+
+class _InvalidationListener(threading.Thread):
+
+    def __init__(self, pubsub):
+        super(_InvalidationListener, self).__init__(name='badgr-token-invalidation')
+        self.daemon = True
+        self.pubsub = pubsub
+
+    def run(self):
+        try:
+            for message in self.pubsub.listen():
+                if message.get('type') == 'message':
+                    evict(_text(message.get('data')), publish=False)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Badgr token invalidation listener stopped')
+        finally:
+            # Without invalidations we cannot trust our local copies.
+            _stop_listener(self)
+
+
+def _stop_listener(listener):
+    global _listener
+    with _lock:
+        if _listener is listener:
+            _listener = None
+            _clear_tokens()
+
+
+def _ensure_listener(redis):
+    """
+    Start listening for invalidations in this process, if we are not
+    already. Returns whether we are listening; tokens are only cached
+    locally while we are.
+    """
+    global _listener, _pid
+    pid = os.getpid()
+    with _lock:
+        if _pid != pid:
+            # Forked; our parent's listener thread does not exist here
+            _clear_tokens()
+            _listener = None
+            _pid = pid
+        if _listener is not None:
+            return True
+        try:
+            pubsub = redis.pubsub()
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception('Could not listen for badgr token invalidations')
+            return False
+        _listener = _InvalidationListener(pubsub)
+        _listener.start()
+        return True
+
+
+def _clear_tokens():
+    # Callers hold the lock
+    global _generation
+    _generation += 1
+    _tokens.clear()
+
+
+def get_access_token(key, redis=None):
+    """
+    Return the access token stored in redis under `key`, preferring our
+    local copy. Returns None if there is no token.
+    """
+    now = time.time()
+    generation = _generation
+    entry = _tokens.get(key)
+    if entry is not None and entry[1] > now and entry[2] == generation:
+        return entry[0]
+    redis = redis or _redis()
+    pipe = redis.pipeline()
+    pipe.get(key)
+    pipe.ttl(key)
+    token, ttl = pipe.execute()
+    if token is None:
+        _tokens.pop(key, None)
+        return None
+    if      ttl is not None and ttl > EXPIRY_SAFETY_MARGIN \
+        and _ensure_listener(redis):
+        expires_at = now + min(LOCAL_TTL, ttl - EXPIRY_SAFETY_MARGIN)
+        with _lock:
+            # Unless evicted while we were reading
+            if _generation == generation:
+                _tokens[key] = (token, expires_at, generation)
+    return token
+
+
+def evict(key, publish=True):
+    """
+    Drop our cached token for `key` and, if `publish`, tell all other
+    processes to do the same.
+    """
+    global _generation
+    with _lock:
+        _generation += 1
+        _tokens.pop(key, None)
+    if not publish:
+        return
+    redis = _redis()
+    if redis is None:
+        return
+    try:
+        redis.publish(INVALIDATION_CHANNEL, key)
+    except Exception:  # pylint: disable=broad-except
+        logger.exception('Error while publishing badgr token invalidation (%s)',
+                         key)
+
+
+def _clear():
+    with _lock:
+        _clear_tokens()
+
+
+addCleanUp(_clear)
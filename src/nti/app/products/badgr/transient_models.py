@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Compact, non-persistent variants of the :mod:`client_models` classes.
+
+Badgr API objects built for a single request (listing pages, awarded
+badges) are never stored, so they need neither persistence bookkeeping
+nor a per-instance ``__dict__``. These classes provide the same
+interfaces and externalize as their :mod:`client_models` counterparts
+(by ``__external_class_name__`` and mime type); they store their schema
+fields in ``__slots__``.
+
+This module is deliberately not registered with ``registerAutoPackageIO``;
+the :mod:`client_models` classes remain the registered factories for
+incoming external objects.
+
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import time
+
+from zope import interface
+
+from zope.schema import getFieldsInOrder
+
+from nti.app.products.badgr.interfaces import IBadgrBadge
+from nti.app.products.badgr.interfaces import IBadgrIdEvidence
+from nti.app.products.badgr.interfaces import IAwardedBadgrBadge
+from nti.app.products.badgr.interfaces import IBadgrBadgeCollection
+from nti.app.products.badgr.interfaces import IAwardedBadgrBadgeCollection
+
+from nti.ntiids.oids import to_external_ntiid_oid
+
+from nti.property.property import alias
+
+from nti.schema.eqhash import EqHash
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def _field_defaults(iface):
+    return tuple((name, field.default) for name, field in getFieldsInOrder(iface))
+
+
+def _slots(iface, *extra):
+    return tuple(name for name, _ in _field_defaults(iface)) + extra
+
+
+class _TransientModel(object):
+    """
+    Initializes every schema field (to its default, unless given).
+    """
+
+    __slots__ = ()
+
+    _fields = ()
+
+    def __init__(self, **kwargs):
+        for name, default in self._fields:
+            setattr(self, name, kwargs.pop(name, default))
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return '<%s.%s %s>' % (self.__class__.__module__,
+                               self.__class__.__name__,
+                               getattr(self, 'entity_id', None))
+
+
+@EqHash('template_id')
+@interface.implementer(IBadgrBadge)
+class TransientBadgrBadge(_TransientModel):
+
+    __external_class_name__ = 'BadgrBadge'
+
+    __slots__ = _slots(IBadgrBadge,
+                       '__parent__', '__name__', '__annotations__',
+                       'createdTime', 'lastModified',
+                       # Set by our factories
+                       'template_id', 'badge_url',
+                       'organization_id', 'organization_name')
+
+    _fields = _field_defaults(IBadgrBadge)
+
+    mimeType = mime_type = "application/vnd.nextthought.badgr.badge"
+
+    def __init__(self, **kwargs):
+        self.__parent__ = self.__name__ = None
+        self.template_id = self.badge_url = None
+        self.organization_id = self.organization_name = None
+        self.createdTime = self.lastModified = time.time()
+        super(TransientBadgrBadge, self).__init__(**kwargs)
+
+    @property
+    def ntiid(self):
+        return to_external_ntiid_oid(self)
+
+
+@interface.implementer(IAwardedBadgrBadge)
+class TransientAwardedBadgrBadge(_TransientModel):
+
+    __external_class_name__ = 'AwardedBadgrBadge'
+
+    __slots__ = _slots(IAwardedBadgrBadge,
+                       '__parent__', '__name__', '__annotations__', 'User')
+
+    _fields = _field_defaults(IAwardedBadgrBadge)
+
+    mimeType = mime_type = "application/vnd.nextthought.badgr.awardedbadge"
+
+    def __init__(self, **kwargs):
+        self.__parent__ = self.__name__ = self.User = None
+        super(TransientAwardedBadgrBadge, self).__init__(**kwargs)
+
+
+@interface.implementer(IBadgrIdEvidence)
+class TransientBadgrIdEvidence(_TransientModel):
+
+    __external_class_name__ = 'BadgrIdEvidence'
+
+    __slots__ = _slots(IBadgrIdEvidence)
+
+    _fields = tuple((name, u'IdEvidence' if name == 'type' else default)
+                    for name, default in _field_defaults(IBadgrIdEvidence))
+
+    mimeType = mime_type = "application/vnd.nextthought.badgr.idevidence"
+
+    id = alias('ntiid')
+
+
+class _TransientCollection(_TransientModel):
+
+    __slots__ = ('content_hash',)
+
+    def __init__(self, **kwargs):
+        self.content_hash = None
+        super(_TransientCollection, self).__init__(**kwargs)
+
+
+@interface.implementer(IBadgrBadgeCollection)
+class TransientBadgrBadgeCollection(_TransientCollection):
+
+    __external_class_name__ = 'BadgrBadgeCollection'
+
+    __slots__ = _slots(IBadgrBadgeCollection)
+
+    _fields = _field_defaults(IBadgrBadgeCollection)
+
+    mimeType = mime_type = "application/vnd.nextthought.badgr.badgecollection"
+
+    badges = alias('Items')
+
+
+@interface.implementer(IAwardedBadgrBadgeCollection)
+class TransientAwardedBadgrBadgeCollection(_TransientCollection):
+
+    __external_class_name__ = 'AwardedBadgrBadgeCollection'
+
+    __slots__ = _slots(IAwardedBadgrBadgeCollection)
+
+    _fields = _field_defaults(IAwardedBadgrBadgeCollection)
+
+    mimeType = mime_type = "application/vnd.nextthought.badgr.awardedbadgecollection"
+
+    badges = alias('Items')
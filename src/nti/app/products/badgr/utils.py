@@ -9,7 +9,6 @@ from __future__ import print_function
 from __future__ import absolute_import
 
 import base64
-import requests
 
 import pyramid.httpexceptions as hexc
 
@@ -21,6 +20,8 @@ from nti.app.externalization.error import raise_json_error
 
 from nti.app.products.badgr import MessageFactory as _
 
+from nti.app.products.badgr.sessions import get_session
+
 from nti.common.interfaces import IOAuthKeys
 
 logger = __import__('logging').getLogger(__name__)
@@ -36,18 +37,20 @@ def raise_error(data, tb=None, factory=hexc.HTTPBadRequest, request=None):
     raise_json_error(request, factory, data, tb)
 
 
-def get_token_data(post_data):
+def get_token_data(post_data, session=None, auth_keys=None):
     """
     Get the badgr token data, using the supplied post_data dict
-    for the certain type of token fetch.
+    for the certain type of token fetch. The (pooled) `session` and
+    `auth_keys` are used if given.
     """
-    auth_keys = component.getUtility(IOAuthKeys, name="badgr")
+    session = session or get_session()
+    auth_keys = auth_keys or component.getUtility(IOAuthKeys, name="badgr")
     auth_header = '%s:%s' % (auth_keys.APIKey, auth_keys.secretKey)
     auth_header = base64.b64encode(auth_header)
     auth_header = 'Basic %s' % auth_header
-    response = requests.post(BADGR_AUTH_TOKEN_URL,
-                             post_data,
-                             headers={'Authorization': auth_header})
+    response = session.post(BADGR_AUTH_TOKEN_URL,
+                            post_data,
+                            headers={'Authorization': auth_header})
     if response.status_code != 200:
         error_json = response.json()
         if 'error' in error_json and error_json['error'] == 'invalid_grant':
@@ -82,11 +85,33 @@ def get_token_data(post_data):
     return access_data
 
 
-def get_auth_tokens(refresh_token):
+def get_auth_tokens(refresh_token, session=None, auth_keys=None):
     """
     Fetch an access_token and refresh_token
     """
     data = {'refresh_token': refresh_token,
             'grant_type': 'refresh_token'}
-    access_data = get_token_data(data)
+    access_data = get_token_data(data, session=session, auth_keys=auth_keys)
     return access_data.get('access_token'), access_data.get('refresh_token')
+
+
+def site_local_factory(factory, name):
+    """
+    Make an adapter of an :class:`IBadgrAuthorizedIntegration` to the
+    object created by `factory`, stored (on first use) under `name` in
+    the site manager the integration is installed in, rather than on the
+    integration itself. Re-authorizing replaces the integration, and
+    disconnecting removes it; neither loses the stored object.
+
+    Integrations that are not installed adapt to None.
+    """
+    def _adapter(integration):
+        site_manager = getattr(integration, '__parent__', None)
+        if site_manager is None:
+            return None
+        try:
+            result = site_manager[name]
+        except KeyError:
+            result = site_manager[name] = factory()
+        return result
+    return _adapter
@@ -7,3 +7,15 @@
 from __future__ import division
 from __future__ import print_function
 from __future__ import absolute_import
+
+from pyramid import httpexceptions as hexc
+
+from nti.app.externalization.error import raise_json_error
+
+logger = __import__('logging').getLogger(__name__)
+
+
+def raise_error(data, tb=None,
+                factory=hexc.HTTPUnprocessableEntity,
+                request=None):
+    raise_json_error(request, factory, data, tb)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import six
+
+from pyramid.view import view_config
+
+from requests.structures import CaseInsensitiveDict
+
+from nti.app.base.abstract_views import AbstractAuthenticatedView
+
+from nti.app.externalization.view_mixins import ModeledContentUploadRequestUtilsMixin
+
+from nti.app.products.badgr import AWARD_OUTBOX_VIEW
+from nti.app.products.badgr import AWARD_BADGES_VIEW
+from nti.app.products.badgr import SYNC_ASSERTIONS_VIEW
+
+from nti.app.products.badgr import MessageFactory as _
+
+from nti.app.products.badgr import AWARD_STATUS_FAILED
+
+from nti.app.products.badgr.authorization import ACT_BADGR
+
+from nti.app.products.badgr.client_models import BadgrBadgeAwardResult
+
+from nti.app.products.badgr.interfaces import IBadgrClient
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import IBadgrAwardOutbox
+from nti.app.products.badgr.interfaces import IBadgrIntegration
+from nti.app.products.badgr.interfaces import IBadgrAssertionMirror
+from nti.app.products.badgr.interfaces import IBadgrAuthorizedIntegration
+
+from nti.app.products.badgr.sync import sync_after_commit
+
+from nti.app.products.badgr.views import raise_error
+
+from nti.common.string import is_true
+
+from nti.dataserver.authorization import ACT_CONTENT_EDIT
+
+from nti.dataserver.interfaces import IUser
+
+from nti.dataserver.users.users import User
+
+from nti.externalization.interfaces import LocatedExternalDict
+from nti.externalization.interfaces import StandardExternalFields
+
+logger = __import__('logging').getLogger(__name__)
+
+ITEMS = StandardExternalFields.ITEMS
+TOTAL = StandardExternalFields.TOTAL
+ITEM_COUNT = StandardExternalFields.ITEM_COUNT
+
+
+@view_config(route_name='objects.generic.traversal',
+             context=IBadgrIntegration,
+             request_method='POST',
+             name=AWARD_BADGES_VIEW,
+             permission=ACT_CONTENT_EDIT,
+             renderer='rest')
+class BadgrBulkAwardView(AbstractAuthenticatedView,
+                         ModeledContentUploadRequestUtilsMixin):
+    """
+    Award a badge to many users at once, returning the award status
+    of each user: queued (in the award outbox, sent after we commit),
+    duplicate, or failed.
+
+    usernames - the users to award the badge to
+    badge_template_id - the badge to award
+    """
+
+    def readInput(self, value=None):
+        if self.request.body:
+            values = super(BadgrBulkAwardView, self).readInput(value)
+        else:
+            values = self.request.params
+        return CaseInsensitiveDict(values)
+
+    def __call__(self):
+        values = self.readInput()
+        badge_template_id = values.get('badge_template_id')
+        if not badge_template_id:
+            raise_error({'message': _(u"Must supply a badge."),
+                         'code': 'MissingBadgeTemplateError'})
+        usernames = values.get('usernames') or ()
+        if isinstance(usernames, six.string_types):
+            usernames = usernames.split(',')
+        users = []
+        missing = []
+        for username in usernames:
+            user = User.get_user(username)
+            if IUser.providedBy(user):
+                users.append(user)
+            else:
+                missing.append(username)
+        if not users and not missing:
+            raise_error({'message': _(u"Must supply users to award the badge to."),
+                         'code': 'MissingUsersError'})
+        client = IBadgrClient(self.context)
+        suppress = is_true(values.get('suppress_badge_notification_email'))
+        try:
+            results = client.award_badges(users,
+                                          badge_template_id,
+                                          suppress_badge_notification_email=suppress,
+                                          locale=values.get('locale'),
+                                          evidence_ntiid=values.get('evidence_ntiid'),
+                                          evidence_title=values.get('evidence_title'),
+                                          evidence_desc=values.get('evidence_desc'))
+        except BadgrClientError:
+            raise_error({'message': _(u"Error while awarding badges."),
+                         'code': 'BadgrClientError'})
+        results = list(results)
+        for username in missing:
+            results.append(BadgrBadgeAwardResult(username=username,
+                                                 status=AWARD_STATUS_FAILED,
+                                                 error=u'User not found'))
+        result = LocatedExternalDict()
+        result[ITEMS] = results
+        result[ITEM_COUNT] = result[TOTAL] = len(results)
+        self.request.environ['nti.request_had_transaction_side_effects'] = 'True'
+        return result
+
+
+@view_config(route_name='objects.generic.traversal',
+             context=IBadgrAuthorizedIntegration,
+             request_method='GET',
+             name=AWARD_OUTBOX_VIEW,
+             permission=ACT_BADGR,
+             renderer='rest')
+class BadgrAwardOutboxView(AbstractAuthenticatedView):
+    """
+    The queued badge awards of this integration.
+
+    state - only return awards in this state (queued, sending, sent,
+        duplicate, failed)
+    """
+
+    def __call__(self):
+        state = self.request.params.get('state') or None
+        outbox = IBadgrAwardOutbox(self.context)
+        result = LocatedExternalDict()
+        result[ITEMS] = items = list(outbox.values(state))
+        result[ITEM_COUNT] = len(items)
+        result[TOTAL] = len(outbox)
+        return result
+
+
+@view_config(route_name='objects.generic.traversal',
+             context=IBadgrAuthorizedIntegration,
+             request_method='POST',
+             name=SYNC_ASSERTIONS_VIEW,
+             permission=ACT_BADGR,
+             renderer='rest')
+class BadgrSyncAssertionsView(AbstractAuthenticatedView):
+    """
+    Sync the local mirror of issued badges with Badgr, returning the
+    mirror's sync status.
+
+    full - drop the mirror and resync everything. Until the resync
+        completes, awarded badges are fetched from Badgr.
+    """
+
+    def __call__(self):
+        mirror = IBadgrAssertionMirror(self.context)
+        full = is_true(self.request.params.get('full'))
+        if full:
+            mirror.clear()
+        sync_after_commit()
+        result = LocatedExternalDict()
+        result[ITEM_COUNT] = len(mirror)
+        result['last_synced'] = mirror.last_synced
+        result['sync_watermark'] = mirror.sync_watermark
+        self.request.environ['nti.request_had_transaction_side_effects'] = 'True'
+        return result
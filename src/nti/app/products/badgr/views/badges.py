@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+.. $Id$
+"""
+
+from __future__ import division
+from __future__ import print_function
+from __future__ import absolute_import
+
+import hashlib
+
+from pyramid import httpexceptions as hexc
+
+from pyramid.view import view_config
+
+from requests.structures import CaseInsensitiveDict
+
+from zope import component
+
+from zope.cachedescriptors.property import Lazy
+
+from nti.app.base.abstract_views import AbstractAuthenticatedView
+
+from nti.app.externalization.view_mixins import BatchingUtilsMixin
+
+from nti.app.products.badgr import BADGES
+from nti.app.products.badgr import VIEW_AWARDED_BADGES
+
+from nti.app.products.badgr import MessageFactory as _
+
+from nti.app.products.badgr.cache import representation_namespace
+
+from nti.app.products.badgr.client_models import BadgrBadgeCollection
+from nti.app.products.badgr.client_models import AwardedBadgrBadgeCollection
+
+from nti.app.products.badgr.interfaces import IBadgrBadge
+from nti.app.products.badgr.interfaces import IBadgrClient
+from nti.app.products.badgr.interfaces import BadgrClientError
+from nti.app.products.badgr.interfaces import IBadgrIntegration
+from nti.app.products.badgr.interfaces import BadgrCircuitOpenError
+from nti.app.products.badgr.interfaces import IBadgrRepresentationCache
+
+from nti.app.products.badgr.mirror import query_awarded_badges
+
+from nti.app.products.badgr.views import raise_error
+
+from nti.appserver.ugd_edit_views import UGDDeleteView
+
+from nti.dataserver.authorization import ACT_READ
+from nti.dataserver.authorization import ACT_CONTENT_EDIT
+
+from nti.dataserver.interfaces import IUser
+
+from nti.externalization.externalization import to_external_object
+
+from nti.externalization.interfaces import LocatedExternalDict
+from nti.externalization.interfaces import StandardExternalFields
+
+from nti.links.links import Link
+
+logger = __import__('logging').getLogger(__name__)
+
+LINKS = StandardExternalFields.LINKS
+
+
+@view_config(route_name='objects.generic.traversal',
+             context=IBadgrBadge,
+             request_method='DELETE',
+             permission=ACT_CONTENT_EDIT,
+             renderer='rest')
+class BadgrBadgeDeleteView(UGDDeleteView):
+    """
+    Allow deleting a :class:`IBadgrBadge`.
+    """
+
+    def __call__(self):
+        try:
+            del self.context.__parent__[self.context.__name__]
+        except KeyError:
+            pass
+        return hexc.HTTPNoContent()
+
+
+class AbstractBadgrAPIView(AbstractAuthenticatedView,
+                           BatchingUtilsMixin):
+    """
+    Supply batch-next, batch-prev rels if necessary.
+
+    Clients may page either by Badgr's `page`, or with the standard
+    `batchSize` and `batchStart`, which are served from the (concurrently
+    fetched) Badgr pages covering the batch.
+
+    The externalized collection is cached by its content hash and the
+    inputs of our decorators (see :meth:`_representation_inputs`), and
+    served with a strong ETag of those and the query string.
+    """
+
+    DEFAULT_SORT_PARAM = None
+
+    NAME_FILTER_KEY = 'name'
+
+    @Lazy
+    def _params(self):
+        return CaseInsensitiveDict(self.request.params)
+
+    @property
+    def page(self):
+        return self._params.get('page')
+
+    @Lazy
+    def _batch_size_start(self):
+        return self._get_batch_size_start()
+
+    @property
+    def batch_size(self):
+        return self._batch_size_start[0]
+
+    @property
+    def batch_start(self):
+        return self._batch_size_start[1] or 0
+
+    @property
+    def filter(self):
+        # Only filter on name currently
+        filter_str = self._params.get('filter')
+        if filter_str:
+            return {self.NAME_FILTER_KEY: filter_str}
+
+    @property
+    def sort(self):
+        result = self._params.get('sort', self.DEFAULT_SORT_PARAM)
+        result = result.split(',')
+        return result
+
+    def _stale_collection(self, factory):
+        """
+        Badgr is unavailable and we have nothing cached; rather than
+        failing, return an empty collection flagged as stale.
+        """
+        logger.info('Badgr unavailable, returning empty collection (%s)',
+                    self.request.path)
+        return factory(Items=[],
+                       badges_count=0,
+                       total_badges_count=0,
+                       current_page=1,
+                       total_pages=1,
+                       stale=True)
+
+    def _decorate_batch_size_rels(self, badgr_collection, ext):
+        batch_params = self.request.GET.copy()
+        batch_params.pop('batchStart', None)
+        batch_size = self.batch_size
+        batch_start = self.batch_start
+        links = ext.setdefault(LINKS, [])
+        if batch_start > 0:
+            prev_batch_params = dict(batch_params)
+            prev_batch_params['batchStart'] = max(batch_start - batch_size, 0)
+            links.append(Link(self.request.path,
+                              rel='batch-prev',
+                              params=prev_batch_params))
+        total = badgr_collection.total_badges_count or 0
+        if batch_start + batch_size < total:
+            next_batch_params = dict(batch_params)
+            next_batch_params['batchStart'] = batch_start + batch_size
+            links.append(Link(self.request.path,
+                              rel='batch-next',
+                              params=next_batch_params))
+        return ext
+
+    def _decorate_batch_rels(self, badgr_collection, ext):
+        if self.batch_size is not None:
+            return self._decorate_batch_size_rels(badgr_collection, ext)
+        batch_params = self.request.GET.copy()
+        batch_params.pop('page', None)
+        links = ext.setdefault(LINKS, [])
+        if badgr_collection.current_page > 1:
+            prev_batch_params = dict(batch_params)
+            prev_batch_params['page'] = badgr_collection.current_page - 1
+            link = Link(self.request.path,
+                        rel='batch-prev',
+                        params=prev_batch_params)
+            links.append(link)
+        if badgr_collection.current_page < badgr_collection.total_pages:
+            next_batch_params = dict(batch_params)
+            next_batch_params['page'] = badgr_collection.current_page + 1
+            link = Link(self.request.path,
+                        rel='batch-next',
+                        params=next_batch_params)
+            links.append(link)
+        return ext
+
+    def _representation_inputs(self):
+        """
+        The viewer-dependent inputs of the externalized collection.
+        """
+        return ()
+
+    def _representation_key(self, badgr_collection):
+        """
+        The cache key of the externalized collection, or None if it
+        should not be cached.
+        """
+        content_hash = getattr(badgr_collection, 'content_hash', None)
+        if not content_hash or badgr_collection.stale:
+            return None
+        key = (self.__class__.__name__, content_hash) + tuple(self._representation_inputs())
+        return '/'.join(str(x) for x in key)
+
+    def _externalize(self, badgr_collection, key):
+        cache = component.queryUtility(IBadgrRepresentationCache)
+        if cache is None:
+            return to_external_object(badgr_collection)
+        namespace = representation_namespace()
+        entry = cache.get(namespace, key)
+        if entry is None:
+            entry = cache.set(namespace, key,
+                              to_external_object(badgr_collection),
+                              ttl=None)
+        # The cached dict is shared; copy what we decorate
+        result = LocatedExternalDict(entry.value)
+        result[LINKS] = list(result.get(LINKS) or ())
+        return result
+
+    def __call__(self):
+        badgr_collection = self._do_call()
+        key = self._representation_key(badgr_collection)
+        if key is None:
+            result = to_external_object(badgr_collection)
+        else:
+            etag = '%s?%s' % (key, self.request.query_string)
+            etag = hashlib.sha1(etag.encode('utf-8')).hexdigest()
+            if etag in self.request.if_none_match:
+                response = hexc.HTTPNotModified()
+                response.etag = etag
+                return response
+            self.request.response.etag = etag
+            result = self._externalize(badgr_collection, key)
+        # Create `page` batch rels
+        result = self._decorate_batch_rels(badgr_collection, result)
+        return result
+
+
+@view_config(route_name='objects.generic.traversal',
+             context=IBadgrIntegration,
+             request_method='GET',
+             name=BADGES,
+             permission=ACT_CONTENT_EDIT,
+             renderer='rest')
+class BadgrBadgesView(AbstractBadgrAPIView):
+    """
+    Get all badges from this badgr account
+
+    sort - {badges_count, created_at, name, updated_at}
+    """
+
+    DEFAULT_SORT_PARAM = 'name'
+
+    def _representation_inputs(self):
+        # Badges are decorated with whether they are of our issuer
+        integration = component.queryUtility(IBadgrIntegration)
+        issuer = getattr(integration, 'issuer', None)
+        return (getattr(issuer, 'entity_id', None),)
+
+    def _do_call(self):
+        client = IBadgrClient(self.context)
+        try:
+            collection = client.get_badges(sort=self.sort,
+                                           filters=self.filter,
+                                           page=self.page,
+                                           batch_start=self.batch_start,
+                                           batch_size=self.batch_size)
+        except BadgrCircuitOpenError:
+            collection = self._stale_collection(BadgrBadgeCollection)
+        except BadgrClientError:
+            raise_error({'message': _(u"Error while getting badge templates."),
+                         'code': 'BadgrClientError'})
+        return collection
+
+
+@view_config(route_name='objects.generic.traversal',
+             context=IUser,
+             request_method='GET',
+             name=VIEW_AWARDED_BADGES,
+             permission=ACT_READ,
+             renderer='rest')
+class UserAwardedBadgesView(AbstractBadgrAPIView):
+    """
+    Get all awarded badges for this user.
+
+    Other parties will only be able to see public badges.
+
+    sort - {created_at, issued_at, state_updated_at, badge_templates[name]}
+    """
+
+    # Issued at in desc order ('-' is descending)
+    DEFAULT_SORT_PARAM = '-issued_at'
+
+    NAME_FILTER_KEY = 'badge_templates[name]'
+
+    def _representation_inputs(self):
+        # Badge URLs are only externalized for their recipient
+        return ('self' if self.remoteUser == self.context else 'other',)
+
+    def _do_call(self):
+        accepted_only = public_only = self.remoteUser != self.context
+        integration = component.queryUtility(IBadgrIntegration)
+        if not integration:
+            raise hexc.HTTPNotFound()
+        # Prefer our local mirror; it is None if the mirror is cold
+        collection = query_awarded_badges(self.context,
+                                          sort=self.sort,
+                                          filters=self.filter,
+                                          page=self.page,
+                                          public_only=public_only,
+                                          accepted_only=accepted_only,
+                                          batch_start=self.batch_start,
+                                          batch_size=self.batch_size,
+                                          integration=integration)
+        if collection is not None:
+            return collection
+        client = IBadgrClient(integration)
+        try:
+            collection = client.get_awarded_badges(self.context,
+                                                   sort=self.sort,
+                                                   filters=self.filter,
+                                                   page=self.page,
+                                                   public_only=public_only,
+                                                   accepted_only=accepted_only,
+                                                   batch_start=self.batch_start,
+                                                   batch_size=self.batch_size)
+        except BadgrCircuitOpenError:
+            collection = self._stale_collection(AwardedBadgrBadgeCollection)
+        except BadgrClientError:
+            raise_error({'message': _(u"Error while getting issued badges."),
+                         'code': 'BadgrClientError'})
+        return collection